@@ -1,4 +1,5 @@
 __all__ = [
+    "batch",
     "dynamic_calculation_setups",
     "calculation_setups",
     "config",
@@ -31,6 +32,7 @@ __all__ = [
     "set_data_dir",
     "Weighting",
     "weightings",
+    "write_wurst_documents",
 ]
 
 __version__ = "4.7"
@@ -67,6 +69,7 @@ config.metadata.extend(
 config.p = preferences
 
 from bw2data.serialization import JsonWrapper
+from bw2data.batching import batch
 from bw2data.database import DatabaseChooser as Database
 from bw2data.utils import get_activity, get_node
 from bw2data.data_store import DataStore, ProcessedDataStore
@@ -75,7 +78,7 @@ from bw2data.search import Searcher, IndexManager
 from bw2data.weighting_normalization import Weighting, Normalization
 from bw2data.backends import convert_backend, get_id, Node, Edge
 from bw2data.compat import prepare_lca_inputs, Mapping, get_multilca_data_objs
-from bw2data.backends.wurst_extraction import extract_brightway_databases
+from bw2data.backends.wurst_extraction import extract_brightway_databases, write_wurst_documents
 
 mapping = Mapping()
 
@@ -3,11 +3,11 @@ import os
 from bw2data import config
 from bw2data.project import projects
 from bw2data.sqlite import SubstitutableDatabase
-from bw2data.backends.schema import ActivityDataset, ExchangeDataset, get_id
+from bw2data.backends.schema import ActivityDataset, ExchangeDataset, GeoMappingDataset, get_id
 
 sqlite3_lci_db = SubstitutableDatabase(
     projects.dir / "lci" / "databases.db",
-    [ActivityDataset, ExchangeDataset],
+    [ActivityDataset, ExchangeDataset, GeoMappingDataset],
 )
 
 from bw2data.backends.base import SQLiteBackend
@@ -9,16 +9,29 @@ from collections import defaultdict
 from functools import partial
 from typing import Callable, Iterable, List, Optional, Union
 
+import numpy as np
 import pandas
-from bw_processing import Datapackage, clean_datapackage_name, create_datapackage
-from fsspec.implementations.zip import ZipFileSystem
+from bw_processing import (
+    INDICES_DTYPE,
+    UNCERTAINTY_DTYPE,
+    Datapackage,
+    clean_datapackage_name,
+    create_datapackage,
+)
 from peewee import JOIN, DoesNotExist, fn
 from tqdm import tqdm
 
 from bw2data import calculation_setups, config, databases, geomapping
 from bw2data.backends import sqlite3_lci_db
 from bw2data.backends.proxies import Activity
-from bw2data.backends.schema import ActivityDataset, ExchangeDataset, get_id
+from bw2data.backends.schema import (
+    ActivityDataset,
+    ExchangeDataset,
+    GeoMappingDataset,
+    _remove_database_from_get_id_cache,
+    get_id,
+    location_as_text,
+)
 from bw2data.backends.typos import (
     check_activity_keys,
     check_activity_type,
@@ -30,8 +43,8 @@ from bw2data.backends.utils import (
     dict_as_activitydataset,
     dict_as_exchangedataset,
     get_csv_data_dict,
-    retupleize_geo_strings,
 )
+from bw2data.batching import current_batch
 from bw2data.configuration import labels
 from bw2data.data_store import ProcessedDataStore
 from bw2data.errors import (
@@ -49,6 +62,17 @@ from bw2data.utils import as_uncertainty_dict, get_geocollection, get_node, set_
 
 _VALID_KEYS = {"location", "name", "product", "type"}
 
+"""Number of datasets compared and written together by ``SQLiteBackend.sync``"""
+SYNC_BATCH_SIZE = 500
+
+
+def _pop_first(items: list, condition: Callable) -> Optional[tuple]:
+    """Remove and return the first ``(id, data)`` in ``items`` whose data meets ``condition``"""
+    for index, (_, data) in enumerate(items):
+        if condition(data):
+            return items.pop(index)
+    return None
+
 
 def tqdm_wrapper(iterable, is_test):
     if is_test:
@@ -439,7 +463,7 @@ class SQLiteBackend(ProcessedDataStore):
     def filepath_processed(self):
         if self.metadata.get("dirty"):
             self.process()
-        return self.dirpath_processed() / self.filename_processed()
+        return super().filepath_processed()
 
     def find_dependents(self, data=None, ignore=None):
         """Get sorted list of direct dependent databases (databases linked from exchanges).
@@ -751,57 +775,35 @@ class SQLiteBackend(ProcessedDataStore):
     def _efficient_write_many_data(
         self, data: list, indices: bool = True, check_typos: bool = True
     ) -> None:
-        be_complicated = len(data) >= 100 and indices
+        # Inside a ``batch()`` block, the write is a savepoint of the block's transaction, so
+        # the indices aren't rebuilt and the database can't be vacuumed
+        in_batch = current_batch() is not None
+        be_complicated = len(data) >= 100 and indices and not in_batch
         if be_complicated:
             self._drop_indices()
-        sqlite3_lci_db.db.autocommit = False
         try:
-            sqlite3_lci_db.db.begin()
-            self.delete(keep_params=True, warn=False, vacuum=False)
-            exchanges, activities = [], []
+            with sqlite3_lci_db.atomic():
+                self.delete(keep_params=True, warn=False, vacuum=False)
+                exchanges, activities = [], []
 
-            for ds in tqdm_wrapper(data, getattr(config, "is_test", False)):
-                exchanges, activities = self._efficient_write_dataset(
-                    ds, exchanges, activities, check_typos
-                )
+                for ds in tqdm_wrapper(data, getattr(config, "is_test", False)):
+                    exchanges, activities = self._efficient_write_dataset(
+                        ds, exchanges, activities, check_typos
+                    )
 
-            if activities:
-                ActivityDataset.insert_many(activities).execute()
-            if exchanges:
-                ExchangeDataset.insert_many(exchanges).execute()
-            sqlite3_lci_db.db.commit()
-            sqlite3_lci_db.vacuum()
-        except:
-            sqlite3_lci_db.db.rollback()
-            raise
+                if activities:
+                    ActivityDataset.insert_many(activities).execute()
+                if exchanges:
+                    ExchangeDataset.insert_many(exchanges).execute()
+            if not in_batch:
+                sqlite3_lci_db.vacuum()
         finally:
-            sqlite3_lci_db.db.autocommit = True
             if be_complicated:
                 self._add_indices()
 
-    # Public API
-
-    def write(
-        self,
-        data: Union[dict, list],
-        process: bool = True,
-        searchable: bool = True,
-        check_typos: bool = True,
-        signal: Optional[bool] = None,
-    ):
-        """Write ``data`` to database.
-
-        ``data`` must be a dictionary of the form::
-
-            {
-                ('database name', 'dataset code'): {dataset}
-            }
-
-        Writing a database will first deletes all existing data."""
-        from bw2data import projects
-
-        if signal is None:
-            signal = projects.dataset.is_sourced
+    def _as_dataset_list(self, data: Union[dict, list]) -> list:
+        """Convert ``write`` or ``sync`` ``data`` to a list of datasets with ``database`` and
+        ``code``, set their process type, and register this database if needed."""
 
         def merger(d1: dict, d2: dict) -> dict:
             """The joys of 3.9 compatibility"""
@@ -822,7 +824,11 @@ class SQLiteBackend(ProcessedDataStore):
                     wrong_database, self.name
                 )
             )
+        return data
 
+    def _set_write_metadata(self, data: list) -> None:
+        """Set the number of nodes, modification time and geocollections of newly written
+        ``data``, and add its locations to ``geomapping``. Doesn't flush the metadata."""
         databases[self.name]["number"] = len(data)
 
         databases.set_modified(self.name)
@@ -840,6 +846,33 @@ class SQLiteBackend(ProcessedDataStore):
         # processing will flush the database metadata
 
         geomapping.add({x["location"] for x in data if x.get("location")})
+
+    # Public API
+
+    def write(
+        self,
+        data: Union[dict, list],
+        process: bool = True,
+        searchable: bool = True,
+        check_typos: bool = True,
+        signal: Optional[bool] = None,
+    ):
+        """Write ``data`` to database.
+
+        ``data`` must be a dictionary of the form::
+
+            {
+                ('database name', 'dataset code'): {dataset}
+            }
+
+        Writing a database will first deletes all existing data."""
+        from bw2data import projects
+
+        if signal is None:
+            signal = projects.dataset.is_sourced
+
+        data = self._as_dataset_list(data)
+        self._set_write_metadata(data)
         if data:
             try:
                 self._efficient_write_many_data(data, check_typos=check_typos)
@@ -857,6 +890,249 @@ class SQLiteBackend(ProcessedDataStore):
         if signal:
             on_database_write.send(name=self.name)
 
+    def sync(
+        self,
+        data: Union[dict, list],
+        process: bool = True,
+        check_typos: bool = True,
+        signal: Optional[bool] = None,
+    ) -> dict:
+        """Change the stored nodes and edges of this database to ``data``, writing only the
+        differences.
+
+        ``data`` has the same format as for ``write``. Nodes are matched by code, and edges of the
+        same node by their data. New nodes and edges are inserted, changed ones are updated in
+        place, and stored ones which are not in ``data`` are deleted; unchanged and changed nodes
+        and edges keep their ids. Stored data is compared as pickled bytes first, and only
+        unpickled if these differ.
+
+        Only inserted, changed and deleted nodes are updated in the search index. The database
+        is only processed (or, with ``process=False``, marked as dirty) if anything changed.
+
+        Returns the numbers of ``inserted``, ``updated``, ``deleted`` and ``unchanged`` nodes and
+        edges, e.g. ``{"nodes": {"inserted": 1, ...}, "edges": {"inserted": 4, ...}}``."""
+        from bw2data import projects
+
+        if signal is None:
+            signal = projects.dataset.is_sourced
+
+        registered = self.name in databases
+        data = self._as_dataset_list(data)
+        codes = set()
+        for ds in data:
+            if ds["code"] in codes:
+                raise DuplicateNode("Code {} is used by more than one dataset".format(ds["code"]))
+            codes.add(ds["code"])
+            for exchange in ds.get("exchanges", []):
+                if "input" not in exchange or "amount" not in exchange:
+                    raise InvalidExchange
+                if "type" not in exchange:
+                    raise UntypedExchange
+                if "output" not in exchange:
+                    exchange["output"] = (ds["database"], ds["code"])
+
+        stored = {
+            code: (id_, bytes(blob))
+            for id_, code, blob in sqlite3_lci_db.execute_sql(
+                "SELECT id, code, data FROM {} WHERE database = ?".format(
+                    ActivityDataset._meta.table_name
+                ),
+                (self.name,),
+            )
+        }
+        counts = {
+            kind: dict.fromkeys(("inserted", "updated", "deleted", "unchanged"), 0)
+            for kind in ("nodes", "edges")
+        }
+        changed = []
+        removed = sorted(set(stored).difference(codes))
+
+        with sqlite3_lci_db.atomic():
+            for index in range(0, len(data), SYNC_BATCH_SIZE):
+                changed.extend(
+                    self._sync_datasets(
+                        data[index : index + SYNC_BATCH_SIZE], stored, counts, check_typos
+                    )
+                )
+            for index in range(0, len(removed), SYNC_BATCH_SIZE):
+                chunk = removed[index : index + SYNC_BATCH_SIZE]
+                counts["edges"]["deleted"] += (
+                    ExchangeDataset.delete()
+                    .where(
+                        ExchangeDataset.output_database == self.name,
+                        ExchangeDataset.output_code << chunk,
+                    )
+                    .execute()
+                )
+                counts["nodes"]["deleted"] += (
+                    ActivityDataset.delete()
+                    .where(ActivityDataset.database == self.name, ActivityDataset.code << chunk)
+                    .execute()
+                )
+
+        if removed:
+            _remove_database_from_get_id_cache(self, name=self.name)
+        if not registered:
+            # New databases are searchable by default, as with ``write``
+            self.make_searchable(reset=True, signal=False)
+        elif self._searchable:
+            index_manager = IndexManager(self.filename)
+            index_manager.update_datasets(changed)
+            index_manager.delete_datasets({"database": self.name, "code": code} for code in removed)
+
+        modified = any(
+            counts[kind][change]
+            for kind in ("nodes", "edges")
+            for change in ("inserted", "updated", "deleted")
+        )
+        if modified or not registered:
+            self._set_write_metadata(data)
+            if process:
+                self.process()
+            else:
+                databases.set_dirty(self.name)
+            if signal:
+                on_database_reset.send(name=self.name)
+                on_database_write.send(name=self.name)
+        return counts
+
+    def _sync_datasets(self, data: list, stored: dict, counts: dict, check_typos: bool) -> list:
+        """Write the differences between the datasets ``data`` and the ``stored`` ``{code: (id,
+        pickled data)}`` nodes and their edges. Adds to ``counts``, and returns the inserted and
+        changed nodes."""
+        activity_table = ActivityDataset._meta.table_name
+        exchange_table = ExchangeDataset._meta.table_name
+        new_nodes, changed_nodes, changed = [], [], []
+        for ds in data:
+            node = {k: v for k, v in ds.items() if k != "exchanges"}
+            blob = bytes(ActivityDataset.data.db_value(node))
+            if ds["code"] in stored:
+                id_, stored_blob = stored[ds["code"]]
+                if blob == stored_blob or ActivityDataset.data.python_value(stored_blob) == node:
+                    counts["nodes"]["unchanged"] += 1
+                    continue
+                row = dict_as_activitydataset(node)
+                changed_nodes.append(
+                    (blob, row["location"], row["name"], row["product"], row["type"], id_)
+                )
+            else:
+                row = dict_as_activitydataset(node, add_snowflake_id=True)
+                new_nodes.append(
+                    (
+                        row["id"],
+                        blob,
+                        row["code"],
+                        row["database"],
+                        row["location"],
+                        row["name"],
+                        row["product"],
+                        row["type"],
+                    )
+                )
+            if check_typos:
+                check_activity_type(node.get("type"))
+                check_activity_keys(node)
+            changed.append(node)
+
+        stored_edges = defaultdict(lambda: defaultdict(list))
+        for id_, code, blob in sqlite3_lci_db.execute_sql(
+            "SELECT id, output_code, data FROM {} WHERE output_database = ? "
+            "AND output_code IN ({})".format(exchange_table, ", ".join("?" * len(data))),
+            [self.name] + [ds["code"] for ds in data],
+        ):
+            stored_edges[code][bytes(blob)].append(id_)
+
+        new_edges, changed_edges, deleted_edges = [], [], []
+        for ds in data:
+            remaining = stored_edges.get(ds["code"], {})
+            unmatched = []
+            for exchange in ds.get("exchanges", []):
+                blob = bytes(ExchangeDataset.data.db_value(exchange))
+                if remaining.get(blob):
+                    remaining[blob].pop()
+                else:
+                    unmatched.append((exchange, blob))
+            leftover = [
+                (id_, ExchangeDataset.data.python_value(blob))
+                for blob, ids in remaining.items()
+                for id_ in ids
+            ]
+            unmatched = [
+                (exchange, blob)
+                for exchange, blob in unmatched
+                if not _pop_first(leftover, lambda stored_data: stored_data == exchange)
+            ]
+            counts["edges"]["unchanged"] += len(ds.get("exchanges", [])) - len(unmatched)
+            # Prefer updating a stored edge with the same input and type, e.g. for new amounts
+            pending = []
+            for exchange, blob in unmatched:
+                same = _pop_first(
+                    leftover,
+                    lambda stored_data: tuple(stored_data["input"]) == tuple(exchange["input"])
+                    and stored_data["type"] == exchange["type"],
+                )
+                if same:
+                    changed_edges.append(self._sync_edge_row(exchange, blob, check_typos, same[0]))
+                else:
+                    pending.append((exchange, blob))
+            for exchange, blob in pending:
+                if leftover:
+                    changed_edges.append(
+                        self._sync_edge_row(exchange, blob, check_typos, leftover.pop()[0])
+                    )
+                else:
+                    new_edges.append(self._sync_edge_row(exchange, blob, check_typos))
+            deleted_edges.extend((id_,) for id_, _ in leftover)
+
+        connection = sqlite3_lci_db.db.connection()
+        connection.executemany(
+            "INSERT INTO {} (id, data, code, database, location, name, product, type) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?)".format(activity_table),
+            new_nodes,
+        )
+        connection.executemany(
+            "UPDATE {} SET data = ?, location = ?, name = ?, product = ?, type = ? "
+            "WHERE id = ?".format(activity_table),
+            changed_nodes,
+        )
+        connection.executemany(
+            "INSERT INTO {} (data, input_database, input_code, output_database, output_code, "
+            "type) VALUES (?, ?, ?, ?, ?, ?)".format(exchange_table),
+            new_edges,
+        )
+        connection.executemany(
+            "UPDATE {} SET data = ?, input_database = ?, input_code = ?, output_database = ?, "
+            "output_code = ?, type = ? WHERE id = ?".format(exchange_table),
+            changed_edges,
+        )
+        connection.executemany("DELETE FROM {} WHERE id = ?".format(exchange_table), deleted_edges)
+
+        counts["nodes"]["inserted"] += len(new_nodes)
+        counts["nodes"]["updated"] += len(changed_nodes)
+        counts["edges"]["inserted"] += len(new_edges)
+        counts["edges"]["updated"] += len(changed_edges)
+        counts["edges"]["deleted"] += len(deleted_edges)
+        return changed
+
+    @staticmethod
+    def _sync_edge_row(
+        exchange: dict, blob: bytes, check_typos: bool, id_: Optional[int] = None
+    ) -> tuple:
+        """Row values of ``exchange`` for the insert (or, with ``id_``, update) in ``sync``"""
+        if check_typos:
+            check_exchange_type(exchange.get("type"))
+            check_exchange_keys(exchange)
+        row = dict_as_exchangedataset(exchange)
+        values = (
+            blob,
+            row["input_database"],
+            row["input_code"],
+            row["output_database"],
+            row["output_code"],
+            row["type"],
+        )
+        return values if id_ is None else values + (id_,)
+
     def load(self, *args, **kwargs):
         # Should not be used, in general; relatively slow
         activities = [obj["data"] for obj in self._get_queryset().dicts()]
@@ -1007,7 +1283,8 @@ Here are the type values usually used for nodes:
             """
             warnings.warn(MESSAGE.format(self.name), UserWarning)
 
-        vacuum_needed = len(self) > 500 and vacuum
+        # VACUUM fails inside the transaction of a ``batch()`` block
+        vacuum_needed = len(self) > 500 and vacuum and current_batch() is None
 
         database_ids = {obj.id for obj in self}
         database_keys = {obj.key for obj in self}
@@ -1101,31 +1378,50 @@ Here are the type values usually used for nodes:
         """Add the inventory geomapping array to an existing datapackage.
 
         Separated out to allow for easier use in subclasses."""
-        # Create geomapping array, from dataset interger ids to locations
-        inv_mapping_qs = ActivityDataset.select(ActivityDataset.id, ActivityDataset.location).where(
-            ActivityDataset.database == self.name,
-            ActivityDataset.type << labels.process_node_types,
+        # Create geomapping array, from dataset interger ids to locations. Locations are joined
+        # to ``geomapping`` ids in SQL, using the same text form for tuples.
+        location = fn.COALESCE(
+            fn.NULLIF(ActivityDataset.location, ""), location_as_text(config.global_location)
         )
-
-        if self.metadata.get("location_normalization"):
-            location_mapper = lambda x: self.metadata["location_normalization"].get(x, x)
-        else:
-            location_mapper = lambda x: x
-
-        dp.add_persistent_vector_from_iterator(
+        inv_mapping_qs = (
+            ActivityDataset.select(
+                ActivityDataset.id, location, fn.IFNULL(GeoMappingDataset.id, -1)
+            )
+            .join(GeoMappingDataset, JOIN.LEFT_OUTER, on=(GeoMappingDataset.location == location))
+            .where(
+                ActivityDataset.database == self.name,
+                ActivityDataset.type << labels.process_node_types,
+            )
+            .order_by(ActivityDataset.id)
+            .tuples()
+        )
+        rows = list(inv_mapping_qs)
+        locations = np.array([row[1] for row in rows], dtype=object)
+        indices = np.zeros(len(rows), dtype=INDICES_DTYPE)
+        if rows:
+            indices["row"], indices["col"] = np.array([(row[0], row[2]) for row in rows]).T
+
+        for key, value in self.metadata.get("location_normalization", {}).items():
+            mask = locations == location_as_text(key)
+            if mask.any():
+                indices["col"][mask] = geomapping[value]
+
+        missing = indices["col"] == -1
+        if missing.any():
+            raise KeyError(locations[missing][0])
+
+        distributions = np.zeros(len(rows), dtype=UNCERTAINTY_DTYPE)
+        distributions["loc"] = 1
+        for field in ("scale", "shape", "minimum", "maximum"):
+            distributions[field] = np.nan
+
+        dp.add_persistent_vector(
             matrix="inv_geomapping_matrix",
             name=clean_datapackage_name(self.name + " inventory geomapping matrix"),
-            dict_iterator=(
-                {
-                    "row": row[0],
-                    "col": geomapping[
-                        location_mapper(retupleize_geo_strings(row[1]) or config.global_location)
-                    ],
-                    "amount": 1,
-                }
-                for row in inv_mapping_qs.tuples()
-            ),
-            nrows=inv_mapping_qs.count(),
+            indices_array=indices,
+            data_array=np.ones(len(rows), dtype=np.float32),
+            distributions_array=distributions,
+            flip_array=np.zeros(len(rows), dtype=bool),
         )
 
     def process(self, csv=False):
@@ -1147,11 +1443,9 @@ Here are the type values usually used for nodes:
 
         # self.filepath_processed checks if data is dirty,
         # and processes if it is. This causes an infinite loop.
-        # So we construct the filepath ourselves.
-        fp = str(self.dirpath_processed() / self.filename_processed())
-
+        # So we get the filesystem directly.
         dp = create_datapackage(
-            fs=ZipFileSystem(fp, mode="w"),
+            fs=self._processed_filesystem(),
             name=clean_datapackage_name(self.name),
             sum_intra_duplicates=True,
             sum_inter_duplicates=False,
@@ -1377,7 +1671,9 @@ Here are the type values usually used for nodes:
 
         result = []
 
-        for target in extract_brightway_databases(self.name, add_identifiers=True):
+        for target in extract_brightway_databases(
+            self.name, add_identifiers=True, as_generator=True
+        ):
             for edge in target["exchanges"]:
                 row = {
                     "target_id": target["id"],
@@ -1,17 +1,49 @@
+import collections
 import datetime
-import functools
+import shutil
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Iterable, Iterator, Optional, Sequence, Union
 
 import numpy as np
 import pandas as pd
-from bw_processing import clean_datapackage_name, create_datapackage
-from fsspec.implementations.zip import ZipFileSystem
+from bw_processing import (
+    Datapackage,
+    FilteredDatapackage,
+    clean_datapackage_name,
+    create_datapackage,
+    generic_directory_filesystem,
+)
+from bw_processing.constants import INDICES_DTYPE
+from bw_processing.utils import resolve_dict_iterator
+from scipy import sparse
 
 from bw2data import config, databases, geomapping
 from bw2data.backends import SQLiteBackend
 from bw2data.backends.iotable.proxies import IOTableActivity, IOTableExchanges
+from bw2data.backends.schema import ActivityDataset
 from bw2data.configuration import labels
+from bw2data.data_store import load_processed_datapackage
+from bw2data.errors import UnknownObject
 from bw2data.logs import stdout_feedback_logger
 
+"""Loaded IO table datapackages as ``{filepath: (file state, datapackage)}``"""
+_DATAPACKAGES = {}
+
+VECTOR_ARRAYS = (
+    "data_array",
+    "indices_array",
+    "distributions_array",
+    "flip_array",
+    "rescale_array",
+    "reference_array",
+)
+
+"""Number of chunks given to ``IOTableBackend.write_exchange_chunks`` which can wait to be
+written to disk"""
+CHUNK_QUEUE_SIZE = 4
+
 
 class IOTableBackend(SQLiteBackend):
     """IO tables have too much data to store each value in a database; instead, we only store the processed data in NumPy arrays.
@@ -26,7 +58,9 @@ class IOTableBackend(SQLiteBackend):
             data, process=False, searchable=searchable, check_typos=check_typos, signal=signal
         )
 
-    def write_exchanges(self, technosphere, biosphere, dependents):
+    def write_exchanges(
+        self, technosphere, biosphere, dependents, scenarios: Optional[Sequence[str]] = None
+    ):
         """
 
         Write IO data directly to processed arrays.
@@ -34,20 +68,256 @@ class IOTableBackend(SQLiteBackend):
         Product data is stored in SQLite as normal activities.
         Exchange data is written directly to NumPy structured arrays.
 
-        Technosphere and biosphere data has format ``(row id, col id, value, flip)``.
+        Technosphere and biosphere data has format ``(row id, col id, value, flip)``, either as a
+        dictionary of persistent vector arrays or an iterable of dictionaries. Matrices which
+        already exist as ``scipy.sparse`` matrices can be given as ``(matrix, row ids, col ids)``,
+        where the id arrays give the node id of each matrix row and column. Technosphere values are
+        taken as they would appear in the technosphere matrix: positive values where the row and
+        column id are the same are production, and all other values are stored as flipped inputs.
+
+        The arrays are sorted by column, and each matrix gets a CSC-style column index as JSON
+        metadata, so the edges of one activity can be read as a slice.
+
+        Several versions of the same table (e.g. different years or policies) can be written as
+        ``scenarios``, a list of scenario names. The ``data_array`` of a dictionary can then have
+        one column per scenario, which is stored as an array resource sharing the indices and
+        flip arrays of all scenarios; matrices with a one-dimensional ``data_array`` are the
+        same in all scenarios. ``datapackage()`` returns the data of one scenario.
+
+        """
+        stdout_feedback_logger.info("Starting IO table write")
+        dp = self._create_datapackage()
+
+        for label, edges in (("technosphere", technosphere), ("biosphere", biosphere)):
+            stdout_feedback_logger.info(f"Adding {label} matrix")
+            if isinstance(edges, tuple) and sparse.issparse(edges[0]):
+                edges = _sparse_to_vector(*edges, flip=label == "technosphere")
+            # if it is an iterable, convert to right format
+            elif not isinstance(edges, dict):
+                if not hasattr(edges, "__iter__"):
+                    raise Exception(f"Error: Unsupported {label} type: {type(edges)}")
+                arrays = resolve_dict_iterator(edges)
+                edges = {
+                    key: array for key, array in zip(VECTOR_ARRAYS, arrays) if array is not None
+                }
+                edges["nrows"] = len(edges["data_array"])
+            if np.ndim(edges["data_array"]) == 2 and (
+                not scenarios or edges["data_array"].shape[1] != len(scenarios)
+            ):
+                raise ValueError(
+                    f"{label} `data_array` has {edges['data_array'].shape[1]} columns, but "
+                    f"{len(scenarios or [])} scenarios were given"
+                )
+            self._add_edges(dp, label, *_sort_by_column(edges))
+
+        self._finalize_datapackage(dp, dependents, scenarios)
+
+    def write_exchange_chunks(
+        self,
+        technosphere: Iterable[tuple],
+        biosphere: Iterable[tuple],
+        dependents: Iterable[str],
+        directory: Optional[Path] = None,
+    ):
+        """Write IO data in chunks of NumPy arrays directly to processed arrays.
+
+        ``technosphere`` and ``biosphere`` are iterables (e.g. generators) of ``(rows, cols,
+        values, flip)`` chunks, where each element is an array of the same length; ``flip`` can
+        be ``None``. Use this instead of ``write_exchanges`` for tables which don't fit in memory.
+
+        At most ``CHUNK_QUEUE_SIZE`` chunks wait in memory; they are appended to temporary files
+        in ``directory`` (default is the processed data directory of the project) in a
+        background thread. When all chunks of a matrix are read, a second background thread sorts
+        it by column and compresses it into the datapackage, while the chunks of the next matrix
+        are generated.
+
+        Chunks which are given in column order don't need to be sorted afterwards. Otherwise,
+        the temporary files need enough space for two uncompressed copies of the matrix.
 
         """
         stdout_feedback_logger.info("Starting IO table write")
+        dp = self._create_datapackage()
+
+        with tempfile.TemporaryDirectory(dir=directory or self.dirpath_processed()) as tempdir:
+            with ThreadPoolExecutor(1) as spooler, ThreadPoolExecutor(1) as writer:
+                written = []
+                for label, chunks in (("technosphere", technosphere), ("biosphere", biosphere)):
+                    stdout_feedback_logger.info(f"Adding {label} matrix")
+                    spool = _ChunkSpool(Path(tempdir) / label)
+                    pending = collections.deque()
+                    for chunk in chunks:
+                        pending.append(spooler.submit(spool.append, *chunk))
+                        if len(pending) > CHUNK_QUEUE_SIZE:
+                            pending.popleft().result()
+                    for future in pending:
+                        future.result()
+                    written.append(writer.submit(self._add_spooled_edges, dp, label, spool))
+                for future in written:
+                    future.result()
+
+            self._finalize_datapackage(dp, dependents)
+            # Release the memory mapped temporary files before they are deleted
+            del dp
+
+    def update_exchanges(
+        self, technosphere: Optional[tuple] = None, biosphere: Optional[tuple] = None
+    ):
+        """Change the values of some edges without writing the processed datapackage again.
+
+        ``technosphere`` and ``biosphere`` are ``(rows, cols, values)`` or ``(rows, cols, values,
+        flip)`` tuples of arrays. The values replace those of the existing edges with the same row
+        and column ids, which keep their flip unless it is given. Other edges are added, with
+        ``flip`` (default ``False``).
+
+        If all edges exist, and the processed datapackage is in the ``"directory"`` format, the
+        stored arrays are changed in place. Otherwise, the edges are written to a small overlay
+        datapackage next to the processed datapackage, which ``datapackage()`` applies when
+        loading it; later updates are merged into the same overlay. ``compact()`` writes the
+        processed datapackage again with the overlay applied.
+
+        """
+        if self.scenarios:
+            raise ValueError("Can't update the edges of IO tables with scenarios")
+        updates = {
+            label: _last_edges(*_edge_arrays(*edges))
+            for label, edges in (("technosphere", technosphere), ("biosphere", biosphere))
+            if edges is not None
+        }
+        filepath = self.filepath_processed()
+        dp = self.datapackage()
+        positions = {
+            label: _edge_positions(dp, self._matrix_name(label), indices)
+            for label, (indices, _, _) in updates.items()
+        }
+
+        in_place = (
+            filepath.is_dir()
+            and not self._overlay_path().exists()
+            and all((first >= 0).all() for first, _ in positions.values())
+            and all(
+                _resource_position(dp, f"{self._matrix_name(label)}.flip") is not None
+                for label, (_, _, flip) in updates.items()
+                if flip is not None
+            )
+        )
+        if in_place:
+            stdout_feedback_logger.info("Changing processed arrays in place")
+            for label, (_, values, flip) in updates.items():
+                first, duplicates = positions[label]
+                name = self._matrix_name(label)
+                for kind, array in (("data", values), ("flip", flip)):
+                    if array is None:
+                        continue
+                    path = dp.get_resource(f"{name}.{kind}")[1]["path"]
+                    stored = np.load(filepath / path, mmap_mode="r+", allow_pickle=False)
+                    stored[first] = array
+                    if kind == "data":
+                        stored[duplicates] = 0
+                    stored.flush()
+        else:
+            stdout_feedback_logger.info("Writing overlay datapackage")
+            self._write_overlay(dp, updates, positions)
+
+        _DATAPACKAGES.pop(filepath, None)
+        databases[self.name]["processed"] = datetime.datetime.now().isoformat()
+        databases.flush()
+
+    def compact(self):
+        """Write the processed datapackage again with the overlay of ``update_exchanges``
+        applied, and remove the overlay."""
+        if not self._overlay_path().exists():
+            return
+        dp = self.datapackage()
+        vectors = {}
+        for label in ("technosphere", "biosphere"):
+            groups = [
+                resource["group"]
+                for resource in dp.resources
+                if resource.get("matrix") == f"{label}_matrix" and resource["kind"] == "indices"
+            ]
+            vectors[label] = {
+                f"{kind}_array": np.concatenate(
+                    [_vector_array(dp, group, kind) for group in groups]
+                )
+                for kind in ("indices", "data", "flip")
+            }
+            vectors[label]["nrows"] = len(vectors[label]["indices_array"])
+        self.write_exchanges(
+            technosphere=vectors["technosphere"],
+            biosphere=vectors["biosphere"],
+            dependents=databases[self.name].get("depends", []),
+        )
 
-        # create empty datapackage
+    def _write_overlay(self, dp: Datapackage, updates: dict, positions: dict):
+        """Merge ``updates`` into the overlay datapackage, with the flip of the current edges
+        where it isn't given"""
+        path = self._overlay_path()
+        previous = load_processed_datapackage(path) if path.exists() else None
+        overlay = {}
+        for label in ("technosphere", "biosphere"):
+            name = self._matrix_name(label)
+            arrays = []
+            if (
+                previous is not None
+                and _resource_position(previous, f"{name}_overlay.indices") is not None
+            ):
+                arrays.append(
+                    tuple(
+                        np.array(_vector_array(previous, f"{name}_overlay", kind))
+                        for kind in ("indices", "data", "flip")
+                    )
+                )
+            if label in updates:
+                indices, values, flip = updates[label]
+                if flip is None:
+                    flip = np.zeros(len(indices), dtype=bool)
+                    first = positions[label][0]
+                    found = first >= 0
+                    if _resource_position(dp, f"{name}.indices") is not None:
+                        flip[found] = _vector_array(dp, name, "flip")[first[found]]
+                    if _resource_position(dp, f"{name}_overlay.indices") is not None:
+                        added, _ = _edge_positions(dp, f"{name}_overlay", indices)
+                        flip[added >= 0] = _vector_array(dp, f"{name}_overlay", "flip")[
+                            added[added >= 0]
+                        ]
+                arrays.append((indices, values, flip))
+            if arrays:
+                overlay[label] = _last_edges(*(np.concatenate(kind) for kind in zip(*arrays)))
+
+        if path.exists():
+            shutil.rmtree(path)
         dp = create_datapackage(
-            fs=ZipFileSystem(self.filepath_processed(), mode="w"),
-            name=clean_datapackage_name(self.name),
+            fs=generic_directory_filesystem(dirpath=path),
+            name=clean_datapackage_name(self.name + " overlay"),
             sum_intra_duplicates=True,
             sum_inter_duplicates=False,
         )
+        for label, (indices, values, flip) in overlay.items():
+            dp.add_persistent_vector(
+                matrix=f"{label}_matrix",
+                name=f"{self._matrix_name(label)}_overlay",
+                indices_array=indices,
+                data_array=values,
+                flip_array=flip,
+                nrows=len(indices),
+            )
+        dp.finalize_serialization()
+
+    def _overlay_path(self) -> Path:
+        return self.dirpath_processed() / (clean_datapackage_name(self.filename) + ".overlay")
+
+    def _matrix_name(self, label: str) -> str:
+        return clean_datapackage_name(f"{self.name} {label} matrix")
 
-        # add geomapping
+    def _create_datapackage(self) -> Datapackage:
+        """Create an empty processed datapackage with the inventory geomapping"""
+        shutil.rmtree(self._overlay_path(), ignore_errors=True)
+        dp = create_datapackage(
+            fs=self._processed_filesystem(),
+            name=clean_datapackage_name(self.name),
+            sum_intra_duplicates=True,
+            sum_inter_duplicates=False,
+        )
         dp.add_persistent_vector_from_iterator(
             dict_iterator=(
                 {
@@ -61,47 +331,43 @@ class IOTableBackend(SQLiteBackend):
             name=clean_datapackage_name(self.name + " inventory geomapping matrix"),
             nrows=len(self),
         )
+        return dp
 
-        stdout_feedback_logger.info("Adding technosphere matrix")
-        # if technosphere is a dictionary pass it's keys & values
-        if isinstance(technosphere, dict):
-            dp.add_persistent_vector(
-                matrix="technosphere_matrix",
-                name=clean_datapackage_name(self.name + " technosphere matrix"),
-                **technosphere,
-            )
-        # if it is an iterable, convert to right format
-        elif hasattr(technosphere, "__iter__"):
-            dp.add_persistent_vector_from_iterator(
-                matrix="technosphere_matrix",
-                name=clean_datapackage_name(self.name + " technosphere matrix"),
-                dict_iterator=technosphere,
-            )
-        else:
-            raise Exception(f"Error: Unsupported technosphere type: {type(technosphere)}")
+    def _add_edges(self, dp: Datapackage, label: str, vector: dict, index: dict):
+        """Add the ``label`` matrix ``vector``, sorted by column, and its column ``index``.
 
-        stdout_feedback_logger.info("Adding biosphere matrix")
-        # if biosphere is a dictionary pass it's keys & values
-        if isinstance(biosphere, dict):
-            dp.add_persistent_vector(
-                matrix="biosphere_matrix",
-                name=clean_datapackage_name(self.name + " biosphere matrix"),
-                **biosphere,
-            )
-        # if it is an iterable, convert to right format
-        elif hasattr(biosphere, "__iter__"):
-            dp.add_persistent_vector_from_iterator(
-                matrix="biosphere_matrix",
-                name=clean_datapackage_name(self.name + " biosphere matrix"),
-                dict_iterator=biosphere,
-            )
+        A two-dimensional ``data_array`` is added as an array resource, in Fortran order so that
+        the values of each scenario are contiguous in memory mapped files."""
+        name = self._matrix_name(label)
+        if np.ndim(vector["data_array"]) == 2:
+            vector = dict(vector, data_array=np.asfortranarray(vector["data_array"]))
+            dp.add_persistent_array(matrix=f"{label}_matrix", name=name, **vector)
         else:
-            raise Exception(f"Error: Unsupported biosphere type: {type(technosphere)}")
+            dp.add_persistent_vector(matrix=f"{label}_matrix", name=name, **vector)
+        dp.add_json_metadata(
+            data=index, valid_for=name, name=f"{name}_column_index", kind="column_index"
+        )
+
+    def _add_spooled_edges(self, dp: Datapackage, label: str, spool: "_ChunkSpool"):
+        self._add_edges(dp, label, *spool.vector())
 
-        # finalize
+    def _finalize_datapackage(
+        self,
+        dp: Datapackage,
+        dependents: Iterable[str],
+        scenarios: Optional[Sequence[str]] = None,
+    ):
         stdout_feedback_logger.info("Finalizing serialization")
         dp.finalize_serialization()
+        _DATAPACKAGES.pop(self.filepath_processed(), None)
 
+        if scenarios:
+            databases[self.name]["scenarios"] = list(scenarios)
+            if databases[self.name].get("scenario") not in scenarios:
+                databases[self.name].pop("scenario", None)
+        else:
+            databases[self.name].pop("scenarios", None)
+            databases[self.name].pop("scenario", None)
         databases[self.name]["depends"] = sorted(set(dependents).difference({self.name}))
         databases[self.name]["processed"] = datetime.datetime.now().isoformat()
         databases.flush()
@@ -110,7 +376,59 @@ class IOTableBackend(SQLiteBackend):
         """No-op; no intermediate data to process"""
         return
 
-    def edges_to_dataframe(self) -> pd.DataFrame:
+    @property
+    def scenarios(self) -> list:
+        """Names of the scenarios written with ``write_exchanges``"""
+        return databases[self.name].get("scenarios", [])
+
+    def datapackage(self, scenario: Optional[str] = None) -> Datapackage:
+        """Load the processed datapackage.
+
+        IO tables are large, so the loaded arrays are kept in memory until the processed
+        datapackage is written again. The overlay written by ``update_exchanges`` is applied to
+        the loaded arrays, with new edges in separate resource groups. Each call returns a new
+        datapackage object with these arrays, which can be filtered independently (see
+        ``IOTableExchanges``).
+
+        For tables with ``scenarios``, the array resources are replaced by vectors with the data
+        of ``scenario``. The default is ``databases[name]["scenario"]``, if set, and otherwise the
+        first scenario; set it to choose the scenario used in calculations."""
+        filepath, overlay = self.filepath_processed(), self._overlay_path()
+        state = (_file_state(filepath), _file_state(overlay))
+        if filepath not in _DATAPACKAGES or _DATAPACKAGES[filepath][0] != state:
+            dp = super().datapackage()
+            for index in range(len(dp.resources)):
+                dp.get_resource(index)
+            if state[1] is not None:
+                _apply_overlay(dp, load_processed_datapackage(overlay))
+            _DATAPACKAGES[filepath] = (state, dp)
+        dp = _DATAPACKAGES[filepath][1]
+
+        view = FilteredDatapackage()
+        view.fs = dp.fs
+        view.metadata = {key: value for key, value in dp.metadata.items() if key != "resources"}
+        view.resources = [dict(resource) for resource in dp.resources]
+        view.data = list(dp.data)
+
+        if self.scenarios:
+            scenario = scenario or databases[self.name].get("scenario") or self.scenarios[0]
+            if scenario not in self.scenarios:
+                raise ValueError(f"Unknown scenario {scenario}; available: {self.scenarios}")
+            column = self.scenarios.index(scenario)
+            for resource, data in zip(view.resources, view.data):
+                if resource.get("category") == "array":
+                    resource["category"] = "vector"
+            view.data = [
+                data[:, column] if resource["kind"] == "data" and np.ndim(data) == 2 else data
+                for resource, data in zip(view.resources, view.data)
+            ]
+        elif scenario is not None:
+            raise ValueError(f"Database {self.name} has no scenarios")
+        return view
+
+    def edges_to_dataframe(
+        self, chunk_size: Optional[int] = None
+    ) -> Union[pd.DataFrame, Iterator[pd.DataFrame]]:
         """Return a pandas DataFrame with all database exchanges. DataFrame columns are:
 
             target_id: int,
@@ -136,109 +454,405 @@ class IOTableBackend(SQLiteBackend):
 
         As IO Tables are normally quite large, the DataFrame building will operate directly on Numpy arrays, and therefore special formatters are not supported in this function.
 
-        Returns a pandas ``DataFrame``.
+        Node metadata is read with one query per database into columns of unique nodes. The
+        categorical columns are built directly from the codes of these node values.
 
-        """
-        from bw2data import get_node
+        Returns a pandas ``DataFrame``, or, with ``chunk_size``, an iterator of DataFrames with at
+        most ``chunk_size`` edges each. All chunks have the same categories.
 
-        @functools.lru_cache(10000)
-        def cached_lookup(id_):
-            return get_node(id=id_)
+        """
+        stdout_feedback_logger.info("Loading datapackage")
+        exchanges = IOTableExchanges(datapackage=self.datapackage())
+        edges = exchanges.as_arrays()
 
         stdout_feedback_logger.info("Retrieving metadata")
-        activities = {o.id: o for o in self}
-
-        def get(id_):
-            try:
-                return activities[id_]
-            except KeyError:
-                return cached_lookup(id_)
-
-        def metadata_dataframe(ids, prefix="target_"):
-            def dict_for_obj(obj, prefix):
-                dct = {
-                    f"{prefix}id": obj["id"],
-                    f"{prefix}database": obj["database"],
-                    f"{prefix}code": obj["code"],
-                    f"{prefix}name": obj.get("name"),
-                    f"{prefix}location": obj.get("location"),
-                    f"{prefix}unit": obj.get("unit"),
-                }
-                if prefix == "target_":
-                    dct["target_type"] = obj.get("type", labels.process_node_default)
-                    dct["target_reference_product"] = obj.get("reference product")
-                else:
-                    dct["source_categories"] = (
-                        "::".join(obj["categories"]) if obj.get("categories") else None
-                    )
-                    dct["source_product"] = obj.get("product")
-                return dct
-
-            return pd.DataFrame([dict_for_obj(get(id_), prefix) for id_ in np.unique(ids)])
-
-        def get_edge_types(exchanges):
-            arrays = []
-            for resource in exchanges.resources:
-                if resource["data"]["matrix"] == "biosphere_matrix":
-                    arrays.append(
-                        np.array([labels.biosphere_edge_default] * len(resource["data"]["array"]))
-                    )
+        nodes = _node_metadata(
+            np.union1d(edges["row"], edges["col"]),
+            [self.name] + list(databases[self.name].get("depends", [])),
+        )
+        targets = np.searchsorted(nodes["id"], edges["col"])
+        sources = np.searchsorted(nodes["id"], edges["row"])
+        edge_types = np.array(exchanges.edge_types, dtype=object)
+
+        stdout_feedback_logger.info("Building categorical columns")
+        target_used, source_used = np.zeros((2, len(nodes["id"])), dtype=bool)
+        target_used[targets], source_used[sources] = True, True
+        type_used = np.zeros(len(edge_types), dtype=bool)
+        type_used[edges["type"]] = True
+        # Columns as ``(values, categories, positions)``: values are node values or categorical
+        # codes, indexed by edge ``positions``, or edge values if ``positions`` is ``None``
+        columns = {
+            "target_id": (nodes["id"], None, targets),
+            "source_id": (nodes["id"], None, sources),
+            "edge_amount": (edges["amount"], None, None),
+            "edge_type": (*_categories(edge_types, type_used), edges["type"]),
+        }
+        for field, column in (
+            ("database", "target_database"),
+            ("code", "target_code"),
+            ("name", "target_name"),
+            ("location", "target_location"),
+            ("unit", "target_unit"),
+            ("type", "target_type"),
+            ("reference product", "target_reference_product"),
+        ):
+            if column == "target_code":
+                columns[column] = (nodes[field], None, targets)
+            else:
+                columns[column] = (*_categories(nodes[field], target_used), targets)
+        for field, column in (
+            ("database", "source_database"),
+            ("code", "source_code"),
+            ("name", "source_name"),
+            ("location", "source_location"),
+            ("unit", "source_unit"),
+            ("categories", "source_categories"),
+            ("product", "source_product"),
+        ):
+            columns[column] = (*_categories(nodes[field], source_used), sources)
+
+        def dataframe(start: int, end: int) -> pd.DataFrame:
+            data = {}
+            for column, (values, categories, positions) in columns.items():
+                if positions is None:
+                    values = values[start:end]
                 else:
-                    arr = np.array(
-                        [labels.consumption_edge_default] * len(resource["data"]["array"])
-                    )
-                    arr[resource["flip"]["positive"]] = labels.production_edge_default
-                    arrays.append(arr)
+                    values = values[positions[start:end]]
+                if categories is not None:
+                    values = pd.Categorical.from_codes(values, categories=categories)
+                data[column] = values
+            return pd.DataFrame(data)
+
+        if chunk_size is None:
+            stdout_feedback_logger.info("Building dataframe")
+            return dataframe(0, len(edges["amount"]))
+        return (
+            dataframe(start, start + chunk_size)
+            for start in range(0, len(edges["amount"]), chunk_size)
+        )
 
-            return np.hstack(arrays)
 
-        stdout_feedback_logger.info("Loading datapackage")
-        exchanges = IOTableExchanges(datapackage=self.datapackage())
+def _node_metadata(ids: np.ndarray, database_names: Sequence[str]) -> dict:
+    """Read the ``edges_to_dataframe`` metadata of the nodes ``ids``, with one query for each
+    database in ``database_names``, and one for the remaining ids.
+
+    Returns ``{"id": sorted ids, field: object array}``. Raises ``UnknownObject`` for missing
+    nodes."""
+    fields = ("name", "location", "unit", "reference product", "product")
+    wanted = set(ids.tolist())
+    rows = {}
+
+    def add(query):
+        for id_, database, code, data in query.tuples().iterator():
+            if id_ in wanted:
+                categories = data.get("categories")
+                rows[id_] = (
+                    database,
+                    code,
+                    *(data.get(field) for field in fields),
+                    data.get("type", labels.process_node_default),
+                    "::".join(categories) if categories else None,
+                )
+
+    select = ActivityDataset.select(
+        ActivityDataset.id, ActivityDataset.database, ActivityDataset.code, ActivityDataset.data
+    )
+    for name in dict.fromkeys(database_names):
+        add(select.where(ActivityDataset.database == name))
+    missing = sorted(wanted.difference(rows))
+    for start in range(0, len(missing), 500):
+        add(select.where(ActivityDataset.id << missing[start : start + 500]))
+    if len(rows) < len(wanted):
+        raise UnknownObject(f"Nodes {sorted(wanted.difference(rows))[:10]} don't exist")
+
+    result = {"id": ids}
+    values = [rows[id_] for id_ in ids.tolist()]
+    for index, field in enumerate(("database", "code", *fields, "type", "categories")):
+        result[field] = np.empty(len(ids), dtype=object)
+        result[field][:] = [row[index] for row in values]
+    return result
+
+
+def _categories(values: np.ndarray, used: np.ndarray) -> tuple:
+    """Return the ``(codes, categories)`` of ``values`` for a categorical column; categories are
+    sorted, and only include the ``used`` values, like ``astype("category")``. ``None`` is
+    missing (code -1)."""
+    codes = np.full(len(values), -1, dtype=np.int64)
+    present = used & np.array([value is not None for value in values], dtype=bool)
+    categories, codes[present] = np.unique(values[present], return_inverse=True)
+    return codes, categories
+
+
+def _sort_by_column(vector: dict) -> tuple:
+    """Sort the arrays of the persistent ``vector`` by column and row, and build a CSC-style
+    column index.
+
+    Returns the sorted vector, and the column index ``{"columns": sorted column ids, "pointers":
+    positions}``; the values of column ``columns[i]`` are at ``pointers[i]:pointers[i + 1]``."""
+    indices = vector["indices_array"]
+    order = np.lexsort((indices["row"], indices["col"]))
+    vector = {
+        key: (value[order] if key in VECTOR_ARRAYS and value is not None else value)
+        for key, value in vector.items()
+    }
+    columns, starts = np.unique(vector["indices_array"]["col"], return_index=True)
+    index = {
+        "columns": columns.tolist(),
+        "pointers": starts.tolist() + [len(order)],
+    }
+    return vector, index
+
+
+def _file_state(filepath: Path) -> Optional[tuple]:
+    """Identify the version of a processed datapackage, or ``None`` if it doesn't exist"""
+    # Written last, also in directory datapackages
+    if filepath.is_dir():
+        filepath = filepath / "datapackage.json"
+    if not filepath.exists():
+        return None
+    stat = filepath.stat()
+    return (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+
+
+def _resource_position(dp: Datapackage, name: str) -> Optional[int]:
+    for position, resource in enumerate(dp.resources):
+        if resource["name"] == name:
+            return position
+    return None
+
+
+def _vector_array(dp: Datapackage, group: str, kind: str) -> np.ndarray:
+    """Return the ``kind`` array of the persistent vector ``group``; ``bw_processing`` doesn't
+    store flip arrays without flipped values"""
+    position = _resource_position(dp, f"{group}.{kind}")
+    if position is None and kind == "flip":
+        return np.zeros(len(dp.get_resource(f"{group}.indices")[0]), dtype=bool)
+    return dp.get_resource(position)[0]
+
+
+def _edge_arrays(rows, cols, values, flip=None) -> tuple:
+    """Return the ``indices``, ``values`` and ``flip`` (can be ``None``) arrays of edges"""
+    indices = np.empty(len(rows), dtype=INDICES_DTYPE)
+    indices["row"], indices["col"] = rows, cols
+    values = np.asarray(values, dtype=np.float64)
+    flip = None if flip is None else np.asarray(flip, dtype=bool)
+    if not len(indices) == len(values) == (len(indices) if flip is None else len(flip)):
+        raise ValueError(
+            f"Edge arrays have different lengths: {len(indices)}, {len(values)}, "
+            f"{None if flip is None else len(flip)}"
+        )
+    return indices, values, flip
+
+
+def _last_edges(indices: np.ndarray, values: np.ndarray, flip: Optional[np.ndarray]) -> tuple:
+    """Keep only the last of several edges with the same row and column ids"""
+    _, last = np.unique(indices[::-1], return_index=True)
+    keep = np.sort(len(indices) - 1 - last)
+    return indices[keep], values[keep], (None if flip is None else flip[keep])
+
+
+def _edge_positions(dp: Datapackage, name: str, indices: np.ndarray) -> tuple:
+    """Find the edges ``indices`` in the persistent vector ``name`` of ``dp``.
+
+    Returns the position of each edge (``-1`` if it doesn't exist), and the positions of further
+    stored edges with the same row and column ids, whose values are summed with the first."""
+    position = _resource_position(dp, f"{name}.indices")
+    if position is None:
+        return np.full(len(indices), -1, dtype=np.int64), np.zeros(0, dtype=np.int64)
+    stored = dp.get_resource(position)[0]
+
+    # Only compare with the stored edges in the same columns
+    index_position = _resource_position(dp, f"{name}_column_index")
+    if index_position is None:
+        candidates = np.flatnonzero(np.isin(stored["col"], indices["col"]))
+    else:
+        index = dp.get_resource(index_position)[0]
+        columns, pointers = np.array(index["columns"]), np.array(index["pointers"])
+        found = np.searchsorted(columns, np.unique(indices["col"]))
+        found = found[found < len(columns)]
+        found = found[np.isin(columns[found], indices["col"])]
+        candidates = np.concatenate(
+            [np.arange(pointers[i], pointers[i + 1]) for i in found] or [np.zeros(0, dtype=int)]
+        )
 
-        target_ids = np.hstack(
-            [resource["indices"]["array"]["col"] for resource in exchanges.resources]
+    # Number the row and column ids, and combine them to one integer key per edge
+    pairs = np.concatenate((stored[candidates], indices))
+    _, rows = np.unique(pairs["row"], return_inverse=True)
+    _, cols = np.unique(pairs["col"], return_inverse=True)
+    keys = cols.astype(np.int64) * (rows.max(initial=0) + 1) + rows
+    stored_keys, keys = keys[: len(candidates)], keys[len(candidates) :]
+    order = np.argsort(stored_keys, kind="stable")
+    stored_keys, candidates = stored_keys[order], candidates[order]
+    left = np.searchsorted(stored_keys, keys, side="left")
+    right = np.searchsorted(stored_keys, keys, side="right")
+
+    first = np.full(len(indices), -1, dtype=np.int64)
+    first[right > left] = candidates[left[right > left]]
+    duplicates = [candidates[left[i] + 1 : right[i]] for i in np.flatnonzero(right - left > 1)]
+    return first, np.concatenate(duplicates or [np.zeros(0, dtype=np.int64)])
+
+
+def _apply_overlay(dp: Datapackage, overlay: Datapackage):
+    """Apply the edges of the ``overlay`` datapackage to the loaded arrays of ``dp``.
+
+    Existing edges are changed in the arrays of their persistent vector, and new edges are added
+    as separate resource groups, which are used after the original vectors."""
+    for resource in overlay.resources:
+        if resource["kind"] != "indices":
+            continue
+        group = resource["group"]
+        name = group[: -len("_overlay")]
+        indices, values, flip = (
+            _vector_array(overlay, group, kind) for kind in ("indices", "data", "flip")
         )
-        source_ids = np.hstack(
-            [resource["indices"]["array"]["row"] for resource in exchanges.resources]
+        first, duplicates = _edge_positions(dp, name, indices)
+        found = first >= 0
+
+        if found.any():
+            if _resource_position(dp, f"{name}.flip") is None and flip[found].any():
+                data_resource = dp.get_resource(f"{name}.data")[1]
+                dp.resources.append(
+                    dict(data_resource, name=f"{name}.flip", kind="flip", path=f"{name}.flip.npy")
+                )
+                dp.data.append(np.zeros(data_resource["nrows"], dtype=bool))
+            for kind, array in (("data", values), ("flip", flip)):
+                position = _resource_position(dp, f"{name}.{kind}")
+                if position is None:
+                    continue
+                stored = dp.data[position]
+                if not stored.flags.writeable:
+                    stored = dp.data[position] = np.array(stored)
+                stored[first[found]] = array[found]
+                if kind == "data":
+                    stored[duplicates] = 0
+
+        if not found.all():
+            for kind, array in (("indices", indices), ("data", values), ("flip", flip)):
+                position = _resource_position(overlay, f"{group}.{kind}")
+                if position is None:
+                    continue
+                dp.resources.append(dict(overlay.resources[position], nrows=int((~found).sum())))
+                dp.data.append(np.array(array[~found]))
+
+
+def _sparse_to_vector(matrix, row_ids, col_ids, flip: bool = False) -> dict:
+    """Build a persistent vector from the nonzero values of a ``scipy.sparse`` ``matrix``, whose
+    rows and columns correspond to the node ids in ``row_ids`` and ``col_ids``.
+
+    If ``flip``, only positive values on the diagonal (where the row and column ids are the same)
+    keep their sign; all other values are negated and flipped."""
+    row_ids, col_ids = np.asarray(row_ids), np.asarray(col_ids)
+    if matrix.shape != (len(row_ids), len(col_ids)):
+        raise ValueError(
+            f"Matrix shape {matrix.shape} doesn't match number of row ({len(row_ids)}) and "
+            f"column ({len(col_ids)}) ids"
         )
-        edge_amounts = np.hstack([resource["data"]["array"] for resource in exchanges.resources])
-        edge_types = get_edge_types(exchanges)
-
-        stdout_feedback_logger.info("Creating metadata dataframes")
-        target_metadata = metadata_dataframe(target_ids)
-        source_metadata = metadata_dataframe(source_ids, "source_")
-
-        stdout_feedback_logger.info("Building merged dataframe")
-        df = pd.DataFrame(
-            {
-                "target_id": target_ids,
-                "source_id": source_ids,
-                "edge_amount": edge_amounts,
-                "edge_type": edge_types,
+    matrix = matrix.tocoo()
+    rows, cols, data = matrix.row, matrix.col, matrix.data
+    nonzero = data != 0
+    if not nonzero.all():
+        rows, cols, data = rows[nonzero], cols[nonzero], data[nonzero]
+
+    indices = np.empty(len(data), dtype=INDICES_DTYPE)
+    indices["row"] = row_ids[rows]
+    indices["col"] = col_ids[cols]
+    vector = {
+        "indices_array": indices,
+        "data_array": data.astype(np.float64),
+        "nrows": len(data),
+    }
+    if flip:
+        vector["flip_array"] = (indices["row"] != indices["col"]) | (data <= 0)
+        vector["data_array"][vector["flip_array"]] *= -1
+    return vector
+
+
+class _ChunkSpool:
+    """Append chunks of edges to raw array files in ``directory``, and count the edges per column.
+
+    Each chunk is sorted by column and row before it is written. If the chunks are not in column
+    order, ``vector`` sorts the complete arrays afterwards, reading and writing one chunk at a
+    time."""
+
+    dtypes = {"indices": INDICES_DTYPE, "data": np.float64, "flip": bool}
+
+    def __init__(self, directory: Path):
+        directory.mkdir()
+        self.directory = directory
+        self.files = {key: open(directory / key, "wb") for key in self.dtypes}
+        self.lengths = []
+        self.columns = np.zeros(0, dtype=np.int64)
+        self.counts = np.zeros(0, dtype=np.int64)
+        self.ordered = True
+
+    def append(self, rows, cols, values, flip=None):
+        indices, values, flip = _edge_arrays(rows, cols, values, flip)
+        if flip is None:
+            flip = np.zeros(len(indices), dtype=bool)
+        if not len(indices):
+            return
+
+        order = np.lexsort((indices["row"], indices["col"]))
+        arrays = {"indices": indices[order], "data": values[order], "flip": flip[order]}
+        columns, counts = np.unique(arrays["indices"]["col"], return_counts=True)
+        if not self.columns.size or columns[0] > self.columns[-1]:
+            self.columns = np.concatenate((self.columns, columns))
+            self.counts = np.concatenate((self.counts, counts))
+        elif columns[0] == self.columns[-1]:
+            self.counts[-1] += counts[0]
+            self.columns = np.concatenate((self.columns, columns[1:]))
+            self.counts = np.concatenate((self.counts, counts[1:]))
+        else:
+            self.ordered = False
+            self.columns, inverse = np.unique(
+                np.concatenate((self.columns, columns)), return_inverse=True
+            )
+            self.counts = np.bincount(
+                inverse, weights=np.concatenate((self.counts, counts))
+            ).astype(np.int64)
+
+        for key, array in arrays.items():
+            array.tofile(self.files[key])
+        self.lengths.append(len(indices))
+
+    def vector(self) -> tuple:
+        """Return the persistent vector of all edges as memory mapped arrays, and its column index
+        (see ``_sort_by_column``)."""
+        for file in self.files.values():
+            file.close()
+        nrows = sum(self.lengths)
+        arrays = {key: self._array(key, "r", nrows) for key in self.dtypes}
+        pointers = np.concatenate(([0], np.cumsum(self.counts)))
+
+        if not self.ordered:
+            unsorted, arrays = arrays, {
+                key: self._array(f"{key}.sorted", "w+", nrows) for key in self.dtypes
             }
-        )
-        df = df.merge(target_metadata, on="target_id")
-        df = df.merge(source_metadata, on="source_id")
-
-        categorical_columns = [
-            "target_database",
-            "target_name",
-            "target_reference_product",
-            "target_location",
-            "target_unit",
-            "target_type",
-            "source_database",
-            "source_code",
-            "source_name",
-            "source_product",
-            "source_location",
-            "source_unit",
-            "source_categories",
-            "edge_type",
-        ]
-        stdout_feedback_logger.info("Compressing DataFrame")
-        for column in categorical_columns:
-            if column in df.columns:
-                df[column] = df[column].astype("category")
-
-        return df
+            # Next free position in each column
+            cursor = pointers[:-1].copy()
+            start = 0
+            for length in self.lengths:
+                chunk = slice(start, start + length)
+                start += length
+                columns, first, counts = np.unique(
+                    unsorted["indices"][chunk]["col"], return_index=True, return_counts=True
+                )
+                position = np.searchsorted(self.columns, columns)
+                target = np.repeat(cursor[position] - first, counts) + np.arange(length)
+                cursor[position] += counts
+                for key, array in arrays.items():
+                    array[target] = unsorted[key][chunk]
+
+        vector = {
+            "indices_array": arrays["indices"],
+            "data_array": arrays["data"],
+            "flip_array": arrays["flip"],
+            "nrows": nrows,
+        }
+        return vector, {"columns": self.columns.tolist(), "pointers": pointers.tolist()}
+
+    def _array(self, filename: str, mode: str, nrows: int) -> np.ndarray:
+        dtype = self.dtypes[filename.split(".")[0]]
+        if not nrows:
+            return np.zeros(0, dtype=dtype)
+        return np.memmap(self.directory / filename, dtype=dtype, mode=mode, shape=(nrows,))
@@ -1,16 +1,22 @@
+import bisect
 import itertools
 from collections.abc import Iterable, Mapping
-from typing import Optional
+from typing import Optional, Sequence
 from warnings import warn
 
 import numpy as np
 from bw_processing import Datapackage
 
 from bw2data.backends.proxies import Activity, Exchange, Exchanges
+from bw2data.backends.schema import ActivityDataset
 from bw2data.configuration import labels
 from bw2data.errors import InvalidDatapackage
+from bw2data.proxies import ExchangeProxyBase
 from bw2data.utils import get_node
 
+"""Number of edges for which ``IOTableExchanges`` retrieves the input and output nodes at once"""
+NODE_BATCH_SIZE = 5000
+
 
 class ReadOnlyExchange(Mapping):
     """Non-mutable dictionary which mimics ``bw2data.proxies.Exchange``, but is read-only and doesn't link to a SQLite database row."""
@@ -18,7 +24,7 @@ class ReadOnlyExchange(Mapping):
     __contains__ = Exchange.__contains__
     __iter__ = Exchange.__iter__
     __len__ = Exchange.__len__
-    __getitem__ = Exchange.__getitem__
+    __getitem__ = ExchangeProxyBase.__getitem__
     __eq__ = Exchange.__eq__
     __hash__ = Exchange.__hash__
 
@@ -26,7 +32,7 @@ class ReadOnlyExchange(Mapping):
     unit = Exchange.unit
 
     lca = Exchange.lca
-    as_dict = Exchange.as_dict
+    as_dict = ExchangeProxyBase.as_dict
 
     def __lt__(self, other):
         if not isinstance(other, ReadOnlyExchange):
@@ -42,12 +48,15 @@ class ReadOnlyExchange(Mapping):
             self.amount, self.input.get("unit"), self.input, self.output
         )
 
-    def __init__(self, **kwargs):
+    def __init__(self, nodes: Optional[Mapping] = None, **kwargs):
+        """``nodes`` is an optional ``{id: node}`` mapping of already retrieved nodes; other input
+        and output nodes are retrieved with ``get_node``."""
         self.valid(dct=kwargs)
         input_id = kwargs.pop("input")
         output_id = kwargs.pop("output")
-        self.input = get_node(id=input_id)
-        self.output = get_node(id=output_id)
+        nodes = nodes or {}
+        self.input = nodes[input_id] if input_id in nodes else get_node(id=input_id)
+        self.output = nodes[output_id] if output_id in nodes else get_node(id=output_id)
         self.amount = kwargs["amount"]
         self._data = kwargs
         self._data["input"] = self.input.key
@@ -102,7 +111,7 @@ class IOTableExchanges(Iterable):
             )
 
         resources = self._group_and_filter_resources(datapackage)
-        self._add_arrays_to_resources(resources, datapackage)
+        self._add_arrays_to_resources(resources, datapackage, target)
         resources = self._reduce_arrays_to_selected_types(
             resources, technosphere, production, biosphere
         )
@@ -121,18 +130,40 @@ class IOTableExchanges(Iterable):
 
     def _group_and_filter_resources(self, datapackage):
         resources = [
-            {obj["kind"]: obj for obj in group if obj["category"] == "vector"}
-            for _, group in itertools.groupby(datapackage.resources, lambda x: x["group"])
+            {obj["kind"]: obj for obj in group if obj.get("category") == "vector"}
+            for _, group in itertools.groupby(datapackage.resources, lambda x: x.get("group"))
         ]
         return [obj for obj in resources if obj]
 
-    def _add_arrays_to_resources(self, resources, datapackage):
+    def _column_slice(self, resource, datapackage, target):
+        """Return the slice with the values of ``target`` if the arrays of ``resource`` are sorted
+        by column, otherwise ``None``.
+
+        Datapackages written by ``IOTableBackend.write_exchanges`` have a column index for each
+        matrix."""
+        group = resource["data"]["group"]
+        for index, obj in enumerate(datapackage.resources):
+            if obj.get("kind") == "column_index" and obj.get("valid_for") == group:
+                column_index = datapackage.get_resource(index)[0]
+                break
+        else:
+            return None
+        columns, pointers = column_index["columns"], column_index["pointers"]
+        position = bisect.bisect_left(columns, target.id)
+        if position == len(columns) or columns[position] != target.id:
+            return slice(0, 0)
+        return slice(pointers[position], pointers[position + 1])
+
+    def _add_arrays_to_resources(self, resources, datapackage, target=None):
         for resource in resources:
-            resource["data"]["array"] = datapackage.get_resource(resource["data"]["name"])[0]
-            resource["indices"]["array"] = datapackage.get_resource(resource["indices"]["name"])[0]
-            if "flip" in resource:
-                resource["flip"]["array"] = datapackage.get_resource(resource["flip"]["name"])[0]
-            else:
+            selection = None
+            if target is not None:
+                selection = self._column_slice(resource, datapackage, target)
+            for kind in ("data", "indices", "flip"):
+                if kind in resource:
+                    array, _ = datapackage.get_resource(resource[kind]["name"])
+                    resource[kind]["array"] = array if selection is None else array[selection]
+            if "flip" not in resource:
                 resource["flip"] = {"array": np.zeros_like(resource["data"]["array"], dtype=bool)}
 
             # Add array indicating if values are positive after combining data and flip
@@ -176,48 +207,95 @@ class IOTableExchanges(Iterable):
         resource["flip"]["array"] = resource["flip"]["array"][mask]
         resource["flip"]["positive"] = resource["flip"]["positive"][mask]
 
-    def __iter__(self):
-        for row, col, value in self._raw_technosphere_iterator(negative=False):
-            yield ReadOnlyExchange(
-                input=row,
-                output=col,
-                amount=value,
-                uncertainty_type=0,
-                type=labels.production_edge_default,
-            )
-        for row, col, value in self._raw_technosphere_iterator(negative=True):
-            yield ReadOnlyExchange(
-                input=row,
-                output=col,
-                amount=value,
-                uncertainty_type=0,
-                type=labels.consumption_edge_default,
-            )
-        for row, col, value in self._raw_biosphere_iterator():
-            yield ReadOnlyExchange(
-                input=row,
-                output=col,
-                amount=value,
-                uncertainty_type=0,
-                type=labels.biosphere_edge_default,
+    @property
+    def edge_types(self) -> tuple:
+        """Edge type labels for the codes in ``as_arrays()["type"]``."""
+        return (
+            labels.production_edge_default,
+            labels.consumption_edge_default,
+            labels.biosphere_edge_default,
+        )
+
+    def _columns(self):
+        """Yield ``(indices, amounts, edge type code)`` arrays in iteration order."""
+        technosphere = [
+            resource
+            for resource in self.resources
+            if resource["data"]["matrix"] == "technosphere_matrix"
+        ]
+        for code, positive in ((0, True), (1, False)):
+            for resource in technosphere:
+                mask = resource["flip"]["positive"] == positive
+                yield resource["indices"]["array"][mask], resource["data"]["array"][mask], code
+        for resource in self.resources:
+            if resource["data"]["matrix"] == "biosphere_matrix":
+                yield resource["indices"]["array"], resource["data"]["array"], 2
+
+    def as_arrays(self, fields: Sequence[str] = ()) -> dict:
+        """Return the edges as NumPy arrays, without creating ``ReadOnlyExchange`` objects.
+
+        The returned dictionary has the keys ``row`` (input node ids), ``col`` (output node ids),
+        ``amount``, and ``type``. ``type`` has the codes of the labels in ``edge_types``, i.e. 0
+        for production, 1 for technosphere and 2 for biosphere edges. Edges are in iteration
+        order.
+
+        ``fields`` are node attributes, like ``name`` or ``unit``, which are added as object arrays
+        ``input_{field}`` and ``output_{field}``. The nodes are retrieved in bulk, once per node.
+
+        """
+        columns = list(self._columns())
+        result = {
+            "row": np.array([], dtype=np.int64),
+            "col": np.array([], dtype=np.int64),
+            "amount": np.array([], dtype=np.float64),
+            "type": np.array([], dtype=np.int8),
+        }
+        if columns:
+            result["row"] = np.concatenate([indices["row"] for indices, _, _ in columns])
+            result["col"] = np.concatenate([indices["col"] for indices, _, _ in columns])
+            result["amount"] = np.concatenate([amounts for _, amounts, _ in columns])
+            result["type"] = np.concatenate(
+                [np.full(len(amounts), code, dtype=np.int8) for _, amounts, code in columns]
             )
 
-    def _raw_technosphere_iterator(self, negative=True):
-        tm = lambda x: any(obj.get("matrix") == "technosphere_matrix" for obj in x.values())
-        for resource in filter(tm, self.resources):
-            for (row, col), value, positive_flag in zip(
-                resource["indices"]["array"],
-                resource["data"]["array"],
-                resource["flip"]["positive"],
-            ):
-                if positive_flag != negative:
-                    yield (row, col, value)
+        if fields:
+            nodes = _get_nodes(np.union1d(result["row"], result["col"]))
+            for label, ids in (("input", result["row"]), ("output", result["col"])):
+                unique, inverse = np.unique(ids, return_inverse=True)
+                for field in fields:
+                    values = np.empty(len(unique), dtype=object)
+                    for index, id_ in enumerate(unique.tolist()):
+                        node = nodes[id_] if id_ in nodes else get_node(id=id_)
+                        values[index] = node.get(field)
+                    result[f"{label}_{field}"] = values[inverse]
+        return result
 
-    def _raw_biosphere_iterator(self):
-        bm = lambda x: any(obj.get("matrix") == "biosphere_matrix" for obj in x.values())
-        for resource in filter(bm, self.resources):
-            for (row, col), value in zip(resource["indices"]["array"], resource["data"]["array"]):
-                yield (row, col, value)
+    def __iter__(self):
+        arrays = self.as_arrays()
+        edge_types = self.edge_types
+        rows, cols = arrays["row"].tolist(), arrays["col"].tolist()
+        amounts, types = arrays["amount"].tolist(), arrays["type"].tolist()
+        nodes = {}
+        for start in range(0, len(rows), NODE_BATCH_SIZE):
+            end = start + NODE_BATCH_SIZE
+            nodes.update(
+                _get_nodes(set(rows[start:end]).union(cols[start:end]).difference(nodes))
+            )
+            for row, col, amount, code in zip(
+                rows[start:end], cols[start:end], amounts[start:end], types[start:end]
+            ):
+                yield ReadOnlyExchange(
+                    nodes=nodes,
+                    input=row,
+                    output=col,
+                    amount=amount,
+                    uncertainty_type=0,
+                    type=edge_types[code],
+                )
+
+    def _iterate_with_endpoints(self):
+        # ``ReadOnlyExchange`` already resolves its input and output nodes
+        return iter(self)
 
     def __next__(self):
         raise NotImplementedError
@@ -226,6 +304,21 @@ class IOTableExchanges(Iterable):
         return sum([len(resource["data"]["array"]) for resource in self.resources])
 
 
+def _get_nodes(ids) -> dict:
+    """Retrieve the nodes with the given ``ids`` in bulk. Returns ``{id: node}``; ids which don't
+    exist are left out."""
+    from bw2data import databases
+    from bw2data.subclass_mapping import NODE_PROCESS_CLASS_MAPPING
+
+    ids = [int(id_) for id_ in ids]
+    nodes = {}
+    for start in range(0, len(ids), 500):
+        for obj in ActivityDataset.select().where(ActivityDataset.id << ids[start : start + 500]):
+            backend = databases[obj.database].get("backend", "sqlite")
+            nodes[obj.id] = NODE_PROCESS_CLASS_MAPPING[backend](obj)
+    return nodes
+
+
 class IOTableActivity(Activity):
     def delete(self) -> None:
         # TBD; needs to rewrite arrays so not so simple...
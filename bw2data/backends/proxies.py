@@ -1,4 +1,3 @@
-import copy
 import sys
 import uuid
 import warnings
@@ -11,6 +10,7 @@ else:
     from typing import Self
 
 import pandas as pd
+from peewee import JOIN
 
 try:
     from bw_temporalis import TemporalDistribution
@@ -19,6 +19,7 @@ except ImportError:
 
 from bw2data import databases, geomapping, get_node, projects
 from bw2data.backends import sqlite3_lci_db
+from bw2data.batching import current_batch
 from bw2data.backends.schema import ActivityDataset, ExchangeDataset
 from bw2data.backends.typos import (
     check_activity_keys,
@@ -28,7 +29,7 @@ from bw2data.backends.typos import (
 )
 from bw2data.backends.utils import dict_as_activitydataset, dict_as_exchangedataset
 from bw2data.configuration import labels
-from bw2data.errors import ValidityError
+from bw2data.errors import UnknownObject, ValidityError
 from bw2data.logs import stdout_feedback_logger
 from bw2data.proxies import ActivityProxyBase, ExchangeProxyBase
 from bw2data.search import IndexManager
@@ -40,6 +41,29 @@ else:
     from typing import TypeAlias
 
 
+def _update_search_index(filename: str, ds: dict) -> None:
+    session = current_batch()
+    if session is not None:
+        session.update_search_index(filename, [ds])
+    else:
+        IndexManager(filename).update_dataset(ds)
+
+
+def _delete_from_search_index(filename: str, ds: dict) -> None:
+    session = current_batch()
+    if session is not None:
+        session.delete_from_search_index(filename, [ds])
+    else:
+        IndexManager(filename).delete_dataset(ds)
+
+
+def _send_queued_save_signals() -> None:
+    # Keep queued save signals ahead of signals which can't wait for the end of a batch
+    session = current_batch()
+    if session is not None:
+        session.send_save_signals()
+
+
 class Exchanges(Iterable):
     """Iterator for exchanges with some additional methods.
 
@@ -63,9 +87,16 @@ class Exchanges(Iterable):
         # Delete all
         exchanges.delete()
 
+    Pass ``prefetch=("input", "output")`` to load the linked input and/or output nodes in the same
+    query as the exchanges, instead of with two separate queries per exchange when ``.input`` and
+    ``.output`` are first accessed.
+
     """
 
-    def __init__(self, key, kinds=None, reverse=False):
+    def __init__(self, key, kinds=None, reverse=False, prefetch=()):
+        if set(prefetch).difference({"input", "output"}):
+            raise ValueError(f"`prefetch` can only include 'input' and 'output'; got {prefetch}")
+        self._prefetch = tuple(prefetch)
         self._key = key
         if reverse:
             self._args = [
@@ -98,9 +129,46 @@ class Exchanges(Iterable):
     def _get_queryset(self):
         return ExchangeDataset.select().where(*self._args).order_by(ExchangeDataset.id)
 
+    def _get_prefetch_queryset(self, prefetch):
+        """Join the nodes in ``prefetch`` onto the exchanges as ``_input_document`` and
+        ``_output_document``. These are ``None`` if the linked node doesn't exist."""
+        aliases = {label: ActivityDataset.alias() for label in prefetch}
+        qs = ExchangeDataset.select(ExchangeDataset, *aliases.values())
+        for label, alias in aliases.items():
+            qs = qs.switch(ExchangeDataset).join(
+                alias,
+                join_type=JOIN.LEFT_OUTER,
+                on=(
+                    (getattr(ExchangeDataset, f"{label}_database") == alias.database)
+                    & (getattr(ExchangeDataset, f"{label}_code") == alias.code)
+                ),
+                attr=f"_{label}_document",
+            )
+        return qs.where(*self._args).order_by(ExchangeDataset.id)
+
+    def _iterate(self, prefetch):
+        if not prefetch:
+            for obj in self._get_queryset():
+                yield Exchange(obj)
+            return
+
+        for obj in self._get_prefetch_queryset(prefetch):
+            exc = Exchange(obj)
+            for label in prefetch:
+                document = getattr(obj, f"_{label}_document", None)
+                if document is not None:
+                    setattr(exc, f"_{label}", Activity(document))
+            yield exc
+
     def __iter__(self):
-        for obj in self._get_queryset():
-            yield Exchange(obj)
+        return self._iterate(self._prefetch)
+
+    def _iterate_with_endpoints(self):
+        for edge in self._iterate(("input", "output")):
+            for label in ("input", "output"):
+                if not hasattr(edge, f"_{label}"):
+                    raise UnknownObject(f"Node {edge[label]} (edge {label}) doesn't exist")
+            yield edge
 
     def __len__(self):
         return self._get_queryset().count()
@@ -143,12 +211,14 @@ class Exchanges(Iterable):
 
         The functions in ``formatters`` don't need to return anything, they modify ``row`` in place.
 
+        Source and target nodes are retrieved in the same query as the edges.
+
         Returns a pandas ``DataFrame``.
 
         """
         result = []
 
-        for edge in self:
+        for edge in self._iterate_with_endpoints():
             row = {
                 "target_id": edge.output["id"],
                 "target_database": edge.output["database"],
@@ -298,7 +368,7 @@ class Activity(ActivityProxyBase):
             ).execute()
         except ActivityParameter.DoesNotExist:
             pass
-        IndexManager(Database(self["database"]).filename).delete_dataset(self._data)
+        _delete_from_search_index(Database(self["database"]).filename, self._data)
         self.exchanges().delete(allow_in_sourced_project=True)
         self.upstream().delete(allow_in_sourced_project=True)
 
@@ -377,7 +447,7 @@ class Activity(ActivityProxyBase):
             geomapping.add([self["location"]])
 
         if databases[self["database"]].get("searchable", True):
-            IndexManager(Database(self["database"]).filename).update_dataset(self._data)
+            _update_search_index(Database(self["database"]).filename, self._data)
 
     def _change_code(self, new_code: str, signal: bool = True):
         if self["code"] == new_code:
@@ -409,13 +479,14 @@ class Activity(ActivityProxyBase):
         if databases[self["database"]].get("searchable"):
             from bw2data import Database
 
-            IndexManager(Database(self["database"]).filename).delete_dataset(self)
+            _delete_from_search_index(Database(self["database"]).filename, self._data)
             self._data["code"] = new_code
-            IndexManager(Database(self["database"]).filename).add_datasets([self])
+            _update_search_index(Database(self["database"]).filename, self._data)
         else:
             self._data["code"] = new_code
 
         if signal:
+            _send_queued_save_signals()
             on_activity_code_change.send(
                 old={"id": self.id, "code": previous},
                 new={"id": self.id, "code": new_code},
@@ -446,13 +517,14 @@ class Activity(ActivityProxyBase):
         if databases[self["database"]].get("searchable"):
             from bw2data import Database
 
-            IndexManager(Database(self["database"]).filename).delete_dataset(self)
+            _delete_from_search_index(Database(self["database"]).filename, self._data)
             self._data["database"] = new_database
-            IndexManager(Database(self["database"]).filename).add_datasets([self])
+            _update_search_index(Database(self["database"]).filename, self._data)
         else:
             self._data["database"] = new_database
 
         if signal:
+            _send_queued_save_signals()
             on_activity_database_change.send(
                 old={"id": self.id, "database": previous},
                 new={"id": self.id, "database": new_database},
@@ -718,6 +790,7 @@ class Exchange(ExchangeProxyBase):
         if document is None:
             self._document = self.ORMDataset()
             self._data = kwargs
+            self._temporal_distribution_pending = False
         else:
             self._document = document
             self._data = self._document.data
@@ -729,87 +802,89 @@ class Exchange(ExchangeProxyBase):
                 self._document.output_database,
                 self._document.output_code,
             )
-            # Restore temporal_distribution from JSON if present
-            self._data = self._restore_temporal_distributions(self._data)
+            # JSON temporal distributions are only restored on first access
+            self._temporal_distribution_pending = "temporal_distribution" in self._data
 
     @property
     def id(self):
         return self._document.id
 
+    def __getitem__(self, key):
+        if key == "temporal_distribution" and self._temporal_distribution_pending:
+            self._restore_temporal_distributions()
+        return super().__getitem__(key)
+
+    def __setitem__(self, key, value):
+        if key == "temporal_distribution":
+            self._temporal_distribution_pending = False
+        super().__setitem__(key, value)
+
+    def __delitem__(self, key):
+        if key == "temporal_distribution":
+            self._temporal_distribution_pending = False
+        super().__delitem__(key)
+
+    def as_dict(self):
+        if self._temporal_distribution_pending:
+            self._restore_temporal_distributions()
+        return super().as_dict()
+
     def _process_temporal_distributions(self, data):
         """Process temporal_distribution attributes by converting TemporalDistribution instances to JSON.
 
-        This method creates a copy of the data and converts any TemporalDistribution instances
-        found in 'temporal_distribution' keys to their JSON representation using the to_json method.
-        The original data is not modified.
+        If the 'temporal_distribution' key holds a TemporalDistribution instance, returns a shallow
+        copy of the data with that value converted to its JSON representation using the to_json
+        method. Otherwise the data is returned as-is. The original data is not modified.
 
         Args:
             data: The exchange data dictionary
 
         Returns:
-            A copy of the data with TemporalDistribution instances converted to JSON
+            The data with TemporalDistribution instances converted to JSON
         """
         if TemporalDistribution is None:
             # bw_temporalis not available, return data as-is
             return data
 
-        # Create a deep copy to avoid modifying the original data
-        processed_data = copy.deepcopy(data)
-
-        # Check if there's a temporal_distribution key with a TemporalDistribution value
-        if "temporal_distribution" in processed_data:
-            value = processed_data["temporal_distribution"]
-            if isinstance(value, TemporalDistribution):
-                processed_data["temporal_distribution"] = value.to_json()
-
-        return processed_data
-
-    def _restore_temporal_distributions(self, data):
-        """Restore temporal_distribution attributes by converting JSON back to TemporalDistribution instances.
+        value = data.get("temporal_distribution")
+        if isinstance(value, TemporalDistribution):
+            return {**data, "temporal_distribution": value.to_json()}
+        return data
 
-        This method creates a copy of the data and converts any JSON representations
-        of TemporalDistribution instances back to TemporalDistribution objects.
-        The original data is not modified.
+    def _restore_temporal_distributions(self):
+        """Restore the temporal_distribution attribute by converting JSON back to a TemporalDistribution instance.
 
-        Args:
-            data: The exchange data dictionary
-
-        Returns:
-            A copy of the data with JSON temporal_distribution converted back to TemporalDistribution instances
+        Called on first access to the 'temporal_distribution' key, so exchanges which are never
+        asked for their temporal distribution don't pay for decoding. The data is only (shallowly)
+        copied when a TemporalDistribution is created, so the document data is not modified.
         """
+        self._temporal_distribution_pending = False
+        value = self._data.get("temporal_distribution")
+        if not (isinstance(value, dict) and value.get("type") == "temporal_distribution"):
+            return
+
         if TemporalDistribution is None:
-            # bw_temporalis not available, return data as-is
-            if "temporal_distribution" in data:
-                value = data["temporal_distribution"]
-                if isinstance(value, dict) and value.get("type") == "temporal_distribution":
-                    warnings.warn(
-                        "Found temporal_distribution JSON data but bw_temporalis library is not installed. "
-                        "TemporalDistribution object will not be restored. Install bw_temporalis to enable "
-                        "temporal distribution functionality.",
-                        UserWarning,
-                    )
-            return data
+            warnings.warn(
+                "Found temporal_distribution JSON data but bw_temporalis library is not installed. "
+                "TemporalDistribution object will not be restored. Install bw_temporalis to enable "
+                "temporal distribution functionality.",
+                UserWarning,
+            )
+            return
 
-        # Create a deep copy to avoid modifying the original data
-        processed_data = copy.deepcopy(data)
-
-        # Check if there's a temporal_distribution key with JSON data
-        if "temporal_distribution" in processed_data:
-            value = processed_data["temporal_distribution"]
-            if isinstance(value, dict) and value.get("type") == "temporal_distribution":
-                # This looks like JSON from a TemporalDistribution.to_json() call
-                try:
-                    # Create a new TemporalDistribution instance from the JSON data
-                    processed_data["temporal_distribution"] = TemporalDistribution(value["data"])
-                except (KeyError, TypeError, AttributeError, ValueError) as e:
-                    # If conversion fails, leave the data as-is and warn about the error
-                    warnings.warn(
-                        f"Failed to restore TemporalDistribution from JSON data: {value}. "
-                        f"Data will remain as JSON. Error: {str(e)}",
-                        UserWarning,
-                    )
-
-        return processed_data
+        # This looks like JSON from a TemporalDistribution.to_json() call
+        try:
+            # Create a new TemporalDistribution instance from the JSON data
+            restored = TemporalDistribution(value["data"])
+        except (KeyError, TypeError, AttributeError, ValueError) as e:
+            # If conversion fails, leave the data as-is and warn about the error
+            warnings.warn(
+                f"Failed to restore TemporalDistribution from JSON data: {value}. "
+                f"Data will remain as JSON. Error: {str(e)}",
+                UserWarning,
+            )
+            return
+        self._data = {**self._data, "temporal_distribution": restored}
 
     def save(self, signal: bool = True, data_already_set: bool = False, force_insert: bool = False):
         if not data_already_set and not self.valid():
@@ -1,4 +1,7 @@
-from peewee import DoesNotExist, TextField
+from typing import Any
+
+from peewee import DoesNotExist, Model, TextField
+from playhouse.sqlite_ext import AutoIncrementField
 
 from bw2data.errors import UnknownObject
 from bw2data.signals import (
@@ -37,7 +40,45 @@ class ExchangeDataset(SnowflakeIDBaseClass):
     type = TextField()  # Reset from `data`
 
 
+class GeoMappingDataset(Model):
+    """Storage for ``geomapping``. ``AUTOINCREMENT`` ids are never reused, even after deletion.
+
+    ``location`` is the text form of the location (see ``location_as_text``), as in
+    ``ActivityDataset.location``, so the two tables can be joined; ``key`` is the original Python
+    object, e.g. a tuple."""
+
+    id = AutoIncrementField()
+    location = TextField(unique=True)
+    key = PickleField()
+
+
+def location_as_text(location: Any) -> str:
+    """Text form of ``location``, as written to ``ActivityDataset.location`` by ``peewee``"""
+    return location if isinstance(location, str) else str(location)
+
+
+def lci_data_version() -> int:
+    """``PRAGMA data_version`` of the LCI database connection.
+
+    Changes when another connection, e.g. in another process, commits changes to the LCI database;
+    changes made with this connection don't affect it. Much cheaper than a ``SELECT``."""
+    connection = ActivityDataset._meta.database.connection()
+    return connection.execute("PRAGMA data_version").fetchone()[0]
+
+
 _get_id_cache: dict = {}
+_get_id_cache_data_version = None
+
+
+def _check_get_id_cache_data_version() -> None:
+    """Clear ``_get_id_cache`` if another connection, e.g. in another process, committed changes.
+
+    Changes made in this process are handled by the signals below."""
+    global _get_id_cache_data_version
+    version = lci_data_version()
+    if version != _get_id_cache_data_version:
+        _get_id_cache.clear()
+        _get_id_cache_data_version = version
 
 
 def get_id(key):
@@ -49,6 +90,7 @@ def get_id(key):
         return key
     else:
         cache_key = (key[0], key[1])
+        _check_get_id_cache_data_version()
         if cache_key in _get_id_cache:
             return _get_id_cache[cache_key]
         try:
@@ -1,3 +1,4 @@
+import ast
 import copy
 import warnings
 from typing import Any, Optional
@@ -137,17 +138,13 @@ def retupleize_geo_strings(value):
 
     We are using a SQLite3 cursor, which means that the Peewee data conversion code is not called. So ``('foo', 'bar')`` is stored as a string, not a tuple. This code tries to do this conversion correctly.
 
-    TODO: Adapt what Peewee does in this case?"""
+    Only Python literals are converted; ``ast.literal_eval`` doesn't execute code."""
     if not value:
         return value
     elif "(" not in value:
         return value
     try:
-        # Is this a dirty, dirty hack, or inspiration?
-        # Location is retrieved as a string from the database
-        # The alternative is to retrieve and process the
-        # entire activity dataset...
-        return eval(value)
-    except NameError:
+        return ast.literal_eval(value)
+    except (ValueError, SyntaxError):
         # Not everything with a parentheses is a tuple.
         return value
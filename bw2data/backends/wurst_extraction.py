@@ -1,11 +1,47 @@
+import collections
 import copy
+import itertools
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterable, Iterator, Optional, Union
 
 from tqdm import tqdm
 
-from bw2data.backends import ActivityDataset, ExchangeDataset, SQLiteBackend
+from bw2data.backends import ActivityDataset, ExchangeDataset, SQLiteBackend, sqlite3_lci_db
+from bw2data.backends.schema import _remove_database_from_get_id_cache
 from bw2data.configuration import labels
 from bw2data.database import DatabaseChooser
+from bw2data.errors import DuplicateNode, InvalidExchange, UnknownObject, UntypedExchange
 from bw2data.logs import stdout_feedback_logger
+from bw2data.meta import databases
+from bw2data.signals import on_database_reset, on_database_write
+from bw2data.snowflake_ids import snowflake_id_generator
+from bw2data.utils import set_correct_process_type
+
+"""Number of activities read, decoded and extracted together by ``extract_brightway_databases``"""
+EXTRACTION_BATCH_SIZE = 500
+
+ACTIVITY_COLUMNS = (
+    ActivityDataset.id,
+    ActivityDataset.database,
+    ActivityDataset.code,
+    ActivityDataset.location,
+    ActivityDataset.name,
+    ActivityDataset.product,
+    ActivityDataset.data,
+)
+"""Document keys which are only added by ``extract_brightway_databases``"""
+EXTRACTED_ACTIVITY_KEYS = ("exchanges", "id", "parameters", "parameters full")
+EXTRACTED_EXCHANGE_KEYS = ("id", "code", "database", "input")
+
+EXCHANGE_COLUMNS = (
+    ExchangeDataset.output_database,
+    ExchangeDataset.output_code,
+    ExchangeDataset.input_database,
+    ExchangeDataset.input_code,
+    ExchangeDataset.type,
+    ExchangeDataset.data,
+)
 
 
 def _list_or_dict(obj):
@@ -139,12 +175,25 @@ def add_input_info_for_external_exchanges(activities, names, add_identifiers=Fal
                 exc["categories"] = obj.data.get("categories")
 
 
-def extract_brightway_databases(database_names, add_properties=False, add_identifiers=False):
+def extract_brightway_databases(
+    database_names,
+    add_properties=False,
+    add_identifiers=False,
+    processes: Optional[int] = 1,
+    as_generator: bool = False,
+) -> Union[list, Iterator[dict]]:
     """Extract a Brightway2 SQLiteBackend database to the Wurst internal format.
 
     ``database_names`` is a list of database names. You should already be in the correct project.
 
-    Returns a list of dataset documents."""
+    Activities and their exchanges are read in batches of ``EXTRACTION_BATCH_SIZE`` activities.
+    By default, the stored data is decoded in this process. With ``processes`` larger than one (or
+    ``None`` for the number of CPUs), it is decoded in a pool of worker processes; on platforms
+    which spawn new processes, scripts using this need an ``if __name__ == "__main__":`` guard.
+    Input metadata is read beforehand with one query joining the exchanges to their input nodes.
+
+    Returns a list of dataset documents, or, with ``as_generator``, a generator which yields them
+    one at a time, so that only a few batches are in memory."""
     ERROR = "Must pass list of database names"
     if isinstance(database_names, str):
         database_names = [database_names]
@@ -154,23 +203,345 @@ def extract_brightway_databases(database_names, add_properties=False, add_identi
     ERROR = "Wrong type of database object (must be SQLiteBackend)"
     assert all(isinstance(obj, SQLiteBackend) for obj in databases), ERROR
 
-    # Construct generators for both activities and exchanges
-    # Need to be clever to minimize copying and memory use
-    activity_qs = ActivityDataset.select().where(ActivityDataset.database << database_names)
-    exchange_qs = ExchangeDataset.select().where(ExchangeDataset.output_database << database_names)
-
-    # Retrieve all activity data
-    stdout_feedback_logger.info("Getting activity data")
-    activities = [extract_activity(o, add_identifiers=add_identifiers) for o in tqdm(activity_qs)]
-    # Add each exchange to the activity list of exchanges
-    stdout_feedback_logger.info("Adding exchange data to activities")
-    add_exchanges_to_consumers(activities, exchange_qs, add_properties)
-    # Add details on exchanges which come from our databases
-    stdout_feedback_logger.info("Filling out exchange data")
-    add_input_info_for_indigenous_exchanges(
-        activities, database_names, add_identifiers=add_identifiers
+    documents = _extract_documents(
+        sorted(database_names), add_properties, add_identifiers, processes or os.cpu_count() or 1
     )
-    add_input_info_for_external_exchanges(
-        activities, database_names, add_identifiers=add_identifiers
+    return documents if as_generator else list(documents)
+
+
+def _extract_documents(
+    database_names: list, add_properties: bool, add_identifiers: bool, processes: int
+) -> Iterator[dict]:
+    """Yield the documents of ``extract_brightway_databases`` in activity order"""
+    activities = ActivityDataset.select(*ACTIVITY_COLUMNS).where(
+        ActivityDataset.database << database_names
     )
-    return activities
+    # Worker processes only pay off if there is more than one batch
+    if processes == 1 or activities.count() <= EXTRACTION_BATCH_SIZE:
+        stdout_feedback_logger.info("Getting exchange input data")
+        inputs = {}
+        for rows in _input_batches(database_names):
+            inputs.update(_decode_inputs(rows))
+        stdout_feedback_logger.info("Getting activity and exchange data")
+        for batch in _activity_batches(activities.order_by(ActivityDataset.id)):
+            documents = _extract_batch(batch, add_properties, add_identifiers)
+            yield from _add_input_info(documents, inputs, database_names)
+        return
+
+    executor = ProcessPoolExecutor(max_workers=processes)
+    try:
+        stdout_feedback_logger.info("Getting exchange input data")
+        futures = [
+            executor.submit(_decode_inputs, rows) for rows in _input_batches(database_names)
+        ]
+        inputs = {}
+        for future in futures:
+            inputs.update(future.result())
+
+        stdout_feedback_logger.info("Getting activity and exchange data")
+        # Only keep a few batches in flight, so that memory use doesn't grow with the database
+        pending = collections.deque()
+        for batch in _activity_batches(activities.order_by(ActivityDataset.id)):
+            pending.append(
+                executor.submit(_extract_batch, batch, add_properties, add_identifiers)
+            )
+            if len(pending) >= 2 * processes:
+                yield from _add_input_info(pending.popleft().result(), inputs, database_names)
+        while pending:
+            yield from _add_input_info(pending.popleft().result(), inputs, database_names)
+    finally:
+        executor.shutdown(cancel_futures=True)
+
+
+def _raw_rows(query) -> Iterator[tuple]:
+    """Execute ``query`` without converting field values, so that data blobs can be decoded in
+    worker processes"""
+    return iter(query.model._meta.database.execute_sql(*query.sql()))
+
+
+def _input_batches(database_names: list) -> Iterator[list]:
+    """Yield batches of the raw rows of all nodes which are inputs to exchanges of
+    ``database_names``"""
+    inputs = (
+        ExchangeDataset.select(ExchangeDataset.input_database, ExchangeDataset.input_code)
+        .where(ExchangeDataset.output_database << database_names)
+        .distinct()
+    )
+    query = ActivityDataset.select(*ACTIVITY_COLUMNS).join(
+        inputs,
+        on=(
+            (ActivityDataset.database == inputs.c.input_database)
+            & (ActivityDataset.code == inputs.c.input_code)
+        ),
+    )
+    rows = _raw_rows(query)
+    while batch := list(itertools.islice(rows, EXTRACTION_BATCH_SIZE)):
+        yield batch
+
+
+def _activity_batches(activities) -> Iterator[list]:
+    """Yield batches of ``(activity row, exchange rows)`` of raw rows from ``activities``"""
+    rows = _raw_rows(activities)
+    while batch := list(itertools.islice(rows, EXTRACTION_BATCH_SIZE)):
+        keys = {(database, code) for _, database, code, *_ in batch}
+        exchanges = collections.defaultdict(list)
+        query = (
+            ExchangeDataset.select(*EXCHANGE_COLUMNS)
+            .where(
+                (ExchangeDataset.output_database << sorted({key[0] for key in keys}))
+                & (ExchangeDataset.output_code << sorted({key[1] for key in keys}))
+            )
+            .order_by(ExchangeDataset.id)
+        )
+        for row in _raw_rows(query):
+            if row[:2] in keys:
+                exchanges[row[:2]].append(row)
+        yield [(row, exchanges[row[1:3]]) for row in batch]
+
+
+def _decode_inputs(rows: list) -> dict:
+    """Decode the input node ``rows``. Returns ``{(database, code): metadata}``.
+
+    Doesn't access the database, so can be run in worker processes."""
+    metadata = {}
+    for id_, database, code, location, name, product, data in rows:
+        data = ActivityDataset.data.python_value(data)
+        metadata[(database, code)] = {
+            "id": id_,
+            "code": code,
+            "database": database,
+            "name": name,
+            "product": product,
+            "location": location,
+            "unit": data.get("unit"),
+            "has unit": "unit" in data,
+            "categories": data.get("categories"),
+        }
+    return metadata
+
+
+def _extract_batch(batch: list, add_properties: bool, add_identifiers: bool) -> list:
+    """Decode a batch of ``(activity row, exchange rows)``, and extract them with
+    ``extract_activity`` and ``extract_exchange``.
+
+    Doesn't access the database, so can be run in worker processes."""
+    documents = []
+    for (id_, database, code, location, name, product, data), exchanges in batch:
+        activity = ActivityDataset(
+            id=id_,
+            database=database,
+            code=code,
+            location=location,
+            name=name,
+            product=product,
+            data=ActivityDataset.data.python_value(data),
+        )
+        document = extract_activity(activity, add_identifiers=add_identifiers)
+        for output_database, output_code, input_database, input_code, type_, data in exchanges:
+            exchange = ExchangeDataset(
+                output_database=output_database,
+                output_code=output_code,
+                input_database=input_database,
+                input_code=input_code,
+                type=type_,
+                data=ExchangeDataset.data.python_value(data),
+            )
+            exc = extract_exchange(exchange, add_properties=add_properties)
+            exc.pop("output")
+            document["exchanges"].append(exc)
+        documents.append(document)
+    return documents
+
+
+def _add_input_info(documents: list, inputs: dict, database_names: list) -> list:
+    """Add the input ``inputs`` metadata to the exchanges of ``documents``, like
+    ``add_input_info_for_indigenous_exchanges`` and ``add_input_info_for_external_exchanges``"""
+    for ds in documents:
+        for exc in ds["exchanges"]:
+            try:
+                obj = inputs[exc["input"]]
+            except KeyError:
+                raise UnknownObject(f"Exchange input {exc['input']} not found")
+            indigenous = obj["database"] in database_names
+            exc["name"] = obj["name"]
+            exc["product"] = obj["product"]
+            if indigenous:
+                exc["unit"] = obj["unit"] if obj["has unit"] else ""
+            else:
+                exc["unit"] = obj["unit"]
+            exc["location"] = obj["location"]
+            exc["database"] = obj["database"]
+            if "id" in ds:
+                exc["id"] = obj["id"]
+                exc["code"] = obj["code"]
+            if exc["type"] in labels.biosphere_edge_types:
+                exc["categories"] = None if indigenous else obj["categories"]
+            if indigenous:
+                exc.pop("input")
+    return documents
+
+
+def write_wurst_documents(
+    database: str,
+    documents: Iterable[dict],
+    process: bool = True,
+    searchable: bool = True,
+    signal: Optional[bool] = None,
+) -> None:
+    """Write Wurst internal format ``documents`` to the SQLiteBackend database ``database``.
+
+    Counterpart of ``extract_brightway_databases``. Existing data in ``database`` is deleted, but
+    its parameters are kept.
+
+    Exchanges with an ``input`` are linked to that node, unless it is one of the ``documents``.
+    Exchanges without ``input`` (inputs from the extracted databases) are linked to the document
+    with their ``database`` and ``code`` if extracted with ``add_identifiers``, and otherwise to
+    the document with their name, product, location and unit.
+
+    All rows are inserted with one ``executemany`` per table in one transaction, without typo
+    checks, index rebuilds or ``VACUUM``; inputs outside ``documents`` are checked with one query
+    per database. Use ``searchable=False`` to skip search indexing, and ``process=False`` to mark
+    the database as dirty instead of processing it, e.g. to process many scenario databases
+    later with ``databases.clean()``."""
+    from bw2data import projects
+
+    if signal is None:
+        signal = projects.dataset.is_sourced
+
+    db = DatabaseChooser(database)
+    ERROR = "Wrong type of database object (must be SQLiteBackend)"
+    assert isinstance(db, SQLiteBackend), ERROR
+
+    documents = list(documents)
+    codes, by_attributes, seen = {}, {}, set()
+    for ds in documents:
+        if ds["code"] in seen:
+            raise DuplicateNode(f"Code {ds['code']} is used by more than one document")
+        seen.add(ds["code"])
+        codes[(ds.get("database"), ds["code"])] = ds["code"]
+        attributes = tuple(ds.get(key) for key in ("name", "reference product", "location", "unit"))
+        by_attributes.setdefault(attributes, ds["code"])
+
+    activities, exchanges, external = [], [], set()
+    for ds in documents:
+        output = (database, ds["code"])
+        edges = []
+        for exc in ds.get("exchanges", []):
+            if "amount" not in exc:
+                raise InvalidExchange
+            if "type" not in exc:
+                raise UntypedExchange
+            edge = exc.copy()
+            for key in EXTRACTED_EXCHANGE_KEYS:
+                edge.pop(key, None)
+            for key in ("production volume", "categories"):
+                if key in edge and edge[key] is None:
+                    del edge[key]
+            edge["input"] = _wurst_input(exc, database, codes, by_attributes)
+            edge["output"] = output
+            if edge["input"][0] != database:
+                external.add(edge["input"])
+            edges.append(edge)
+        data = {key: value for key, value in ds.items() if key not in EXTRACTED_ACTIVITY_KEYS}
+        data["database"] = database
+        if ds.get("parameters full"):
+            data["parameters"] = ds["parameters full"]
+        data["exchanges"] = edges
+        set_correct_process_type(data)
+        del data["exchanges"]
+        activities.append(data)
+        exchanges.extend(edges)
+
+    _check_inputs_exist(external)
+
+    if database not in databases:
+        db.register(write_empty=False)
+    db._set_write_metadata(activities)
+
+    activity_sql = "INSERT INTO {} (id, data, code, database, location, name, product, type) "
+    activity_sql += "VALUES (?, ?, ?, ?, ?, ?, ?, ?)"
+    exchange_sql = "INSERT INTO {} (data, input_database, input_code, output_database, "
+    exchange_sql += "output_code, type) VALUES (?, ?, ?, ?, ?, ?)"
+    with sqlite3_lci_db.atomic():
+        db.delete(keep_params=True, warn=False, vacuum=False, signal=False)
+        connection = sqlite3_lci_db.db.connection()
+        connection.executemany(
+            activity_sql.format(ActivityDataset._meta.table_name),
+            (
+                (
+                    next(snowflake_id_generator),
+                    ActivityDataset.data.db_value(ds),
+                    ds["code"],
+                    database,
+                    ds.get("location"),
+                    ds.get("name"),
+                    ds.get("reference product"),
+                    ds.get("type", labels.process_node_default),
+                )
+                for ds in activities
+            ),
+        )
+        connection.executemany(
+            exchange_sql.format(ExchangeDataset._meta.table_name),
+            (
+                (
+                    ExchangeDataset.data.db_value(exc),
+                    exc["input"][0],
+                    exc["input"][1],
+                    database,
+                    exc["output"][1],
+                    exc["type"],
+                )
+                for exc in exchanges
+            ),
+        )
+    # All nodes have new ids, and ``on_database_write`` isn't always sent
+    _remove_database_from_get_id_cache(db, name=database)
+
+    if searchable:
+        db.make_searchable(reset=True, signal=False)
+    if process:
+        db.process()
+    else:
+        databases.set_dirty(database)
+    if signal:
+        # Same signals as ``write``, so that revisions replace the nodes instead of adding them
+        on_database_reset.send(name=database)
+        on_database_write.send(name=database)
+
+
+def _wurst_input(exc: dict, database: str, codes: dict, by_attributes: dict) -> tuple:
+    """Find the ``(database, code)`` input of the Wurst exchange ``exc`` written to ``database``"""
+    if "input" in exc:
+        key = tuple(exc["input"])
+        return (database, codes[key]) if key in codes else key
+    key = (exc.get("database"), exc.get("code"))
+    if key in codes:
+        return (database, codes[key])
+    attributes = tuple(exc.get(key) for key in ("name", "product", "location", "unit"))
+    if attributes in by_attributes:
+        return (database, by_attributes[attributes])
+    raise UnknownObject(f"Can't link exchange to one of the documents: {attributes}")
+
+
+def _check_inputs_exist(keys: set) -> None:
+    """Raise ``UnknownObject`` if any of the ``(database, code)`` ``keys`` isn't a node"""
+    by_database = collections.defaultdict(set)
+    for database, code in keys:
+        by_database[database].add(code)
+    for database, codes in by_database.items():
+        codes = sorted(codes)
+        found = set()
+        for index in range(0, len(codes), EXTRACTION_BATCH_SIZE):
+            found.update(
+                code
+                for (code,) in ActivityDataset.select(ActivityDataset.code)
+                .where(
+                    (ActivityDataset.database == database)
+                    & (ActivityDataset.code << codes[index : index + EXTRACTION_BATCH_SIZE])
+                )
+                .tuples()
+            )
+        if len(found) < len(codes):
+            missing = sorted(set(codes).difference(found))[:5]
+            raise UnknownObject(f"Exchange inputs not found in database {database}: {missing}")
@@ -0,0 +1,142 @@
+import copy
+from contextlib import contextmanager
+from typing import Optional
+
+_session = None
+
+
+def current_batch() -> Optional["BatchSession"]:
+    """Return the active ``BatchSession``, or ``None`` outside of a ``batch()`` block."""
+    return _session
+
+
+class BatchSession:
+    """Side effects of node and edge changes queued during a ``batch()`` block.
+
+    Created by ``batch()``; not meant to be instantiated directly."""
+
+    def __init__(self):
+        self._serialized = {}
+        self._search = {}
+        self._saved = {}
+
+    def defer_flush(self, obj, signal: bool = True) -> None:
+        """Write the ``SerializedDict`` ``obj`` to disk once, at the end of the batch."""
+        if id(obj) in self._serialized:
+            self._serialized[id(obj)][1] |= signal
+        else:
+            self._serialized[id(obj)] = [obj, signal]
+
+    def queue_save_signal(self, instance, old) -> None:
+        """Queue ``signaleddataset_on_save`` for ``instance``.
+
+        Repeated saves of the same row are merged into one signal, from the state before the first
+        save to the final state. The state is copied, as the instance can still be changed without
+        being saved again."""
+        key = (type(instance), instance.id)
+        new = copy.deepcopy(instance)
+        if key in self._saved:
+            self._saved[key][1] = new
+        else:
+            self._saved[key] = [old, new]
+
+    def is_save_queued(self, instance) -> bool:
+        return (type(instance), instance.id) in self._saved
+
+    def send_save_signals(self) -> None:
+        """Send the queued save signals now, e.g. to keep their order relative to other signals."""
+        from bw2data.signals import signaleddataset_on_save
+
+        saved, self._saved = self._saved, {}
+        for old, new in saved.values():
+            signaleddataset_on_save.send(new, old=old, new=new)
+
+    def update_search_index(self, filename: str, datasets) -> None:
+        pending = self._search.setdefault(filename, {})
+        for ds in datasets:
+            pending[(ds["database"], ds["code"])] = dict(ds)
+
+    def delete_from_search_index(self, filename: str, datasets) -> None:
+        pending = self._search.setdefault(filename, {})
+        for ds in datasets:
+            pending[(ds["database"], ds["code"])] = None
+
+    def discard_search_index(self, filename: str) -> None:
+        """Drop queued changes for a search index which is being deleted or rebuilt."""
+        self._search.pop(filename, None)
+
+    def _flush_metadata(self) -> None:
+        serialized, self._serialized = self._serialized, {}
+        for obj, signal in serialized.values():
+            obj.flush(signal=signal)
+
+    def _flush_search_indices(self) -> None:
+        from bw2data.search import IndexManager
+
+        search, self._search = self._search, {}
+        for filename, pending in search.items():
+            index = IndexManager(filename)
+            index.delete_datasets(
+                [
+                    {"database": database, "code": code}
+                    for (database, code), ds in pending.items()
+                    if ds is None
+                ]
+            )
+            index.update_datasets([ds for ds in pending.values() if ds is not None])
+
+
+@contextmanager
+def batch():
+    """Context manager which groups many node and edge changes into one unit of work.
+
+    Normally, each ``Node.save()`` or ``Edge.save()`` runs in its own SQLite transaction, rewrites
+    ``databases.json``, updates the search index through a new connection, and sends its
+    ``signaleddataset_on_save`` signal. Inside a ``batch()`` block:
+
+    * All changes to the nodes and edges database, including new ``geomapping`` locations, are
+      committed in one transaction when the block exits, or rolled back if an error is raised.
+      This includes ``Database.write`` and ``Database.delete``, which don't rebuild table indices
+      or vacuum the SQLite database inside a block;
+    * Metadata like ``databases`` is changed in memory, and each changed object is written to disk
+      once at the end of the block (even if there was an error, as the in-memory state has already
+      changed);
+    * Search index changes are applied in bulk, one transaction per database;
+    * Save signals are sent at the end of the block, with repeated saves of the same row merged
+      into one signal. Delete and rename signals are still sent immediately, as caches rely on
+      them, but queued save signals are sent first to keep the order.
+
+    .. code-block:: python
+
+        with bd.batch():
+            for node in bd.Database("foo"):
+                node["comment"] = "Checked"
+                node.save()
+
+    Nested ``batch()`` blocks are part of the outer block. Don't switch projects inside a block.
+
+    """
+    global _session
+
+    if _session is not None:
+        yield _session
+        return
+
+    from bw2data.backends import sqlite3_lci_db
+
+    session = _session = BatchSession()
+    try:
+        with sqlite3_lci_db.atomic():
+            yield session
+    except BaseException:
+        from bw2data.meta import geomapping
+
+        _session = None
+        # Locations added in the block were rolled back
+        geomapping.load()
+        session._flush_metadata()
+        raise
+    _session = None
+    session._flush_metadata()
+    session._flush_search_indices()
+    session.send_save_signals()
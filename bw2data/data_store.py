@@ -1,18 +1,70 @@
 import pickle
+import shutil
 from abc import abstractmethod
+from functools import partial
+from pathlib import Path
+from typing import Optional
 
+import numpy as np
 from bw_processing import (
+    Datapackage,
     clean_datapackage_name,
     create_datapackage,
+    generic_directory_filesystem,
     load_datapackage,
     safe_filename,
 )
+from fsspec import AbstractFileSystem
+from fsspec.implementations.dirfs import DirFileSystem
+from fsspec.implementations.local import LocalFileSystem
 from fsspec.implementations.zip import ZipFileSystem
 
 from bw2data import projects
 from bw2data.errors import MissingIntermediateData, UnknownObject
 from bw2data.fatomic import open as atomic_open
 from bw2data.logs import stdout_feedback_logger
+from bw2data.meta import preferences
+
+PROCESSED_FORMATS = ("zip", "directory")
+
+
+def get_processed_format() -> str:
+    """Get the format used to write processed datapackages in the current project.
+
+    * ``"zip"`` (default): A compressed zip archive per object.
+    * ``"directory"``: A plain directory of uncompressed ``.npy`` files. These are memory-mapped
+      when loading, so processes reading the same datapackage share pages through the operating
+      system cache instead of each decompressing their own copy.
+
+    Change with ``preferences["processed_format"] = "directory"``. Existing datapackages are
+    still readable, and are rewritten in the new format the next time they are processed.
+
+    """
+    value = preferences.get("processed_format", "zip")
+    if value not in PROCESSED_FORMATS:
+        raise ValueError(
+            f"Invalid processed datapackage format {value}; must be one of {PROCESSED_FORMATS}"
+        )
+    return value
+
+
+def load_processed_datapackage(filepath: Path) -> Datapackage:
+    """Load a processed datapackage written in either of the ``PROCESSED_FORMATS``.
+
+    Numpy arrays in directory datapackages are opened read-only with ``mmap_mode="r"`` on first
+    access; nothing is copied into process memory."""
+    filepath = Path(filepath)
+    if not filepath.is_dir():
+        return load_datapackage(ZipFileSystem(filepath))
+
+    # `bw_processing` opens files through `fsspec`, but `np.load` can only memory-map real paths
+    dp = load_datapackage(DirFileSystem(path=filepath, fs=LocalFileSystem()), proxy=True)
+    for index, resource in enumerate(dp.resources):
+        if resource["path"].endswith(".npy"):
+            dp.data[index] = partial(
+                np.load, filepath / resource["path"], mmap_mode="r", allow_pickle=False
+            )
+    return dp
 
 
 class DataStore:
@@ -169,14 +221,39 @@ class ProcessedDataStore(DataStore):
     def dirpath_processed(self):
         return projects.dir / "processed"
 
-    def filename_processed(self):
+    def filename_processed(self, processed_format: Optional[str] = None):
+        if (processed_format or get_processed_format()) == "directory":
+            return clean_datapackage_name(self.filename)
         return clean_datapackage_name(self.filename + ".zip")
 
     def filepath_processed(self):
-        return self.dirpath_processed() / self.filename_processed()
+        fp = self.dirpath_processed() / self.filename_processed()
+        if not fp.exists():
+            # Processed before the project format was changed
+            for processed_format in PROCESSED_FORMATS:
+                other = self.dirpath_processed() / self.filename_processed(processed_format)
+                if other.exists():
+                    return other
+        return fp
 
     def datapackage(self):
-        return load_datapackage(ZipFileSystem(self.filepath_processed()))
+        return load_processed_datapackage(self.filepath_processed())
+
+    def _processed_filesystem(self) -> AbstractFileSystem:
+        """Get a writable filesystem for the processed datapackage in the current project format.
+
+        Removes previous processed data for this object in all formats."""
+        for processed_format in PROCESSED_FORMATS:
+            fp = self.dirpath_processed() / self.filename_processed(processed_format)
+            if fp.is_dir():
+                shutil.rmtree(fp)
+            elif fp.exists():
+                fp.unlink()
+
+        fp = self.dirpath_processed() / self.filename_processed()
+        if get_processed_format() == "directory":
+            return generic_directory_filesystem(dirpath=fp)
+        return ZipFileSystem(fp, mode="w")
 
     def write(self, data, process=True):
         """Serialize intermediate data to disk.
@@ -213,7 +290,7 @@ class ProcessedDataStore(DataStore):
         """
         data = self.load()
         dp = create_datapackage(
-            fs=ZipFileSystem(self.filepath_processed(), mode="w"),
+            fs=self._processed_filesystem(),
             name=self.filename_processed(),
             sum_intra_duplicates=True,
             sum_inter_duplicates=False,
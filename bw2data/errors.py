@@ -110,3 +110,9 @@ class NoRevisionNeeded(BW2Exception):
     """No revision needed given the presented previous and current data"""
 
     pass
+
+
+class UnsupportedFormula(BW2Exception):
+    """Formula uses syntax or functions which can't be compiled to a vectorized expression"""
+
+    pass
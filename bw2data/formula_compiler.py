@@ -0,0 +1,616 @@
+import ast
+import functools
+from collections import ChainMap
+from graphlib import TopologicalSorter
+from typing import Dict, Iterable, Mapping, Optional, Tuple, Union
+
+import numpy as np
+from bw2parameters.errors import MissingName
+from bw_processing import INDICES_DTYPE, Datapackage, clean_datapackage_name, create_datapackage
+from fsspec import AbstractFileSystem
+from stats_arrays import MCRandomNumberGenerator, UncertaintyBase
+
+from bw2data.backends import get_id
+from bw2data.backends.schema import ExchangeDataset
+from bw2data.configuration import labels
+from bw2data.errors import UnknownObject, UnsupportedFormula
+from bw2data.parameters import (
+    ActivityParameter,
+    DatabaseParameter,
+    ParameterizedExchange,
+    ProjectParameter,
+)
+
+# Elementwise functions available in ``asteval`` formulas, and their NumPy equivalents
+FUNCTIONS = {
+    name: getattr(np, name)
+    for name in (
+        "abs",
+        "arccos",
+        "arccosh",
+        "arcsin",
+        "arcsinh",
+        "arctan",
+        "arctan2",
+        "arctanh",
+        "ceil",
+        "clip",
+        "copysign",
+        "cos",
+        "cosh",
+        "deg2rad",
+        "degrees",
+        "exp",
+        "exp2",
+        "expm1",
+        "fabs",
+        "floor",
+        "fmax",
+        "fmin",
+        "fmod",
+        "hypot",
+        "isfinite",
+        "isinf",
+        "isnan",
+        "log",
+        "log10",
+        "log1p",
+        "log2",
+        "logical_and",
+        "logical_not",
+        "logical_or",
+        "logical_xor",
+        "maximum",
+        "minimum",
+        "mod",
+        "power",
+        "rad2deg",
+        "radians",
+        "reciprocal",
+        "rint",
+        "round",
+        "sign",
+        "sin",
+        "sinh",
+        "sqrt",
+        "square",
+        "tan",
+        "tanh",
+        "trunc",
+        "where",
+    )
+}
+FUNCTIONS.update(
+    {
+        "acos": np.arccos,
+        "acosh": np.arccosh,
+        "asin": np.arcsin,
+        "asinh": np.arcsinh,
+        "atan": np.arctan,
+        "atan2": np.arctan2,
+        "atanh": np.arctanh,
+        "ln": np.log,
+        "pow": np.power,
+    }
+)
+# Used when a name isn't a parameter
+CONSTANTS = {"e": np.e, "inf": np.inf, "nan": np.nan, "pi": np.pi}
+
+_BINARY_OPERATORS = (ast.Add, ast.Sub, ast.Mult, ast.Div, ast.FloorDiv, ast.Mod, ast.Pow)
+_COMPARISON_OPERATORS = (ast.Eq, ast.NotEq, ast.Lt, ast.LtE, ast.Gt, ast.GtE)
+
+
+class _Translator(ast.NodeTransformer):
+    """Translate a formula into an expression over NumPy arrays.
+
+    Only whitelisted syntax is accepted; anything else, including attribute access, subscripts,
+    and calls to functions not in ``FUNCTIONS``, raises ``UnsupportedFormula``. Names are looked
+    up in the ``__values__`` mapping, and functions in ``__functions__``."""
+
+    def __init__(self, formula: str):
+        self.formula = formula
+        self.symbols = set()
+
+    def unsupported(self, node: ast.AST):
+        raise UnsupportedFormula(
+            "Can't vectorize `{}` in formula {}".format(ast.unparse(node), self.formula)
+        )
+
+    def generic_visit(self, node):
+        self.unsupported(node)
+
+    def function(self, name: str, *args: ast.expr) -> ast.Call:
+        return ast.Call(
+            func=ast.Subscript(
+                value=ast.Name(id="__functions__", ctx=ast.Load()),
+                slice=ast.Constant(name),
+                ctx=ast.Load(),
+            ),
+            args=list(args),
+            keywords=[],
+        )
+
+    def visit_Expression(self, node):
+        return ast.Expression(body=self.visit(node.body))
+
+    def visit_Constant(self, node):
+        if not isinstance(node.value, (bool, int, float)):
+            self.unsupported(node)
+        return ast.Constant(node.value)
+
+    def visit_Name(self, node):
+        if node.id in ("True", "False"):
+            return ast.Constant(node.id == "True")
+        self.symbols.add(node.id)
+        return ast.Subscript(
+            value=ast.Name(id="__values__", ctx=ast.Load()),
+            slice=ast.Constant(node.id),
+            ctx=ast.Load(),
+        )
+
+    def visit_BinOp(self, node):
+        if not isinstance(node.op, _BINARY_OPERATORS):
+            self.unsupported(node)
+        return ast.BinOp(left=self.visit(node.left), op=node.op, right=self.visit(node.right))
+
+    def visit_UnaryOp(self, node):
+        if isinstance(node.op, ast.Not):
+            return self.function("logical_not", self.visit(node.operand))
+        elif not isinstance(node.op, (ast.UAdd, ast.USub)):
+            self.unsupported(node)
+        return ast.UnaryOp(op=node.op, operand=self.visit(node.operand))
+
+    def visit_Compare(self, node):
+        operands = [self.visit(node.left)] + [self.visit(child) for child in node.comparators]
+        comparisons = []
+        for op, left, right in zip(node.ops, operands, operands[1:]):
+            if not isinstance(op, _COMPARISON_OPERATORS):
+                self.unsupported(node)
+            comparisons.append(ast.Compare(left=left, ops=[op], comparators=[right]))
+        return functools.reduce(
+            lambda left, right: self.function("logical_and", left, right), comparisons
+        )
+
+    def visit_BoolOp(self, node):
+        # Same result as Python: ``a and b`` is ``b`` if ``a`` is true, otherwise ``a``
+        values = [self.visit(child) for child in node.values]
+        if isinstance(node.op, ast.And):
+            return functools.reduce(lambda a, b: self.function("where", a, b, a), values)
+        return functools.reduce(lambda a, b: self.function("where", a, a, b), values)
+
+    def visit_IfExp(self, node):
+        return self.function(
+            "where", self.visit(node.test), self.visit(node.body), self.visit(node.orelse)
+        )
+
+    def visit_Call(self, node):
+        if not isinstance(node.func, ast.Name) or node.keywords:
+            self.unsupported(node)
+        args = [self.visit(arg) for arg in node.args]
+        name = node.func.id
+        if name in ("min", "max") and len(args) > 1:
+            ufunc = "minimum" if name == "min" else "maximum"
+            return functools.reduce(lambda a, b: self.function(ufunc, a, b), args)
+        elif name not in FUNCTIONS:
+            self.unsupported(node)
+        return self.function(name, *args)
+
+
+class CompiledFormula:
+    """A formula compiled to a NumPy expression. Call with a mapping of ``{name: value}``, where
+    values can be numbers or arrays."""
+
+    __slots__ = ("formula", "symbols", "_code")
+
+    def __init__(self, formula: str):
+        try:
+            tree = ast.parse(formula.strip(), mode="eval")
+        except SyntaxError as e:
+            raise UnsupportedFormula("Can't parse formula {}".format(formula)) from e
+        translator = _Translator(formula)
+        expression = ast.fix_missing_locations(translator.visit(tree))
+        self.formula = formula
+        self.symbols = frozenset(translator.symbols)
+        self._code = compile(expression, "<formula>", "eval")
+
+    def __call__(self, values: Mapping):
+        return eval(
+            self._code, {"__builtins__": {}, "__functions__": FUNCTIONS, "__values__": values}
+        )
+
+    def __repr__(self):
+        return "CompiledFormula({!r})".format(self.formula)
+
+
+@functools.lru_cache(maxsize=4096)
+def compile_formula(formula: str) -> CompiledFormula:
+    """Compile ``formula`` to a NumPy expression. Raises ``UnsupportedFormula`` if the formula
+    uses syntax or functions which can't be vectorized."""
+    return CompiledFormula(formula)
+
+
+class _CompiledGroup:
+    def __init__(self, name: str, data: dict, parents: list):
+        self.name = name
+        self.data = data
+        self.parents = parents
+        self.amounts = {key: value.get("amount", np.nan) for key, value in data.items()}
+        self.formulas = {
+            key: compile_formula(value["formula"])
+            for key, value in data.items()
+            if value.get("formula")
+        }
+        local = {
+            key: formula.symbols.intersection(data).difference([key])
+            for key, formula in self.formulas.items()
+        }
+        self.order = list(TopologicalSorter({**dict.fromkeys(data, ()), **local}).static_order())
+
+
+class CompiledParameters:
+    """The formulas of a project, database, or activity parameter group, and of all the groups
+    they depend on, compiled to NumPy expressions.
+
+    Where ``ParameterSet`` and ``asteval`` evaluate each formula for one set of values at a time,
+    this evaluates all parameters and parameterized exchanges for many Monte Carlo iterations at
+    once. Formulas are translated from their syntax tree, and only arithmetic, comparisons,
+    conditional expressions, and the elementwise functions in ``FUNCTIONS`` are allowed; other
+    formulas raise ``UnsupportedFormula``. Both branches of conditional expressions are
+    evaluated, so invalid operations give ``nan`` or ``inf`` values instead of raising errors.
+
+    Input values are given as a dictionary of one-dimensional arrays with one value per iteration.
+    Keys are ``(group, name)`` tuples or parameter names, which are looked up in the same way as in
+    formulas of ``group``. Parameters without samples keep their stored ``amount``; parameters
+    with a formula and samples use the samples instead of the formula.
+
+    .. code-block:: python
+
+        compiled = parameters.compile("my group")
+        samples = compiled.sample(1000, seed=42)
+        values = compiled.evaluate(samples)  # {(group, name): array}
+        arrays = compiled.exchange_arrays(samples)  # {matrix: {"indices_array": ...}}
+
+    Compile again after changing parameters or formulas.
+
+    """
+
+    def __init__(self, group: str = "project"):
+        self.group = group
+        self.groups = {}
+        self._add_group(group)
+        self.exchanges = {
+            exchange: compile_formula(formula)
+            for exchange, formula in ParameterizedExchange.load(group).items()
+        }
+        graph = {name: obj.parents for name, obj in self.groups.items()}
+        self._order = [self.groups[name] for name in TopologicalSorter(graph).static_order()]
+        self._check_names()
+
+    def _add_group(self, group: str, parent: bool = False) -> None:
+        if group in self.groups:
+            return
+        if group == "project":
+            data, parents = ProjectParameter.load(), []
+        elif ActivityParameter.select().where(ActivityParameter.group == group).exists():
+            chain = ActivityParameter.dependency_chain(group)
+            database = ActivityParameter.get(group=group).database
+            data = ActivityParameter.load(group)
+            parents = [obj["group"] for obj in chain if obj["kind"] == "activity"]
+            parents += [database, "project"]
+        elif DatabaseParameter.select().where(DatabaseParameter.database == group).exists():
+            data, parents = DatabaseParameter.load(group), ["project"]
+        elif parent:
+            # The database of an activity group doesn't need database parameters
+            data, parents = {}, ["project"]
+        else:
+            raise UnknownObject("Can't find parameter group {}".format(group))
+        self.groups[group] = _CompiledGroup(group, data, parents)
+        for name in parents:
+            self._add_group(name, parent=True)
+
+    def _lookup(self, group: str) -> list:
+        return [group] + self.groups[group].parents
+
+    def _check_names(self) -> None:
+        for obj in self.groups.values():
+            visible = set(CONSTANTS).union(
+                *(self.groups[name].amounts for name in self._lookup(obj.name))
+            )
+            formulas = list(obj.formulas.values())
+            if obj.name == self.group:
+                formulas.extend(self.exchanges.values())
+            missing = set().union(*(formula.symbols for formula in formulas)).difference(visible)
+            if missing:
+                raise MissingName(
+                    "The following variables aren't defined:\n{}".format(
+                        "|".join(sorted(missing))
+                    )
+                )
+
+    @property
+    def inputs(self) -> list:
+        """``(group, name)`` of all parameters without formulas"""
+        return [
+            (obj.name, name)
+            for obj in self._order
+            for name in obj.order
+            if name not in obj.formulas
+        ]
+
+    def resolve(self, name: Union[str, Tuple[str, str]]) -> Tuple[str, str]:
+        """Return the ``(group, name)`` of the parameter ``name`` as seen from ``group``"""
+        if isinstance(name, tuple):
+            group, label = name
+            if group in self.groups and label in self.groups[group].amounts:
+                return name
+        else:
+            for group in self._lookup(self.group):
+                if name in self.groups[group].amounts:
+                    return (group, name)
+        raise MissingName("Parameter {} not found in group {}".format(name, self.group))
+
+    def resolves(self, name: Union[str, Tuple[str, str]]) -> bool:
+        try:
+            self.resolve(name)
+        except MissingName:
+            return False
+        return True
+
+    def sample(
+        self, iterations: int, seed: Optional[int] = None
+    ) -> Dict[Tuple[str, str], np.ndarray]:
+        """Draw ``iterations`` random values for each parameter in ``inputs`` from their
+        uncertainty distributions, using ``stats_arrays``. Parameters without an uncertainty
+        distribution get their ``amount``."""
+        inputs = self.inputs
+        if not inputs:
+            return {}
+        dicts = []
+        for group, name in inputs:
+            ds = self.groups[group].data[name]
+            dicts.append({"loc": ds.get("amount", np.nan), **ds})
+        values = MCRandomNumberGenerator(UncertaintyBase.from_dicts(*dicts), seed=seed).generate(
+            iterations
+        )
+        return dict(zip(inputs, values.reshape(len(inputs), iterations)))
+
+    def _evaluate(self, samples: Optional[Mapping], iterations: Optional[int]) -> tuple:
+        arrays = {}
+        for key, value in (samples or {}).items():
+            array = np.asarray(value, dtype=float)
+            if array.ndim != 1:
+                raise ValueError("Samples for {} must be a one-dimensional array".format(key))
+            if iterations is None:
+                iterations = len(array)
+            elif len(array) != iterations:
+                raise ValueError(
+                    "Samples for {} have {} values instead of {}".format(
+                        key, len(array), iterations
+                    )
+                )
+            arrays[self.resolve(key)] = array
+
+        values, scopes = {}, {}
+        with np.errstate(divide="ignore", invalid="ignore", over="ignore"):
+            for obj in self._order:
+                own = values[obj.name] = {}
+                scope = scopes[obj.name] = ChainMap(
+                    own, *(values[name] for name in obj.parents), CONSTANTS
+                )
+                for name in obj.order:
+                    if (obj.name, name) in arrays:
+                        own[name] = arrays[(obj.name, name)]
+                    elif name in obj.formulas:
+                        own[name] = obj.formulas[name](scope)
+                    else:
+                        own[name] = obj.amounts[name]
+            exchanges = {
+                exchange: formula(scopes[self.group])
+                for exchange, formula in self.exchanges.items()
+            }
+        return values, exchanges, iterations or 1
+
+    def evaluate(
+        self, samples: Optional[Mapping] = None, iterations: Optional[int] = None
+    ) -> Dict[Tuple[str, str], np.ndarray]:
+        """Evaluate all parameters for the given ``samples``.
+
+        ``iterations`` is only needed if no samples are given. Returns ``{(group, name): array}``,
+        with one value per iteration in each array."""
+        values, _, iterations = self._evaluate(samples, iterations)
+        return {
+            (group, name): _as_array(value, iterations)
+            for group, dct in values.items()
+            for name, value in dct.items()
+        }
+
+    def exchange_amounts(
+        self, samples: Optional[Mapping] = None, iterations: Optional[int] = None
+    ) -> Dict[int, np.ndarray]:
+        """Evaluate the parameterized exchanges of ``group``. Returns ``{exchange id: array}``."""
+        _, exchanges, iterations = self._evaluate(samples, iterations)
+        return {exchange: _as_array(value, iterations) for exchange, value in exchanges.items()}
+
+    def exchange_arrays(
+        self, samples: Optional[Mapping] = None, iterations: Optional[int] = None
+    ) -> Dict[str, dict]:
+        """Evaluate the parameterized exchanges of ``group`` and return the matrix indices and
+        values for ``bw_processing``.
+
+        Returns a dictionary with matrix names as keys and dictionaries of ``indices_array``,
+        ``data_array`` (with shape ``(number of exchanges, iterations)``) and ``flip_array`` as
+        values, in the same format as in processed database datapackages. Exchanges whose type
+        is not a biosphere or technosphere edge type are skipped.
+
+        Values in processed datapackages are summed when several exchanges link the same nodes,
+        so these other exchanges are included with their stored amount. The arrays can therefore
+        replace the matrix values of the processed database datapackage."""
+        amounts = self.exchange_amounts(samples, iterations)
+        if not amounts:
+            return {}
+        iterations = len(next(iter(amounts.values())))
+
+        fields = (
+            ExchangeDataset.id,
+            ExchangeDataset.data,
+            ExchangeDataset.input_database,
+            ExchangeDataset.input_code,
+            ExchangeDataset.output_database,
+            ExchangeDataset.output_code,
+            ExchangeDataset.type,
+        )
+        ids = sorted(amounts)
+        outputs = {}
+        for chunk_range in range(0, len(ids), 500):
+            for database, code in (
+                ExchangeDataset.select(ExchangeDataset.output_database, ExchangeDataset.output_code)
+                .where(ExchangeDataset.id << ids[chunk_range : chunk_range + 500])
+                .tuples()
+            ):
+                outputs.setdefault(database, set()).add(code)
+        exchanges = []
+        for database, codes in outputs.items():
+            codes = sorted(codes)
+            for chunk_range in range(0, len(codes), 500):
+                exchanges.extend(
+                    ExchangeDataset.select(*fields)
+                    .where(
+                        ExchangeDataset.output_database == database,
+                        ExchangeDataset.output_code << codes[chunk_range : chunk_range + 500],
+                    )
+                    .tuples()
+                )
+        exchanges.sort(key=lambda row: row[0])
+
+        edges = {}
+        for id_, data, *nodes, kind in exchanges:
+            if kind in labels.biosphere_edge_types:
+                edges[id_] = ("biosphere_matrix", tuple(nodes), False)
+            elif kind in labels.technosphere_negative_edge_types:
+                edges[id_] = ("technosphere_matrix", tuple(nodes), True)
+            elif kind in labels.technosphere_positive_edge_types:
+                edges[id_] = ("technosphere_matrix", tuple(nodes), False)
+        parameterized = {edges[id_][:2] for id_ in amounts if id_ in edges}
+
+        matrices = {}
+        for id_, data, *_ in exchanges:
+            if id_ not in edges or edges[id_][:2] not in parameterized:
+                continue
+            matrix, (input_database, input_code, output_database, output_code), flip = edges[id_]
+            if id_ in amounts:
+                values = amounts[id_]
+            else:
+                values = np.full(iterations, float(data["amount"]))
+            matrices.setdefault(matrix, []).append(
+                (
+                    get_id((input_database, input_code)),
+                    get_id((output_database, output_code)),
+                    values,
+                    flip,
+                )
+            )
+
+        result = {}
+        for matrix, rows in matrices.items():
+            indices = np.zeros(len(rows), dtype=INDICES_DTYPE)
+            indices["row"] = [row for row, _, _, _ in rows]
+            indices["col"] = [col for _, col, _, _ in rows]
+            result[matrix] = {
+                "indices_array": indices,
+                "data_array": np.vstack([data for _, _, data, _ in rows]),
+                "flip_array": np.array([flip for _, _, _, flip in rows], dtype=bool),
+            }
+        return result
+
+
+def _as_array(value, iterations: int) -> np.ndarray:
+    array = np.asarray(value, dtype=float)
+    if array.ndim == 0:
+        return np.full(iterations, array)
+    return array
+
+
+def overlay_datapackage(
+    groups: Union[str, Iterable[str], None] = None,
+    samples: Optional[Mapping] = None,
+    iterations: Optional[int] = None,
+    name: Optional[str] = None,
+    fs: Optional[AbstractFileSystem] = None,
+    sequential: bool = False,
+    seed: Optional[int] = None,
+) -> Datapackage:
+    """Create a datapackage with the values of the parameterized exchanges of activity parameter
+    ``groups`` (default is all groups with parameterized exchanges), without changing or
+    processing any database.
+
+    Stack it after the processed database datapackages, e.g. ``bw2calc.LCA(demand,
+    data_objs=[*database_datapackages, overlay])``; its values replace those of the parameterized
+    exchanges.
+
+    Without ``samples`` or ``iterations``, the datapackage has one static vector per matrix with
+    the current parameter values. Otherwise, it has one array per matrix with one column per
+    iteration, e.g. one column per scenario of a parameter sweep (use ``sequential=True``) or per
+    Monte Carlo sample. ``samples`` are given in the same way as for
+    ``CompiledParameters.evaluate``; each key must be found in at least one group.
+
+    The datapackage is created in memory unless a ``fsspec`` filesystem ``fs`` is given."""
+    if groups is None:
+        groups = [
+            group
+            for (group,) in ParameterizedExchange.select(ParameterizedExchange.group)
+            .distinct()
+            .order_by(ParameterizedExchange.group)
+            .tuples()
+        ]
+    elif isinstance(groups, str):
+        groups = [groups]
+    samples = dict(samples or {})
+    for key, value in samples.items():
+        length = np.size(value)
+        if iterations is None:
+            iterations = length
+        elif length != iterations:
+            raise ValueError(
+                "Samples for {} have {} values instead of {}".format(key, length, iterations)
+            )
+    vector = iterations is None
+
+    matrices, used = {}, set()
+    for group in groups:
+        compiled = CompiledParameters(group)
+        own = {key: value for key, value in samples.items() if compiled.resolves(key)}
+        used.update(own)
+        for matrix, arrays in compiled.exchange_arrays(own, iterations).items():
+            matrices.setdefault(matrix, []).append(arrays)
+    if set(samples).difference(used):
+        raise MissingName(
+            "Parameters not found in any group: {}".format(
+                "|".join(str(key) for key in samples if key not in used)
+            )
+        )
+
+    name = name or "parameter overlay"
+    dp = create_datapackage(
+        fs=fs,
+        name=clean_datapackage_name(name),
+        sequential=sequential,
+        seed=seed,
+        sum_intra_duplicates=True,
+        sum_inter_duplicates=False,
+    )
+    for matrix, arrays in sorted(matrices.items()):
+        kwargs = {
+            "matrix": matrix,
+            "name": clean_datapackage_name("{} {}".format(name, matrix)),
+            "indices_array": np.concatenate([obj["indices_array"] for obj in arrays]),
+            "flip_array": np.concatenate([obj["flip_array"] for obj in arrays]),
+        }
+        data = np.vstack([obj["data_array"] for obj in arrays])
+        if vector:
+            dp.add_persistent_vector(data_array=data[:, 0], **kwargs)
+        else:
+            dp.add_persistent_array(data_array=data, **kwargs)
+    dp.metadata["parameter_groups"] = list(groups)
+    if fs is not None:
+        dp.finalize_serialization()
+    return dp
@@ -0,0 +1,121 @@
+import json
+import math
+from pathlib import Path
+from typing import Any, Callable, Optional, Union
+
+from bw2data.fatomic import open as atomic_open
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+JSON_BACKENDS = ("orjson", "json")
+
+
+def _has_non_finite_float(data: Any, default: Optional[Callable] = None) -> bool:
+    """Check if ``data`` has ``NaN`` or infinite floats, which ``orjson`` would write as ``null``.
+
+    Other objects are converted with ``default``, as when encoding."""
+    if isinstance(data, float):
+        return not math.isfinite(data)
+    if isinstance(data, (str, int)) or data is None:
+        return False
+    if isinstance(data, dict):
+        return any(
+            _has_non_finite_float(key, default) or _has_non_finite_float(value, default)
+            for key, value in data.items()
+        )
+    if isinstance(data, (list, tuple)):
+        return any(_has_non_finite_float(value, default) for value in data)
+    if default is None:
+        return False
+    converted = default(data)
+    return converted is not data and _has_non_finite_float(converted, default)
+
+
+class JSONCodec:
+    """JSON encoding and decoding for metadata files, revision files, and JSON database fields.
+
+    Uses `orjson <https://github.com/ijl/orjson>`__ if installed, and the standard library ``json``
+    module otherwise. Both backends give the same results for the data we store:
+
+    * Tuples are written as lists;
+    * Dictionary keys which are numbers, booleans, or ``None`` are converted to strings;
+    * ``datetime`` and other unsupported objects are passed to ``default``, or raise a
+      ``TypeError`` if no ``default`` is given;
+    * Anything ``orjson`` can't encode or decode, like integers larger than 64 bits or ``NaN``
+      and infinite floats, is handled by the standard library instead.
+
+    Output is compact. Set ``indent`` for human-readable output when debugging; this is slower.
+
+    Use the shared ``codec`` instance, and change it with ``set_json_codec``."""
+
+    def __init__(self, backend: Optional[str] = None, indent: bool = False):
+        self.configure(backend=backend, indent=indent)
+
+    def configure(self, backend: Optional[str] = None, indent: bool = False) -> None:
+        if backend is None:
+            backend = "orjson" if orjson is not None else "json"
+        if backend not in JSON_BACKENDS:
+            raise ValueError(f"Invalid JSON backend {backend}; must be one of {JSON_BACKENDS}")
+        if backend == "orjson" and orjson is None:
+            raise ValueError("JSON backend `orjson` requested, but it isn't installed")
+        self.backend = backend
+        self.indent = indent
+
+    def _dumps_json(self, data: Any, default: Optional[Callable]) -> str:
+        return json.dumps(
+            data, default=default, ensure_ascii=False, indent=2 if self.indent else None
+        )
+
+    def dumpb(self, data: Any, default: Optional[Callable] = None) -> bytes:
+        """Encode ``data`` to UTF-8 JSON bytes"""
+        if self.backend == "orjson":
+            option = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+            if self.indent:
+                option |= orjson.OPT_INDENT_2
+            try:
+                result = orjson.dumps(data, default=default, option=option)
+            except TypeError:
+                pass
+            else:
+                # Only search for non-finite floats if they could have been written as ``null``
+                if b"null" not in result or not _has_non_finite_float(data, default):
+                    return result
+        return self._dumps_json(data, default).encode("utf-8")
+
+    def dumps(self, data: Any, default: Optional[Callable] = None) -> str:
+        """Encode ``data`` to a JSON string"""
+        if self.backend == "orjson":
+            return self.dumpb(data, default).decode("utf-8")
+        return self._dumps_json(data, default)
+
+    def loads(self, data: Union[str, bytes]) -> Any:
+        """Decode a JSON string or bytes"""
+        if self.backend == "orjson":
+            try:
+                return orjson.loads(data)
+            except orjson.JSONDecodeError:
+                pass
+        return json.loads(data)
+
+    def dump(
+        self, data: Any, filepath: Union[str, Path], default: Optional[Callable] = None
+    ) -> None:
+        """Write ``data`` to ``filepath`` as UTF-8 JSON, replacing the file atomically"""
+        with atomic_open(filepath, "wb") as f:
+            f.write(self.dumpb(data, default))
+
+    def load(self, filepath: Union[str, Path]) -> Any:
+        with open(filepath, "rb") as f:
+            return self.loads(f.read())
+
+
+codec = JSONCodec()
+
+
+def set_json_codec(backend: Optional[str] = None, indent: bool = False) -> None:
+    """Change the JSON backend (``"orjson"`` or ``"json"``; default is the fastest available) or
+    turn on indented output for debugging."""
+    codec.configure(backend=backend, indent=indent)
@@ -1,40 +1,123 @@
 import datetime
+import pickle
+import random
 import warnings
+from collections.abc import MutableMapping
 from pathlib import Path
+from time import time
 from typing import Union
 
-from bw2data.serialization import CompoundJSONDict, PickledDict, SerializedDict
+from bw2data.fatomic import open as atomic_open
+from bw2data.serialization import CompoundJSONDict, PickledDict, SerializedDict, SQLiteMetadataStore
 from bw2data.signals import on_database_delete, on_database_metadata_change
 
 
-class GeoMapping(PickledDict):
+class GeoMapping(MutableMapping):
     """A dictionary that maps location codes to integers. Needed because parameter arrays have integer ``geo`` fields.
 
-    File data is stored in ``geomapping.pickle``.
+    Data is stored in the ``geomappingdataset`` table of the project LCI database, indexed by the
+    text form of each location, which allows processing to join activities to their location ids
+    in SQL. New ids come from an ``AUTOINCREMENT`` sequence and are never reused. Data from
+    ``geomapping.pickle``, used in previous versions, is imported the first time it is needed.
+
+    The mapping is cached in memory, and the cache is reloaded when another process changes the
+    LCI database.
 
     This dictionary does not support setting items directly; instead, use the ``add`` method to add multiple keys.
     """
 
     filename = "geomapping.pickle"
 
-    def __init__(self, *args, **kwargs):
-        super(GeoMapping, self).__init__(*args, **kwargs)
+    def __init__(self):
+        # Loaded lazily, as the LCI database isn't available yet when changing projects
+        self._data = None
+        self._data_version = None
+
+    @property
+    def data(self) -> dict:
+        from bw2data.backends.schema import lci_data_version
+
+        if self._data is None or lci_data_version() != self._data_version:
+            self.load()
+        return self._data
+
+    def load(self) -> None:
+        """Read all mappings from the database, importing the previous storage format if needed."""
+        from bw2data.backends.schema import GeoMappingDataset, lci_data_version
+
+        self._data_version = lci_data_version()
+        self._data = {
+            key: id_
+            for id_, key in GeoMappingDataset.select(
+                GeoMappingDataset.id, GeoMappingDataset.key
+            ).tuples()
+        }
+        if not self._data:
+            self._import_pickled_data()
         # At a minimum, "GLO" should always be present
-        if "GLO" not in self:
+        if "GLO" not in self._data:
             self.add(["GLO"])
 
+    def _import_pickled_data(self) -> None:
+        from bw2data import projects
+        from bw2data.backends import sqlite3_lci_db
+        from bw2data.backends.schema import GeoMappingDataset, location_as_text
+
+        if projects.dataset.data.get("metadata_backend") == "sqlite":
+            rows = SQLiteMetadataStore(projects.dir).read(self.filename) or {}
+            data = {}
+            for value in rows.values():
+                data.update(pickle.loads(value))
+        else:
+            try:
+                with open(projects.dir / self.filename, "rb") as f:
+                    data = pickle.load(f)
+            except IOError:
+                return
+        # Keep existing ids
+        rows = [
+            {"id": id_, "location": location_as_text(key), "key": key} for key, id_ in data.items()
+        ]
+        with sqlite3_lci_db.atomic():
+            for chunk_range in range(0, len(rows), 300):
+                GeoMappingDataset.insert_many(
+                    rows[chunk_range : chunk_range + 300]
+                ).on_conflict_ignore().execute()
+        self._data = data
+
     def add(self, keys):
         """Add a set of keys. These keys can already be in the mapping; only new keys will be added.
 
+        New keys are inserted in bulk, in one transaction.
+
         Args:
             * *keys* (list): The keys to add.
 
         """
-        index = max(self.data.values()) if self.data else 0
-        for i, key in enumerate(keys):
-            if key not in self.data:
-                self.data[key] = index + i + 1
-        self.flush()
+        from bw2data.backends import sqlite3_lci_db
+        from bw2data.backends.schema import GeoMappingDataset, location_as_text
+
+        data = self.data
+        new = {location_as_text(key): key for key in keys if key not in data}
+        if not new:
+            return
+        locations = list(new)
+        table = GeoMappingDataset._meta.table_name
+        with sqlite3_lci_db.atomic():
+            # Raw ``executemany``; building the SQL with ``peewee`` takes much longer than running it
+            connection = sqlite3_lci_db.db.connection()
+            connection.executemany(
+                f"INSERT OR IGNORE INTO {table} (location, key) VALUES (?, ?)",
+                [(location, pickle.dumps(new[location], protocol=4)) for location in locations],
+            )
+            # Keys can already be in the database, e.g. if added by another process
+            for chunk_range in range(0, len(locations), 500):
+                chunk = locations[chunk_range : chunk_range + 500]
+                for location, id_ in connection.execute(
+                    f"SELECT location, id FROM {table} WHERE location IN ({', '.join('?' * len(chunk))})",
+                    chunk,
+                ):
+                    data[new[location]] = id_
 
     def delete(self, keys):
         """Delete a set of keys.
@@ -43,19 +126,93 @@ class GeoMapping(PickledDict):
             *keys* (list): The keys to delete.
 
         """
+        from bw2data.backends import sqlite3_lci_db
+        from bw2data.backends.schema import GeoMappingDataset, location_as_text
+
+        data = self.data
         for key in keys:
-            del self.data[key]
-        self.flush()
+            if key not in data:
+                raise KeyError(key)
+        locations = [location_as_text(key) for key in keys]
+        with sqlite3_lci_db.atomic():
+            for chunk_range in range(0, len(locations), 500):
+                GeoMappingDataset.delete().where(
+                    GeoMappingDataset.location.in_(locations[chunk_range : chunk_range + 500])
+                ).execute()
+        for key in keys:
+            data.pop(key, None)
+
+    # Compatibility with the ``PickledDict`` API of previous versions
+
+    @property
+    def filepath(self) -> Path:
+        """Path of the pickle file used by previous versions; only written by ``serialize``."""
+        from bw2data import projects
+
+        return projects.dir / self.filename
+
+    @property
+    def list(self):
+        """List the keys of the dictionary. This is a property, and does not need to be called."""
+        return sorted(self.data.keys())
+
+    def flush(self, signal: bool = True) -> None:
+        """Does nothing; changes are written to the database immediately."""
+        pass
+
+    def serialize(self, filepath: Union[str, Path, None] = None, signal: bool = True) -> None:
+        """Export the mapping to a pickle file, by default ``filepath``."""
+        with atomic_open(filepath or self.filepath, "wb") as f:
+            pickle.dump(dict(self.data), f, protocol=4)
+
+    def backup(self) -> None:
+        """Write a backup version of the data to the ``backups`` directory."""
+        from bw2data import projects
+
+        self.serialize(projects.dir / "backups" / f"{self.filename}.{int(time())}.backup")
+
+    def random(self):
+        """Return a random key."""
+        if not self.data:
+            return None
+        return random.choice(list(self.data.keys()))
+
+    def __getitem__(self, key):
+        from bw2data.backends.schema import GeoMappingDataset, location_as_text
+
+        if isinstance(key, list):
+            key = tuple(key)
+        try:
+            return self.data[key]
+        except KeyError:
+            # Could have been added by another instance in this process
+            id_ = (
+                GeoMappingDataset.select(GeoMappingDataset.id)
+                .where(GeoMappingDataset.location == location_as_text(key))
+                .scalar()
+            )
+            if id_ is None:
+                raise
+            self._data[key] = id_
+            return id_
 
     def __setitem__(self, key, value):
         raise NotImplementedError
 
-    def __str__(self):
-        return "Mapping from databases and methods to parameter indices."
+    def __delitem__(self, key):
+        self.delete([key])
+
+    def __iter__(self):
+        return iter(self.data)
 
     def __len__(self):
         return len(self.data)
 
+    def __str__(self):
+        return "Mapping from databases and methods to parameter indices."
+
+    __repr__ = lambda x: str(x)
+
 
 class Databases(SerializedDict):
     """A dictionary for database metadata. This class includes methods to manage database versions. File data is saved in ``databases.json``."""
@@ -65,6 +222,7 @@ class Databases(SerializedDict):
 
     def increment_version(self, database, number=None):
         """Increment the ``database`` version. Returns the new version."""
+        self._reload_if_stale()
         self.data[database]["version"] += 1
         if number is not None:
             self.data[database]["number"] = number
@@ -73,6 +231,7 @@ class Databases(SerializedDict):
 
     def version(self, database):
         """Return the ``database`` version"""
+        self._reload_if_stale()
         return self.data[database].get("version")
 
     def set_modified(self, database):
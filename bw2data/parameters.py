@@ -1,6 +1,7 @@
 __all__ = (
     "ActivityParameter",
     "DatabaseParameter",
+    "FormulaSymbol",
     "Group",
     "GroupDependency",
     "ParameterizedExchange",
@@ -9,9 +10,13 @@ __all__ = (
 )
 
 import datetime
+import functools
 import itertools
+import os
 import re
 import uuid
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from graphlib import TopologicalSorter
 from typing import Optional
 
 import asteval
@@ -21,6 +26,7 @@ from bw2parameters.errors import MissingName
 from peewee import BooleanField, Check, DateTimeField, FloatField, IntegerField, Model, TextField
 
 from bw2data import config, databases, get_activity, projects
+from bw2data.backends import sqlite3_lci_db
 from bw2data.backends.schema import ExchangeDataset
 from bw2data.signals import (
     on_activity_parameter_recalculate,
@@ -90,6 +96,9 @@ END;
 PE_INSERT_TRIGGER = _PE_GROUP_TEMPLATE.format(action="INSERT")
 PE_UPDATE_TRIGGER = _PE_GROUP_TEMPLATE.format(action="UPDATE")
 
+"""Minimum number of expired activity parameter groups for using worker processes"""
+PARALLEL_RECALCULATION_MIN_GROUPS = 20
+
 
 class ParameterBase(SnowflakeIDBaseClass):
     __repr__ = lambda x: str(x)
@@ -148,6 +157,7 @@ class ProjectParameter(ParameterBase):
     def save(self, *args, **kwargs):
         Group.get_or_create(name="project")[0].expire()
         super(ProjectParameter, self).save(*args, **kwargs)
+        _index_formula("project", self.formula, name=self.name)
 
     @staticmethod
     def load(group=None):
@@ -193,12 +203,9 @@ class ProjectParameter(ParameterBase):
             return
         ParameterSet(data).evaluate_and_set_amount_field()
         with parameters.db.atomic() as _:
-            for key, value in data.items():
-                ProjectParameter.update(
-                    amount=value["amount"],
-                ).where(ProjectParameter.name == key).execute()
+            _write_amounts(ProjectParameter, data)
             Group.get_or_create(name="project")[0].freshen()
-            ProjectParameter.expire_downstream("project")
+            _update_downstream("project", data)
 
         if signal:
             on_project_parameter_recalculate.send(ProjectParameter)
@@ -261,11 +268,13 @@ class ProjectParameter(ParameterBase):
 
         NOTE: Make sure to wrap this in an .atomic() statement!
         """
-        data = (
+        data = [
             alter_parameter_formula(p, old, new)
             for p in cls.select().where(cls.formula.contains(old))
-        )
+        ]
         cls.bulk_update(data, fields=[cls.formula], batch_size=50)
+        for p in data:
+            _index_formula("project", p.formula, name=p.name)
         Group.get_or_create(name="project")[0].expire()
 
         if signal:
@@ -390,15 +399,9 @@ class DatabaseParameter(ParameterBase):
         # Update database parameter values
         ParameterSet(data, glo).evaluate_and_set_amount_field()
         with parameters.db.atomic():
-            for key, value in data.items():
-                DatabaseParameter.update(
-                    amount=value["amount"],
-                ).where(
-                    DatabaseParameter.name == key,
-                    DatabaseParameter.database == database,
-                ).execute()
+            _write_amounts(DatabaseParameter, data, database=database)
             Group.get(name=database).freshen()
-            DatabaseParameter.expire_downstream(database)
+            _update_downstream(database, data)
 
         if signal:
             on_database_parameter_recalculate.send(DatabaseParameter, name=database)
@@ -472,6 +475,7 @@ class DatabaseParameter(ParameterBase):
         """Save this model instance"""
         Group.get_or_create(name=self.database)[0].expire()
         super(DatabaseParameter, self).save(*args, **kwargs)
+        _index_formula(self.database, self.formula, name=self.name)
 
     def is_deletable(self):
         """Perform a test to see if the current parameter can be deleted."""
@@ -494,8 +498,8 @@ class DatabaseParameter(ParameterBase):
             .distinct()
         )
 
-        for row in query.execute():
-            chain = DatabaseParameter.dependency_chain(row.group)
+        for group in _groups_using(name, (row.group for row in query.execute())):
+            chain = DatabaseParameter.dependency_chain(group)
             own_group = next((x for x in chain if x.get("group") == "project"), {})
             if name in own_group.get("names", set()):
                 return True
@@ -509,28 +513,21 @@ class DatabaseParameter(ParameterBase):
         This method specifically targets project parameters used in database
         formulas
         """
-        data = (
-            alter_parameter_formula(p, old, new)
-            for p in (
-                cls.select()
-                .join(GroupDependency, on=(GroupDependency.group == cls.database))
-                .where(cls.formula.contains(old))
-            )
-            if not DatabaseParameter.is_dependency_within_group(old, p.database)
+        candidates = (
+            cls.select(cls.database)
+            .join(GroupDependency, on=(GroupDependency.group == cls.database))
+            .distinct()
+            .tuples()
         )
-        dbs = set(
-            p.database
-            for p in (
-                cls.select(cls.database)
-                .join(GroupDependency, on=(GroupDependency.group == cls.database))
-                .where(cls.formula.contains(old))
-                .distinct()
-            )
-            if not DatabaseParameter.is_dependency_within_group(old, p.database)
+        cls._update_formulas(
+            old,
+            new,
+            [
+                db
+                for db in _groups_using(old, (db for (db,) in candidates))
+                if not DatabaseParameter.is_dependency_within_group(old, db)
+            ],
         )
-        cls.bulk_update(data, fields=[cls.formula], batch_size=50)
-        for db in dbs:
-            Group.get_or_create(name=db)[0].expire()
 
         if signal:
             on_database_parameter_update_formula_project_parameter_name.send(
@@ -544,25 +541,36 @@ class DatabaseParameter(ParameterBase):
         This method specifically targets database parameters used in database
         formulas
         """
-        data = (
-            alter_parameter_formula(p, old, new)
-            for p in cls.select().where(cls.formula.contains(old))
-            if DatabaseParameter.is_dependency_within_group(old, p.database)
-        )
-        dbs = set(
-            p.database
-            for p in (cls.select(cls.database).where(cls.formula.contains(old)).distinct())
-            if DatabaseParameter.is_dependency_within_group(old, p.database)
+        candidates = cls.select(cls.database).distinct().tuples()
+        cls._update_formulas(
+            old,
+            new,
+            [
+                db
+                for db in _groups_using(old, (db for (db,) in candidates))
+                if DatabaseParameter.is_dependency_within_group(old, db)
+            ],
         )
-        cls.bulk_update(data, fields=[cls.formula], batch_size=50)
-        for db in dbs:
-            Group.get_or_create(name=db)[0].expire()
 
         if signal:
             on_database_parameter_update_formula_database_parameter_name.send(
                 cls, old={"old": old}, new={"new": new}
             )
 
+    @classmethod
+    def _update_formulas(cls, old: str, new: str, dbs: list) -> None:
+        """Replace the name ``old`` with ``new`` in the formulas of the parameters of ``dbs``,
+        and expire the changed groups."""
+        data = [
+            alter_parameter_formula(p, old, new)
+            for p in cls.select().where((cls.database << dbs) & cls.formula.contains(old))
+        ]
+        cls.bulk_update(data, fields=[cls.formula], batch_size=50)
+        for p in data:
+            _index_formula(p.database, p.formula, name=p.name)
+        for db in {p.database for p in data}:
+            Group.get_or_create(name=db)[0].expire()
+
     @property
     def dict(self):
         """Parameter data as a standardized dictionary"""
@@ -620,7 +628,7 @@ class ActivityParameter(ParameterBase):
     _db_table = "activityparameter"
 
     class Meta:
-        indexes = [(("group", "name"), True)]
+        indexes = [(("group", "name"), True), (("database", "code"), False)]
         constraints = [Check("""("group" != 'project') AND ("group" != database)""")]
 
     def __str__(self):
@@ -808,17 +816,7 @@ class ActivityParameter(ParameterBase):
         if not ActivityParameter.expired(group):
             return
 
-        chain = ActivityParameter.dependency_chain(group)
-
-        # Reset dependencies and dependency order
-        if chain:
-            obj = Group.get(name=group)
-            obj.order = [o["group"] for o in chain if o["kind"] == "activity"]
-            obj.save()
-            GroupDependency.delete().where(GroupDependency.group == group).execute()
-            GroupDependency.insert_many(
-                [{"group": group, "depends": o["group"]} for o in chain]
-            ).execute()
+        chain = ActivityParameter._update_dependency_chain(group)
 
         # Update all upstream groups
         mapping = {
@@ -835,28 +833,49 @@ class ActivityParameter(ParameterBase):
         for row in chain[::-1]:
             mapping[row["kind"]].recalculate(row["group"])
 
-        # Update activity parameter values
-        data = ActivityParameter.load(group)
-        static = {
-            k: v for k, v in ActivityParameter._static_dependencies(group).items() if k not in data
-        }
-        ParameterSet(data, static).evaluate_and_set_amount_field()
-        with parameters.db.atomic():
-            for key, value in data.items():
-                ActivityParameter.update(
-                    amount=value["amount"],
-                ).where(
-                    ActivityParameter.name == key,
-                    ActivityParameter.group == group,
-                ).execute()
-            Group.get(name=group).freshen()
-            ActivityParameter.expire_downstream(group)
-
-        ActivityParameter.recalculate_exchanges(group, signal=False)
+        # Update activity parameter and exchange values
+        data, static, exchanges = ActivityParameter._evaluation_inputs(group)
+        data, amounts = _evaluate_group(data, static, exchanges)
+        ActivityParameter._write_recalculated(group, data, exchanges, amounts)
 
         if signal:
             on_activity_parameter_recalculate.send(ActivityParameter, name=group)
 
+    @staticmethod
+    def _update_dependency_chain(group: str) -> list:
+        """Store the current ``dependency_chain`` of ``group`` in its ``Group.order`` and in
+        ``GroupDependency``, and return it."""
+        chain = ActivityParameter.dependency_chain(group)
+
+        # Reset dependencies and dependency order
+        if chain:
+            obj = Group.get(name=group)
+            obj.order = [o["group"] for o in chain if o["kind"] == "activity"]
+            obj.save()
+            GroupDependency.delete().where(GroupDependency.group == group).execute()
+            GroupDependency.insert_many(
+                [{"group": group, "depends": o["group"]} for o in chain]
+            ).execute()
+        return chain
+
+    @staticmethod
+    def _evaluation_inputs(group: str) -> tuple:
+        """Return the parameter data, values from upstream groups, and parameterized exchange
+        formulas needed to recalculate ``group``; see ``_evaluate_group``."""
+        data = ActivityParameter.load(group)
+        static = ActivityParameter._static_dependencies(group)
+        return data, static, ParameterizedExchange.load(group)
+
+    @staticmethod
+    def _write_recalculated(group: str, data: dict, exchanges: dict, amounts: dict) -> None:
+        """Write the results of ``_evaluate_group`` for ``group``."""
+        with parameters.db.atomic():
+            _write_amounts(ActivityParameter, data, group=group)
+            Group.get(name=group).freshen()
+            _update_downstream(group, data, exchanges)
+        _write_exchange_amounts(exchanges, amounts, group)
+        databases.set_dirty(ActivityParameter.get(group=group).database)
+
     @staticmethod
     def recalculate_exchanges(group: str, signal: bool = True):
         """Recalculate formulas for all parameterized exchanges in group ``group``."""
@@ -867,10 +886,8 @@ class ActivityParameter(ParameterBase):
         for k, v in ActivityParameter.static(group, full=True).items():
             interpreter.symtable[k] = v
         # TODO: Remove uncertainty from exchanges?
-        for obj in ParameterizedExchange.select().where(ParameterizedExchange.group == group):
-            exc = ExchangeDataset.get(id=obj.exchange)
-            exc.data["amount"] = interpreter(obj.formula)
-            exc.save(signal=False)
+        formulas = ParameterizedExchange.load(group)
+        _write_exchange_amounts(formulas, _evaluate_formulas(formulas, interpreter), group)
 
         databases.set_dirty(ActivityParameter.get(group=group).database)
 
@@ -881,6 +898,7 @@ class ActivityParameter(ParameterBase):
         """Save this model instance"""
         Group.get_or_create(name=self.group)[0].expire()
         super().save(*args, **kwargs)
+        _index_formula(self.group, self.formula, name=self.name)
 
     def is_deletable(self):
         """Perform a test to see if the current parameter can be deleted."""
@@ -903,8 +921,8 @@ class ActivityParameter(ParameterBase):
             .distinct()
         )
 
-        for row in query.execute():
-            chain = ActivityParameter.dependency_chain(row.group)
+        for downstream in _groups_using(name, (row.group for row in query.execute())):
+            chain = ActivityParameter.dependency_chain(downstream)
             own_group = next((x for x in chain if x.get("group") == group), {})
             if name in own_group.get("names", set()):
                 return True
@@ -918,41 +936,18 @@ class ActivityParameter(ParameterBase):
         This method specifically targets project parameters used in activity
         formulas
         """
-        data = (
-            alter_parameter_formula(p, old, new)
-            for p in (
-                cls.select()
-                .join(GroupDependency, on=(GroupDependency.group == cls.group))
-                .where((GroupDependency.depends == "project") & (cls.formula.contains(old)))
-            )
-            if not ActivityParameter.is_dependency_within_group(old, p.group)
-        )
-        group_parameters = itertools.chain(
-            (
-                cls.select(cls.group)
-                .join(GroupDependency, on=(GroupDependency.group == cls.group))
-                .where((GroupDependency.depends == "project") & (cls.formula.contains(old)))
-                .distinct()
-            ),
-            (
-                ParameterizedExchange.select(ParameterizedExchange.group)
-                .where(ParameterizedExchange.formula.contains(old))
-                .distinct()
-            ),
-        )
-        groups = set(
-            p.group
-            for p in group_parameters
-            if not ActivityParameter.is_dependency_within_group(old, p.group)
+        candidates = GroupDependency.select(GroupDependency.group).where(
+            GroupDependency.depends == "project"
         )
-        exchanges = (
-            alter_parameter_formula(p, old, new)
-            for p in ParameterizedExchange.select().where(ParameterizedExchange.group << groups)
+        cls._update_formulas(
+            old,
+            new,
+            [
+                group
+                for group in _groups_using(old, cls._exchange_groups(candidates))
+                if not ActivityParameter.is_dependency_within_group(old, group)
+            ],
         )
-        cls.bulk_update(data, fields=[cls.formula], batch_size=50)
-        for param_exc in exchanges:
-            param_exc.save(signal=False)
-        Group.update(fresh=False).where(Group.name << groups).execute()
 
         if signal:
             on_activity_parameter_update_formula_project_parameter_name.send(
@@ -966,41 +961,20 @@ class ActivityParameter(ParameterBase):
         This method specifically targets database parameters used in activity
         formulas
         """
-        data = (
-            alter_parameter_formula(p, old, new)
-            for p in (
-                cls.select()
-                .join(GroupDependency, on=(GroupDependency.group == cls.group))
-                .where((GroupDependency.depends == cls.database) & (cls.formula.contains(old)))
-            )
-            if not ActivityParameter.is_dependency_within_group(old, p.group)
-        )
-        group_parameters = itertools.chain(
-            (
-                cls.select(cls.group)
-                .join(GroupDependency, on=(GroupDependency.group == cls.group))
-                .where((GroupDependency.depends == cls.database) & (cls.formula.contains(old)))
-                .distinct()
-            ),
-            (
-                ParameterizedExchange.select(ParameterizedExchange.group)
-                .where(ParameterizedExchange.formula.contains(old))
-                .distinct()
-            ),
+        candidates = (
+            cls.select(cls.group)
+            .join(GroupDependency, on=(GroupDependency.group == cls.group))
+            .where(GroupDependency.depends == cls.database)
         )
-        groups = set(
-            p.group
-            for p in group_parameters
-            if not ActivityParameter.is_dependency_within_group(old, p.group)
-        )
-        exchanges = (
-            alter_parameter_formula(p, old, new)
-            for p in ParameterizedExchange.select().where(ParameterizedExchange.group << groups)
+        cls._update_formulas(
+            old,
+            new,
+            [
+                group
+                for group in _groups_using(old, cls._exchange_groups(candidates))
+                if not ActivityParameter.is_dependency_within_group(old, group)
+            ],
         )
-        cls.bulk_update(data, fields=[cls.formula], batch_size=50)
-        for param_exc in exchanges:
-            param_exc.save(signal=False)
-        Group.update(fresh=False).where(Group.name << groups).execute()
 
         if signal:
             on_activity_parameter_update_formula_database_parameter_name.send(
@@ -1016,38 +990,55 @@ class ActivityParameter(ParameterBase):
         This method specifically targets activity parameters used in activity
         formulas
         """
-        data = (
-            alter_parameter_formula(p, old, new)
-            for p in cls.select().where(cls.formula.contains(old))
-            if ActivityParameter.is_dependency_within_group(old, p.group, include_order)
-        )
-        group_parameters = itertools.chain(
-            cls.select(cls.group).where(cls.formula.contains(old)).distinct(),
-            (
-                ParameterizedExchange.select(ParameterizedExchange.group)
-                .where(ParameterizedExchange.formula.contains(old))
-                .distinct()
-            ),
-        )
-        groups = set(
-            p.group
-            for p in group_parameters
-            if ActivityParameter.is_dependency_within_group(old, p.group, include_order)
-        )
-        exchanges = (
-            alter_parameter_formula(p, old, new)
-            for p in ParameterizedExchange.select().where(ParameterizedExchange.group << groups)
+        cls._update_formulas(
+            old,
+            new,
+            [
+                group
+                for group in _groups_using(old, cls._exchange_groups(cls.select(cls.group)))
+                if ActivityParameter.is_dependency_within_group(old, group, include_order)
+            ],
         )
-        cls.bulk_update(data, fields=[cls.formula], batch_size=50)
-        for param_exc in exchanges:
-            param_exc.save(signal=False)
-        Group.update(fresh=False).where(Group.name << groups).execute()
 
         if signal:
             on_activity_parameter_update_formula_activity_parameter_name.send(
                 cls, old={"old": old}, new={"new": new, "include_order": include_order}
             )
 
+    @staticmethod
+    def _exchange_groups(query) -> set:
+        """Return the group names selected by ``query``, and the groups with parameterized
+        exchanges."""
+        return {row.group for row in query.distinct()}.union(
+            group
+            for (group,) in ParameterizedExchange.select(ParameterizedExchange.group)
+            .distinct()
+            .tuples()
+        )
+
+    @classmethod
+    def _update_formulas(cls, old: str, new: str, groups: list) -> None:
+        """Replace the name ``old`` with ``new`` in the formulas of the parameters and
+        parameterized exchanges of ``groups``, and expire the changed groups."""
+        data = [
+            alter_parameter_formula(p, old, new)
+            for p in cls.select().where((cls.group << groups) & cls.formula.contains(old))
+        ]
+        exchanges = [
+            alter_parameter_formula(p, old, new)
+            for p in ParameterizedExchange.select().where(
+                (ParameterizedExchange.group << groups)
+                & ParameterizedExchange.formula.contains(old)
+            )
+        ]
+        cls.bulk_update(data, fields=[cls.formula], batch_size=50)
+        for p in data:
+            _index_formula(p.group, p.formula, name=p.name)
+        for param_exc in exchanges:
+            param_exc.save(signal=False)
+        changed = list({p.group for p in itertools.chain(data, exchanges)})
+        Group.update(fresh=False).where(Group.name << changed).execute()
+
     @classmethod
     def create_table(cls):
         super(ActivityParameter, cls).create_table()
@@ -1086,6 +1077,7 @@ class ParameterizedExchange(SnowflakeIDBaseClass):
     def save(self, *args, **kwargs):
         Group.get_or_create(name=self.group)[0].expire()
         super().save(*args, **kwargs)
+        _index_formula(self.group, self.formula, exchange=self.exchange)
         # Push the changed formula to the Exchange.
         exc = ExchangeDataset.get_or_none(id=self.exchange)
         if exc and exc.data.get("formula") != self.formula:
@@ -1157,6 +1149,25 @@ class GroupDependency(Model):
         cls._meta.database.execute_sql(GD_INSERT_TRIGGER)
 
 
+class FormulaSymbol(Model):
+    """Names used in the formula of each parameter and parameterized exchange of a group.
+
+    Saved when a group is recalculated, and updated when a parameter or parameterized exchange of
+    an already indexed group is saved. Used to find the parameters and exchanges which need to be
+    updated when parameter values in other groups change (see ``_update_downstream``), and the
+    groups which can use a parameter name when checking dependencies or renaming parameters (see
+    ``_groups_using``). Parameters without formula symbols get one row with a null ``symbol``, so
+    each group also lists all its parameter names. ``amount`` is the parameter value when the group
+    was last recalculated. Rows for parameterized exchanges have a null ``name`` and the exchange id
+    in ``exchange``."""
+
+    group = TextField(index=True)
+    name = TextField(null=True)
+    exchange = IntegerField(null=True)
+    symbol = TextField(null=True, index=True)
+    amount = FloatField(null=True)
+
+
 class ParameterManager:
     def __init__(self):
         self.db = SubstitutableDatabase(
@@ -1168,6 +1179,7 @@ class ParameterManager:
                 ParameterizedExchange,
                 Group,
                 GroupDependency,
+                FormulaSymbol,
             ],
         )
         config.sqlite3_databases.append(("parameters.db", self.db))
@@ -1607,18 +1619,52 @@ class ParameterManager:
             parameter.save()
             self.recalculate()
 
-    def recalculate(self):
-        """Recalculate all expired project, database, and activity parameters, as well as exchanges."""
+    def recalculate(self, processes: Optional[int] = 1):
+        """Recalculate all expired project, database, and activity parameters, as well as exchanges.
+
+        By default, expired activity parameter groups are recalculated one after the other. With
+        ``processes`` larger than one (or ``None`` for the number of CPUs), and at least
+        ``PARALLEL_RECALCULATION_MIN_GROUPS`` expired groups, groups which don't depend on each
+        other are evaluated at the same time in worker processes; on platforms which spawn new
+        processes, scripts using this need an ``if __name__ == "__main__":`` guard. Results are
+        written one group at a time by this process."""
         if ProjectParameter.expired():
             ProjectParameter.recalculate()
         for db in databases:
             if DatabaseParameter.expired(db):
                 DatabaseParameter.recalculate(db)
-        for obj in Group.select().where(Group.fresh == False):
+        groups = [
+            obj.name
+            for obj in Group.select().where(Group.fresh == False)
             # Shouldn't be possible? Maybe concurrent access?
-            if obj.name in databases or obj.name == "project":
-                continue
-            ActivityParameter.recalculate(obj.name)
+            if obj.name not in databases and obj.name != "project"
+        ]
+        processes = processes or os.cpu_count() or 1
+        if processes > 1 and len(groups) >= PARALLEL_RECALCULATION_MIN_GROUPS:
+            _recalculate_in_parallel(groups, processes)
+        else:
+            for name in groups:
+                ActivityParameter.recalculate(name)
+
+    def compile(self, group: str = "project"):
+        """Compile the formulas of parameter group ``group`` (``"project"``, a database name, or an
+        activity parameter group) to NumPy expressions, for evaluating many Monte Carlo iterations
+        at once.
+
+        Returns a ``bw2data.formula_compiler.CompiledParameters`` instance."""
+        from bw2data.formula_compiler import CompiledParameters
+
+        return CompiledParameters(group)
+
+    def overlay_datapackage(self, groups=None, samples=None, iterations=None, **kwargs):
+        """Create a datapackage with the values of the parameterized exchanges in ``groups``,
+        without writing to or processing the databases. Can be stacked on top of the processed
+        database datapackages in ``bw2calc``, e.g. for parameter sweeps.
+
+        See ``bw2data.formula_compiler.overlay_datapackage``."""
+        from bw2data.formula_compiler import overlay_datapackage
+
+        return overlay_datapackage(groups, samples=samples, iterations=iterations, **kwargs)
 
     def __len__(self):
         return (
@@ -1634,9 +1680,354 @@ class ParameterManager:
 parameters = ParameterManager()
 
 
+def _write_amounts(model, data: dict, **where) -> None:
+    """Write the ``amount`` values in ``data`` (``{name: dict}``) to the ``model`` table.
+
+    Uses one ``executemany`` instead of one ``UPDATE`` query per parameter. ``where`` gives the
+    additional column values which identify the group, e.g. ``database="foo"``. Should be called
+    inside a transaction."""
+    conditions = "".join(' AND "{}" = ?'.format(field) for field in where)
+    model._meta.database.connection().executemany(
+        "UPDATE {} SET amount = ? WHERE name = ?{}".format(model._meta.table_name, conditions),
+        [
+            (model.amount.db_value(value["amount"]), name, *where.values())
+            for name, value in data.items()
+        ],
+    )
+
+
+def _evaluate_formulas(formulas: dict, interpreter: Interpreter) -> dict:
+    """Evaluate each distinct formula in the ``{exchange id: formula}`` ``formulas`` once. Returns
+    ``{formula: amount}``."""
+    return {formula: interpreter(formula) for formula in set(formulas.values())}
+
+
+def _evaluate_group(data: dict, static: dict, exchanges: dict) -> tuple:
+    """Evaluate the activity parameters ``data`` and the ``{exchange id: formula}`` ``exchanges``
+    of a group, given the ``{name: amount}`` of the upstream groups in ``static``.
+
+    Doesn't access any database, so can be run in worker processes. Returns the parameter data
+    with updated ``amount`` values, and ``{formula: amount}`` for the exchanges."""
+    ParameterSet(
+        data, {k: v for k, v in static.items() if k not in data}
+    ).evaluate_and_set_amount_field()
+    interpreter = Interpreter()
+    interpreter.symtable.update(static)
+    interpreter.symtable.update({name: ds["amount"] for name, ds in data.items()})
+    return data, _evaluate_formulas(exchanges, interpreter)
+
+
+def _recalculate_in_parallel(groups: list, processes: int) -> None:
+    """Recalculate the expired activity parameter ``groups`` with ``_evaluate_group`` in a pool
+    of ``processes`` worker processes.
+
+    Project and database parameters must already be fresh. A group is evaluated as soon as all
+    expired groups it depends on are written, so independent groups are evaluated at the same
+    time. Inputs are read and results written in this process, one group at a time."""
+    expired = set(groups)
+    graph = {}
+    for group in groups:
+        chain = ActivityParameter._update_dependency_chain(group)
+        graph[group] = expired.intersection(o["group"] for o in chain if o["kind"] == "activity")
+    sorter = TopologicalSorter(graph)
+    sorter.prepare()
+
+    with ProcessPoolExecutor(max_workers=processes) as executor:
+        running = {}
+        while sorter.is_active():
+            for group in sorter.get_ready():
+                data, static, exchanges = ActivityParameter._evaluation_inputs(group)
+                future = executor.submit(_evaluate_group, data, static, exchanges)
+                running[future] = (group, exchanges)
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in finished:
+                group, exchanges = running.pop(future)
+                data, amounts = future.result()
+                ActivityParameter._write_recalculated(group, data, exchanges, amounts)
+                on_activity_parameter_recalculate.send(ActivityParameter, name=group)
+                sorter.done(group)
+
+
+def _write_exchange_amounts(formulas: dict, amounts: dict, group: str) -> None:
+    """Write the ``{formula: amount}`` ``amounts`` to the exchanges in the ``{exchange id:
+    formula}`` ``formulas``.
+
+    Exchanges are loaded in bulk and written back with one ``executemany`` in one transaction."""
+    ids = list(formulas)
+    rows = []
+    for chunk_range in range(0, len(ids), 500):
+        for id_, data in (
+            ExchangeDataset.select(ExchangeDataset.id, ExchangeDataset.data)
+            .where(ExchangeDataset.id << ids[chunk_range : chunk_range + 500])
+            .tuples()
+        ):
+            data["amount"] = amounts[formulas[id_]]
+            rows.append((ExchangeDataset.data.db_value(data), id_))
+    if len(rows) != len(ids):
+        raise ExchangeDataset.DoesNotExist(
+            "Parameterized exchanges in group {} refer to missing exchanges".format(group)
+        )
+    with sqlite3_lci_db.atomic():
+        sqlite3_lci_db.db.connection().executemany(
+            "UPDATE {} SET data = ? WHERE id = ?".format(ExchangeDataset._meta.table_name),
+            rows,
+        )
+
+
+def _formula_symbols(formula: str) -> frozenset:
+    return _formula_names(formula).difference(_builtin_symbols())
+
+
+def _index_formulas(group: str, data: dict, exchanges: Optional[dict] = None) -> dict:
+    """Replace the ``FormulaSymbol`` rows of ``group``. Returns the previously indexed
+    ``{name: amount}``."""
+    previous = dict(
+        FormulaSymbol.select(FormulaSymbol.name, FormulaSymbol.amount)
+        .where(FormulaSymbol.group == group, FormulaSymbol.name.is_null(False))
+        .tuples()
+    )
+    FormulaSymbol.delete().where(FormulaSymbol.group == group).execute()
+    rows = [
+        (group, name, None, symbol, ds.get("amount"))
+        for name, ds in data.items()
+        for symbol in (_formula_symbols(ds["formula"]) if ds.get("formula") else ()) or [None]
+    ] + [
+        (group, None, exchange, symbol, None)
+        for exchange, formula in (exchanges or {}).items()
+        for symbol in _formula_symbols(formula) or [None]
+    ]
+    fields = [
+        FormulaSymbol.group,
+        FormulaSymbol.name,
+        FormulaSymbol.exchange,
+        FormulaSymbol.symbol,
+        FormulaSymbol.amount,
+    ]
+    for chunk_range in range(0, len(rows), 200):
+        FormulaSymbol.insert_many(rows[chunk_range : chunk_range + 200], fields=fields).execute()
+    return previous
+
+
+def _index_formula(
+    group: str, formula: Optional[str], name: Optional[str] = None, exchange: Optional[int] = None
+) -> None:
+    """Replace the ``FormulaSymbol`` rows of the parameter ``name`` or the parameterized exchange
+    ``exchange`` in ``group`` after it was saved.
+
+    Keeps the last recalculated amount of the parameter. Groups without any rows are left alone,
+    they are indexed completely when they are recalculated."""
+    if not FormulaSymbol.select().where(FormulaSymbol.group == group).exists():
+        return
+    if exchange is None:
+        where = (FormulaSymbol.group == group) & (FormulaSymbol.name == name)
+        amount = FormulaSymbol.select(FormulaSymbol.amount).where(where).scalar()
+    else:
+        where = FormulaSymbol.exchange == exchange
+        amount = None
+    FormulaSymbol.delete().where(where).execute()
+    FormulaSymbol.insert_many(
+        [
+            (group, name, exchange, symbol, amount)
+            for symbol in (_formula_symbols(formula) if formula else ()) or [None]
+        ],
+        fields=[
+            FormulaSymbol.group,
+            FormulaSymbol.name,
+            FormulaSymbol.exchange,
+            FormulaSymbol.symbol,
+            FormulaSymbol.amount,
+        ],
+    ).execute()
+
+
+def _groups_using(symbol: str, groups) -> list:
+    """Return the ``groups`` whose formulas can use the name ``symbol``, as given by the
+    ``FormulaSymbol`` rows.
+
+    Rows of deleted or renamed parameters stay until their group is recalculated, and groups
+    without any rows are always included, so the result can include groups which don't use
+    ``symbol``, but never misses one."""
+    groups = set(groups)
+    indexed = {name for (name,) in FormulaSymbol.select(FormulaSymbol.group).distinct().tuples()}
+    using = {
+        name
+        for (name,) in FormulaSymbol.select(FormulaSymbol.group)
+        .where(FormulaSymbol.symbol == symbol)
+        .distinct()
+        .tuples()
+    }
+    return sorted(groups.intersection(using) | groups.difference(indexed))
+
+
+def _group_chain(group: str) -> list:
+    """Return ``[(group name, {name: amount})]`` for the groups whose parameters can be used in
+    ``group``, in lookup order, starting with ``group`` itself."""
+    if group == "project":
+        return [("project", ProjectParameter.static())]
+    database = (
+        ActivityParameter.select(ActivityParameter.database)
+        .where(ActivityParameter.group == group)
+        .scalar()
+    )
+    if database is None:
+        return [(group, DatabaseParameter.static(group)), ("project", ProjectParameter.static())]
+    return (
+        [(group, ActivityParameter.static(group))]
+        + [(name, ActivityParameter.static(name)) for name in Group.get(name=group).order]
+        + [(database, DatabaseParameter.static(database)), ("project", ProjectParameter.static())]
+    )
+
+
+def _downstream_groups(group: str) -> set:
+    groups = {
+        name
+        for (name,) in GroupDependency.select(GroupDependency.group)
+        .where(GroupDependency.depends == group)
+        .tuples()
+    }
+    if group in databases:
+        groups.update(
+            name
+            for (name,) in ActivityParameter.select(ActivityParameter.group)
+            .where(ActivityParameter.database == group)
+            .distinct()
+            .tuples()
+        )
+    return groups
+
+
+def _update_downstream(group: str, data: dict, exchanges: Optional[dict] = None) -> None:
+    """Update other groups after ``group`` was recalculated with the new values ``data``.
+
+    ``exchanges`` are the ``{exchange id: formula}`` parameterized exchanges of an activity group.
+    Replaces the ``FormulaSymbol`` rows for ``group``.
+
+    Starting from the parameter names whose values changed since the last recalculation, the
+    dependency graph given by the formula symbols is followed through the downstream groups in
+    topological order. Only the parameters and exchanges which use a changed value, directly or
+    indirectly, are evaluated again and written. Downstream groups which were not recalculated
+    since the formula index was introduced, or which use the names of deleted or renamed
+    parameters, are expired instead.
+    """
+    indexed = _index_formulas(group, data, exchanges)
+    removed = set(indexed).difference(data)
+    if removed:
+        downstream = _downstream_groups(group)
+        expired = {other for name in removed for other in _groups_using(name, downstream)}
+        Group.update(fresh=False).where(Group.name << list(expired)).execute()
+    changed = {
+        name
+        for name, ds in data.items()
+        if name not in indexed or ds.get("amount") != indexed[name]
+    }
+    if not changed:
+        return
+
+    upstream = {}
+    todo, seen = [group], {group}
+    while todo:
+        current = todo.pop()
+        for name in _downstream_groups(current):
+            upstream.setdefault(name, set()).add(current)
+            if name not in seen:
+                seen.add(name)
+                todo.append(name)
+
+    changed_by_group = {group: changed}
+    for name in TopologicalSorter(upstream).static_order():
+        inputs = {
+            (other, symbol)
+            for other in upstream.get(name, ())
+            for symbol in changed_by_group.get(other, ())
+        }
+        obj = Group.get_or_none(name=name)
+        if not inputs or obj is None or not obj.fresh:
+            # Nothing to do, or will be recalculated completely anyway
+            continue
+        changed_by_group[name] = _update_dependents(name, inputs)
+
+
+def _update_dependents(group: str, inputs: set) -> set:
+    """Evaluate parameters and parameterized exchanges in ``group`` which depend on the changed
+    ``(group, name)`` ``inputs``. Returns the names whose values changed."""
+    rows = list(
+        FormulaSymbol.select(FormulaSymbol.name, FormulaSymbol.exchange, FormulaSymbol.symbol)
+        .where(FormulaSymbol.group == group)
+        .tuples()
+    )
+    if not rows:
+        Group.get(name=group).expire()
+        return set()
+
+    chain = _group_chain(group)
+    provider, upstream_values = {}, {}
+    for name, values in chain[:0:-1]:
+        provider.update(dict.fromkeys(values, name))
+        upstream_values.update(values)
+    is_activity_group = len(chain) > 2
+    model = ActivityParameter if is_activity_group else DatabaseParameter
+    data = model.load(group)
+    provider.update(dict.fromkeys(data, group))
+
+    def uses(symbol, names):
+        return (provider.get(symbol), symbol) in inputs or (
+            provider.get(symbol) == group and symbol in names
+        )
+
+    # Parameters within the group can depend on each other
+    affected = set()
+    while True:
+        new = {name for name, _, symbol in rows if name in data and uses(symbol, affected)}
+        if new.issubset(affected):
+            break
+        affected.update(new)
+
+    subset = {name: data[name] for name in affected}
+    previous = {name: ds.get("amount") for name, ds in subset.items()}
+    static = {k: v for k, v in upstream_values.items() if k not in data}
+    static.update({name: ds.get("amount") for name, ds in data.items() if name not in affected})
+    if subset:
+        ParameterSet(subset, static).evaluate_and_set_amount_field()
+    changed = {name for name, ds in subset.items() if ds["amount"] != previous[name]}
+    where = {"group": group} if is_activity_group else {"database": group}
+    _write_amounts(model, {name: subset[name] for name in changed}, **where)
+
+    exchanges = {exchange for _, exchange, symbol in rows if exchange and uses(symbol, changed)}
+    if exchanges:
+        interpreter = Interpreter()
+        interpreter.symtable.update(static)
+        interpreter.symtable.update({name: ds["amount"] for name, ds in subset.items()})
+        formulas = dict(
+            ParameterizedExchange.select(ParameterizedExchange.exchange, ParameterizedExchange.formula)
+            .where(ParameterizedExchange.exchange << list(exchanges))
+            .tuples()
+        )
+        _write_exchange_amounts(formulas, _evaluate_formulas(formulas, interpreter), group)
+        databases.set_dirty(chain[-2][0])
+    return changed
+
+
+@functools.lru_cache(maxsize=1)
+def _parser() -> Interpreter:
+    """Shared ``Interpreter``, only used to parse formulas and for its builtin symbols."""
+    return asteval.Interpreter()
+
+
+@functools.lru_cache(maxsize=1)
+def _builtin_symbols() -> frozenset:
+    return frozenset(_parser().symtable)
+
+
+@functools.lru_cache(maxsize=4096)
+def _formula_names(formula: str) -> frozenset:
+    """All names used in ``formula``. Each distinct formula is only parsed once."""
+    nf = asteval.NameFinder()
+    nf.generic_visit(_parser().parse(formula))
+    return frozenset(nf.names)
+
+
 def get_new_symbols(data, context=None):
-    interpreter = asteval.Interpreter()
-    BUILTIN_SYMBOLS = set(interpreter.symtable).union(set(context or set()))
+    excluded = _builtin_symbols().union(context or set())
     found = set()
     for ds in data:
         if isinstance(ds, str):
@@ -1645,11 +2036,8 @@ def get_new_symbols(data, context=None):
             formula = ds["formula"]
         else:
             continue
-
-        nf = asteval.NameFinder()
-        nf.generic_visit(interpreter.parse(formula))
-        found.update(set(nf.names))
-    return found.difference(BUILTIN_SYMBOLS)
+        found.update(_formula_names(formula))
+    return found.difference(excluded)
 
 
 def alter_parameter_formula(parameter, old, new):
@@ -1,4 +1,3 @@
-import json
 import os
 import shutil
 import warnings
@@ -18,6 +17,7 @@ import bw2data.signals as bw2signals
 from bw2data import config
 from bw2data.errors import InconsistentData, PossibleInconsistentData
 from bw2data.filesystem import create_dir
+from bw2data.json_codec import codec
 from bw2data.logs import stdout_feedback_logger
 from bw2data.signals import project_changed, project_created, project_deleted
 from bw2data.sqlite import PickleField, SubstitutableDatabase
@@ -84,8 +84,9 @@ class ProjectDataset(Model):
         from bw2data import revisions
 
         rev_id = revision["metadata"]["revision"]
-        with open(self.dir / "revisions" / f"{rev_id}.rev", "w") as f:
-            f.write(revisions.JSONEncoder(indent=2).encode(revision))
+        codec.dump(
+            revision, self.dir / "revisions" / f"{rev_id}.rev", default=revisions.json_default
+        )
 
     def _write_head(self, head: Optional["revisions.ID"] = None):
         """Write starting revision to disk."""
@@ -196,8 +197,7 @@ class ProjectDataset(Model):
         for filename in os.listdir(self.dir / "revisions"):
             if not filename.endswith(".rev"):
                 continue
-            with open(self.dir / "revisions" / filename, "r") as f:
-                revs.append(json.load(f))
+            revs.append(codec.load(self.dir / "revisions" / filename))
         return head, revs
 
     def _rebase(
@@ -684,6 +684,19 @@ class ProjectManager(Iterable):
             self.dataset.full_hash = False
             raise ex
 
+    def use_sqlite_metadata(self):
+        """Store metadata like ``databases`` and ``methods`` in the project file ``metadata.db``,
+        with one row per key, instead of rewriting whole ``.json`` and ``.pickle`` files on every
+        change. The existing files are imported, and are not updated afterwards.
+
+        New projects can use this from the start with
+        ``projects.create_project(name, metadata_backend="sqlite")``."""
+        if self.dataset.data.get("metadata_backend") == "sqlite":
+            return
+        self.dataset.data["metadata_backend"] = "sqlite"
+        self.dataset.save()
+        self._reset_meta()
+
 
 def signal_dispatcher(
     sender, old: Optional[Any] = None, new: Optional[Any] = None, operation: Optional[str] = None
@@ -21,6 +21,7 @@ from bw2data.backends.schema import ActivityDataset, ExchangeDataset
 from bw2data.backends.utils import dict_as_activitydataset, dict_as_exchangedataset
 from bw2data.database import DatabaseChooser
 from bw2data.errors import DifferentObjects, IncompatibleClasses
+from bw2data.json_codec import codec
 from bw2data.parameters import (
     ActivityParameter,
     DatabaseParameter,
@@ -203,7 +204,8 @@ class Delta:
     def from_dict(cls, d: dict) -> Self:
         return cls(
             delta=deepdiff.Delta(
-                JSONEncoder().encode(d), deserializer=deepdiff.serialization.json_loads
+                codec.dumps(d, default=json_default),
+                deserializer=deepdiff.serialization.json_loads,
             ),
         )
 
@@ -331,6 +333,18 @@ class JSONEncoder(json.JSONEncoder):
         return json.loads(obj.delta.dumps())
 
 
+_deepdiff_json_default = deepdiff.serialization.json_convertor_default()
+
+
+def json_default(obj):
+    """``default`` function to write revisions with ``bw2data.json_codec.codec``.
+
+    Like ``JSONEncoder``, but doesn't encode and decode each ``Delta`` an extra time."""
+    if isinstance(obj, Delta):
+        return obj.delta.diff
+    return _deepdiff_json_default(obj)
+
+
 def generate_metadata(
     metadata: Optional[dict[str, Any]] = None,
     parent_revision: Optional[int] = None,
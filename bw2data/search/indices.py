@@ -3,6 +3,7 @@ import os
 from peewee import SqliteDatabase
 
 from bw2data import projects
+from bw2data.batching import current_batch
 from bw2data.search.schema import BW2Schema
 
 MODELS = (BW2Schema,)
@@ -10,6 +11,7 @@ MODELS = (BW2Schema,)
 
 class IndexManager:
     def __init__(self, database_path):
+        self.filename = database_path
         self.path = os.path.join(projects.request_directory("search"), database_path)
         self.db = SqliteDatabase(self.path)
         with self.db.connection_context():
@@ -81,7 +83,51 @@ class IndexManager:
                         model.code == ds["code"], model.database == ds["database"]
                     ).execute()
 
+    def _delete_many(self, model, datasets):
+        codes = {}
+        for ds in datasets:
+            codes.setdefault(ds["database"], []).append(ds["code"])
+        for database, lst in codes.items():
+            for chunk_range in range(0, len(lst), 500):
+                model.delete().where(
+                    model.database == database,
+                    model.code.in_(lst[chunk_range : chunk_range + 500]),
+                ).execute()
+
+    def update_datasets(self, datasets):
+        """Replace the index entries of many datasets in one transaction"""
+        all_dataset = list(datasets)
+        if not all_dataset:
+            return
+        with self.db.connection_context():
+            with self.db.bind_ctx(MODELS):
+                with self.db.atomic():
+                    for model in MODELS:
+                        self._delete_many(model, all_dataset)
+                        for chunk_range in range(0, len(all_dataset), 100):
+                            model.insert_many(
+                                [
+                                    self._format_dataset(ds)
+                                    for ds in all_dataset[chunk_range : chunk_range + 100]
+                                ]
+                            ).execute()
+
+    def delete_datasets(self, datasets):
+        """Delete the index entries of many datasets in one transaction"""
+        all_dataset = list(datasets)
+        if not all_dataset:
+            return
+        with self.db.connection_context():
+            with self.db.bind_ctx(MODELS):
+                with self.db.atomic():
+                    for model in MODELS:
+                        self._delete_many(model, all_dataset)
+
     def delete_database(self):
+        session = current_batch()
+        if session is not None:
+            # Queued changes would be applied to the new, empty index
+            session.discard_search_index(self.filename)
         with self.db.connection_context():
             with self.db.bind_ctx(MODELS):
                 self.db.drop_tables(MODELS)
@@ -1,67 +1,53 @@
 import bz2
+import itertools
 import os
 import pickle
 import random
+import sqlite3
 from collections.abc import MutableMapping
+from contextlib import contextmanager
 from copy import deepcopy
 from pathlib import Path
 from time import time
 from typing import Union
 
 from bw2data import projects
+from bw2data.batching import current_batch
 from bw2data.errors import PickleError
 from bw2data.fatomic import open as atomic_open
+from bw2data.json_codec import codec
 from bw2data.utils import maybe_path
 
-try:
-    import anyjson
-except ImportError:
-    anyjson = None
-    import json
-
 
 class JsonWrapper:
+    """JSON file and string helpers; see ``bw2data.json_codec.JSONCodec`` for the encoding rules"""
+
     @classmethod
     def dump(self, data, filepath):
-        with atomic_open(filepath, "w") as f:
-            if anyjson:
-                f.write(anyjson.serialize(data))
-            else:
-                json.dump(data, f, indent=2)
+        codec.dump(data, filepath)
 
     @classmethod
     def dump_bz2(self, data, filepath):
         with atomic_open(filepath, "wb") as f:
             with bz2.BZ2File(f.name, "wb") as b:
-                b.write((JsonWrapper.dumps(data)).encode("utf-8"))
+                b.write(codec.dumpb(data))
 
     @classmethod
     def load(self, file):
-        if anyjson:
-            with open(file, encoding="utf-8") as f:
-                return anyjson.deserialize(f.read())
-        else:
-            with open(file, encoding="utf-8") as f:
-                return json.load(f)
+        return codec.load(file)
 
     @classmethod
     def load_bz2(self, filepath):
         with bz2.BZ2File(filepath) as f:
-            return JsonWrapper.loads(f.read().decode("utf-8"))
+            return codec.loads(f.read())
 
     @classmethod
     def dumps(self, data):
-        if anyjson:
-            return anyjson.serialize(data)
-        else:
-            return json.dumps(data)
+        return codec.dumps(data)
 
     @classmethod
     def loads(self, data):
-        if anyjson:
-            return anyjson.deserialize(data)
-        else:
-            return json.loads(data)
+        return codec.loads(data)
 
 
 class JsonSanitizer:
@@ -100,10 +86,84 @@ class JsonSanitizer:
             return data
 
 
+class SQLiteMetadataStore:
+    """Storage for ``SerializedDict`` data in the project file ``metadata.db``, one row per key.
+
+    Used instead of whole ``.json`` and ``.pickle`` files when the project data has
+    ``metadata_backend`` set to ``"sqlite"``. Each dictionary is identified by its ``filename``;
+    keys are stored as their ``repr``, and values in the same format as the files would use."""
+
+    filename = "metadata.db"
+
+    def __init__(self, dirpath):
+        self.filepath = Path(dirpath) / self.filename
+        with self._connect() as connection:
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS metadata ("
+                "name TEXT NOT NULL, key TEXT NOT NULL, value BLOB NOT NULL, "
+                "PRIMARY KEY (name, key))"
+            )
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS metadata_names "
+                "(name TEXT PRIMARY KEY, version INTEGER NOT NULL DEFAULT 0)"
+            )
+
+    @contextmanager
+    def _connect(self):
+        connection = sqlite3.connect(self.filepath)
+        try:
+            # Commits on success, rolls back on error
+            with connection:
+                yield connection
+        finally:
+            connection.close()
+
+    def read(self, name: str) -> Union[dict, None]:
+        """Return ``{key: value}`` rows for ``name``, or ``None`` if it was never written."""
+        with self._connect() as connection:
+            if not connection.execute(
+                "SELECT 1 FROM metadata_names WHERE name = ?", (name,)
+            ).fetchone():
+                return None
+            return dict(
+                connection.execute("SELECT key, value FROM metadata WHERE name = ?", (name,))
+            )
+
+    def version(self, name: str) -> Union[int, None]:
+        """Return the number of writes to ``name``, or ``None`` if it was never written."""
+        with self._connect() as connection:
+            row = connection.execute(
+                "SELECT version FROM metadata_names WHERE name = ?", (name,)
+            ).fetchone()
+        return row[0] if row else None
+
+    def write(self, name: str, changed: dict, deleted: list = ()) -> None:
+        """Insert or replace ``changed`` rows and delete ``deleted`` keys in one transaction"""
+        with self._connect() as connection:
+            connection.execute(
+                "INSERT INTO metadata_names (name, version) VALUES (?, 1) "
+                "ON CONFLICT (name) DO UPDATE SET version = version + 1",
+                (name,),
+            )
+            connection.executemany(
+                "DELETE FROM metadata WHERE name = ? AND key = ?", [(name, key) for key in deleted]
+            )
+            connection.executemany(
+                "INSERT OR REPLACE INTO metadata (name, key, value) VALUES (?, ?, ?)",
+                [(name, key, value) for key, value in changed.items()],
+            )
+
+
 class SerializedDict(MutableMapping):
     """Base class for dictionary that can be `serialized <http://en.wikipedia.org/wiki/Serialization>`_ to or unserialized from disk. Uses JSON as its storage format. Has most of the methods of a dictionary.
 
-    Upon instantiation, the serialized dictionary is read from disk."""
+    Upon instantiation, the serialized dictionary is read from disk. If the file is changed by
+    another process (or another instance of the same class), the data is read again the next
+    time it is accessed; unflushed changes made directly to ``.data`` are lost in that case.
+
+    If the project data has ``metadata_backend`` set to ``"sqlite"``, the data is stored in an
+    ``SQLiteMetadataStore`` instead of a file, and flushing only writes the keys whose values have
+    changed. The save signal then only includes the changed keys."""
 
     def __init__(self, dirpath=None):
         if not getattr(self, "filename"):
@@ -111,11 +171,18 @@ class SerializedDict(MutableMapping):
                 "SerializedDict must be subclassed, and the filename must be set."
             )
         self.filepath = (maybe_path(dirpath) or projects.dir) / self.filename
+        if dirpath is None and projects.dataset.data.get("metadata_backend") == "sqlite":
+            self._store = SQLiteMetadataStore(projects.dir)
+        else:
+            self._store = None
         self.load()
 
     def load(self):
         """Load the serialized data. Creates the file if not yet present."""
+        if self._store is not None:
+            return self._load_from_store()
         try:
+            self._disk_state = self._current_disk_state()
             self.data = self.deserialize()
         except IOError:
             # Create if not present
@@ -123,18 +190,96 @@ class SerializedDict(MutableMapping):
             # No need to send signal when there is no data
             self.flush(signal=False)
 
+    def _current_disk_state(self) -> Union[tuple, None]:
+        # Files are replaced atomically, so each write gives a new inode
+        try:
+            stat = os.stat(self._store.filepath if self._store is not None else self.filepath)
+        except OSError:
+            return None
+        return (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+
+    def _reload_if_stale(self) -> None:
+        """Reload the data if another process wrote it since we last read or wrote it.
+
+        Costs one ``stat`` call. Not done inside a ``bw2data.batch()`` block, where our own
+        changes are not written yet."""
+        if current_batch() is not None:
+            return
+        state = self._current_disk_state()
+        if state == self._disk_state:
+            return
+        self._disk_state = state
+        if self._store is not None and self._store.version(self.filename) == self._store_version:
+            # Only other dictionaries in ``metadata.db`` were changed
+            return
+        self.load()
+
     def flush(self, signal: bool = True):
-        """Serialize the current data to disk."""
-        self.serialize(signal=signal)
+        """Serialize the current data to disk.
+
+        Inside a ``bw2data.batch()`` block, the data is only written when the block exits."""
+        session = current_batch()
+        if session is not None:
+            session.defer_flush(self, signal=signal)
+        elif self._store is not None:
+            self._write_to_store(signal=signal)
+        else:
+            self.serialize(signal=signal)
+
+    def _dumps_item(self, key, value) -> bytes:
+        return codec.dumpb(self.pack({key: value}))
+
+    def _loads_item(self, value: bytes) -> dict:
+        return self.unpack(codec.loads(value))
+
+    def _load_from_store(self):
+        self._disk_state = self._current_disk_state()
+        self._store_version = self._store.version(self.filename)
+        rows = self._store.read(self.filename)
+        if rows is None:
+            # First use of the store in this project; import the existing file, if any
+            try:
+                self.data = self.deserialize()
+            except IOError:
+                self.data = {}
+            self._stored = {}
+            self._write_to_store(signal=False, force=True)
+        else:
+            self._stored = rows
+            self.data = {}
+            for value in rows.values():
+                self.data.update(self._loads_item(value))
+
+    def _write_to_store(self, signal: bool = True, force: bool = False):
+        current = {repr(key): self._dumps_item(key, value) for key, value in self.data.items()}
+        changed = {key: value for key, value in current.items() if self._stored.get(key) != value}
+        deleted = [key for key in self._stored if key not in current]
+        if not (changed or deleted or force):
+            return
+        self._store.write(self.filename, changed, deleted)
+        self._disk_state = self._current_disk_state()
+        self._store_version = self._store.version(self.filename)
+        previous, self._stored = self._stored, current
+
+        if signal and hasattr(self, "_save_signal"):
+            old, new = {}, {}
+            for key in itertools.chain(changed, deleted):
+                if key in previous:
+                    old.update(self._loads_item(previous[key]))
+            for key in changed:
+                new.update(self._loads_item(current[key]))
+            self._save_signal.send(self, old=old, new=new)
 
     @property
     def list(self):
         """List the keys of the dictionary. This is a property, and does not need to be called."""
+        self._reload_if_stale()
         return sorted(self.data.keys())
 
     def __getitem__(self, key):
         if isinstance(key, list):
             key = tuple(key)
+        self._reload_if_stale()
         return self.data[key]
 
     def __setitem__(self, key, value):
@@ -142,6 +287,7 @@ class SerializedDict(MutableMapping):
         self.flush()
 
     def __contains__(self, key):
+        self._reload_if_stale()
         return key in self.data
 
     def __str__(self):
@@ -170,20 +316,28 @@ class SerializedDict(MutableMapping):
         self.flush(signal=signal)
 
     def __len__(self):
+        self._reload_if_stale()
         return len(self.data)
 
     def __iter__(self):
+        self._reload_if_stale()
         return iter(self.data)
 
     def __hash__(self):
         return hash(self.data)
 
     def keys(self):
+        self._reload_if_stale()
         return self.data.keys()
 
     def values(self):
+        self._reload_if_stale()
         return self.data.values()
 
+    def items(self):
+        self._reload_if_stale()
+        return self.data.items()
+
     def serialize(self, filepath: Union[str, Path] = None, signal: bool = True):
         """Method to do the actual serialization. Can be replaced with other serialization formats.
 
@@ -197,15 +351,16 @@ class SerializedDict(MutableMapping):
             except IOError:
                 previous = {}
 
-        with atomic_open(filepath or self.filepath, "w") as f:
-            f.write(JsonWrapper.dumps(self.pack(self.data)))
+        codec.dump(self.pack(self.data), filepath or self.filepath)
+        if filepath is None:
+            self._disk_state = self._current_disk_state()
 
         if signal and hasattr(self, "_save_signal"):
             self._save_signal.send(self, old=previous, new=deepcopy(self.data))
 
     def deserialize(self):
         """Load the serialized data. Can be replaced with other serialization formats."""
-        return self.unpack(JsonWrapper.load(self.filepath))
+        return self.unpack(codec.load(self.filepath))
 
     def pack(self, data):
         """Transform the data, if necessary. Needed because JSON must have strings as dictionary keys."""
@@ -237,10 +392,17 @@ class PickledDict(SerializedDict):
 
         with atomic_open(self.filepath, "wb") as f:
             pickle.dump(self.pack(self.data), f, protocol=4)
+        self._disk_state = self._current_disk_state()
 
         if signal and hasattr(self, "_save_signal"):
             self._save_signal.send(self, old=previous, new=deepcopy(self.data))
 
+    def _dumps_item(self, key, value) -> bytes:
+        return pickle.dumps(self.pack({key: value}), protocol=4)
+
+    def _loads_item(self, value: bytes) -> dict:
+        return self.unpack(pickle.loads(value))
+
     def deserialize(self):
         try:
             with open(self.filepath, "rb") as f:
@@ -0,0 +1,180 @@
+import atexit
+import sys
+from multiprocessing import resource_tracker
+from multiprocessing.shared_memory import SharedMemory
+from typing import Iterable, List, Optional
+
+import numpy as np
+from bw_processing import Datapackage
+
+from bw2data.logs import stdout_feedback_logger
+
+
+def _attach(name: str) -> SharedMemory:
+    """Attach to an existing shared memory block without handing it to this process' resource
+    tracker, which would otherwise unlink the block when a worker exits."""
+    if sys.version_info >= (3, 13):
+        return SharedMemory(name=name, track=False)
+    shm = SharedMemory(name=name)
+    try:
+        resource_tracker.unregister(shm._name, "shared_memory")
+    except Exception:
+        pass
+    return shm
+
+
+class SharedDatapackages:
+    """Processed datapackages held in ``multiprocessing.shared_memory`` blocks.
+
+    Running Monte Carlo or ``MultiLCA`` calculations across a process pool normally means that each
+    worker loads its own copy of every datapackage. This class loads the datapackages of the given
+    databases and of all the databases they depend on *once*, in the parent process, and copies each
+    Numpy array into its own shared memory block. Instances can be pickled and passed to workers;
+    ``datapackages()`` then returns read-only ``Datapackage`` views over the shared blocks without
+    copying any array data.
+
+    The process which created the instance owns the blocks, and unlinks them on ``close()``, when
+    leaving the context manager, or at interpreter exit.
+
+    .. code-block:: python
+
+        from concurrent.futures import ProcessPoolExecutor
+
+        def worker(shared, demand, method):
+            lca = bw2calc.LCA(demand, data_objs=shared.datapackages())
+            ...
+
+        with SharedDatapackages(["ecoinvent"], methods=[method]) as shared:
+            with ProcessPoolExecutor() as executor:
+                results = list(executor.map(worker, itertools.repeat(shared), demands, ...))
+
+    Args:
+        * *databases*: Names of databases. Dependent databases are included automatically unless ``include_dependents`` is ``False``.
+        * *methods*, *weightings*, *normalizations*: Names of impact assessment objects to include.
+        * *include_dependents*: Include the complete database dependency closure.
+
+    """
+
+    def __init__(
+        self,
+        databases: Iterable[str] = (),
+        methods: Iterable[tuple] = (),
+        weightings: Iterable[tuple] = (),
+        normalizations: Iterable[tuple] = (),
+        include_dependents: bool = True,
+    ):
+        from bw2data import Database, Method, Normalization, Weighting
+        from bw2data import databases as databases_meta
+
+        self._owner = True
+        self._closed = False
+        self._blocks = {}
+        self._packages = []
+
+        queue, seen = list(databases), set()
+        while queue:
+            name = queue.pop(0)
+            if name in seen:
+                continue
+            seen.add(name)
+            # Load first; this reprocesses dirty databases and updates `depends`
+            self._add(Database(name).datapackage())
+            if include_dependents:
+                queue.extend(databases_meta[name].get("depends", []))
+        for cls, names in ((Method, methods), (Weighting, weightings), (Normalization, normalizations)):
+            for name in names:
+                self._add(cls(name).datapackage())
+
+        stdout_feedback_logger.info(
+            "Shared %s datapackages in %s memory blocks (%.1f MB)",
+            len(self._packages),
+            len(self._blocks),
+            sum(shm.size for shm in self._blocks.values()) / 1e6,
+        )
+        atexit.register(self.close)
+
+    def _add(self, dp: Datapackage) -> None:
+        entries = []
+        for index in range(len(dp.resources)):
+            data = dp.get_resource(index)[0]
+            if isinstance(data, np.ndarray):
+                array = np.ascontiguousarray(data)
+                # Zero-sized shared memory blocks are not allowed
+                shm = SharedMemory(create=True, size=max(array.nbytes, 1))
+                np.ndarray(array.shape, dtype=array.dtype, buffer=shm.buf)[...] = array
+                self._blocks[shm.name] = shm
+                entries.append(("shared", shm.name, array.dtype, array.shape))
+            else:
+                # Small non-array resources like CSV metadata are pickled with the instance
+                entries.append(("object", data))
+        self._packages.append((dp.metadata, entries))
+
+    def __getstate__(self) -> dict:
+        return {"_packages": self._packages}
+
+    def __setstate__(self, state: dict) -> None:
+        self._packages = state["_packages"]
+        self._owner = False
+        self._closed = False
+        self._blocks = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def __len__(self) -> int:
+        return len(self._packages)
+
+    def _block(self, name: str) -> SharedMemory:
+        if self._closed:
+            raise ValueError("Shared datapackages already closed")
+        if name not in self._blocks:
+            self._blocks[name] = _attach(name)
+        return self._blocks[name]
+
+    def datapackages(self) -> List[Datapackage]:
+        """Return read-only ``Datapackage`` objects whose arrays are views on the shared blocks."""
+        result = []
+        for metadata, entries in self._packages:
+            data = []
+            for entry in entries:
+                if entry[0] == "shared":
+                    _, name, dtype, shape = entry
+                    array = np.ndarray(shape, dtype=dtype, buffer=self._block(name).buf)
+                    array.flags.writeable = False
+                    data.append(array)
+                else:
+                    data.append(entry[1])
+            dp = Datapackage()
+            dp.fs = None
+            dp.metadata = metadata
+            dp.data = data
+            dp._finalized = True
+            result.append(dp)
+        return result
+
+    def close(self, unlink: Optional[bool] = None) -> None:
+        """Close the shared memory blocks in this process.
+
+        Blocks are unlinked if this process created them, unless ``unlink`` is given. Arrays from
+        ``datapackages()`` are invalid after closing."""
+        if self._closed:
+            return
+        self._closed = True
+        unlink = self._owner if unlink is None else unlink
+        for shm in self._blocks.values():
+            try:
+                shm.close()
+            except BufferError:
+                # Views still exported; the mapping is released when they are garbage collected
+                pass
+            if unlink:
+                try:
+                    shm.unlink()
+                except FileNotFoundError:
+                    pass
+        self._blocks = {}
+        if self._owner:
+            atexit.unregister(self.close)
@@ -1,6 +1,8 @@
 from blinker import signal
 from peewee import Model
 
+from bw2data.batching import current_batch
+
 try:
     from typing import override
 except ImportError:
@@ -256,9 +258,19 @@ class SignaledDataset(Model):
     @override
     def save(self, signal: bool = True, *args, **kwargs) -> None:
         """Receives a mapper to convert the data to the expected dictionary format"""
-        old = type(self).get_or_none(type(self).id == self.id)
+        session = current_batch() if signal else None
+        if not signal or kwargs.get("force_insert"):
+            # Previous version not needed, or doesn't exist
+            old = None
+        elif session is not None and session.is_save_queued(self):
+            # Merged into the already queued signal, which has the previous version
+            old = None
+        else:
+            old = type(self).get_or_none(type(self).id == self.id)
         super().save(*args, **kwargs)
-        if signal:
+        if session is not None:
+            session.queue_save_signal(self, old=old)
+        elif signal:
             signaleddataset_on_save.send(
                 self,
                 old=old,
@@ -268,6 +280,9 @@ class SignaledDataset(Model):
     @override
     def delete_instance(self, signal: bool = True, *args, **kwargs) -> None:
         if signal:
+            session = current_batch()
+            if session is not None:
+                session.send_save_signals()
             signaleddataset_on_delete.send(self, old=self)
         super().delete_instance(*args, **kwargs)
 
@@ -1,8 +1,8 @@
-import json
 import pickle
 
 from peewee import BlobField, SqliteDatabase, TextField
 
+from bw2data.json_codec import codec
 from bw2data.logs import stdout_feedback_logger
 
 
@@ -11,6 +11,8 @@ class PickleField(BlobField):
         return super(PickleField, self).db_value(pickle.dumps(value, protocol=4))
 
     def python_value(self, value):
+        if value is None:
+            return None
         return pickle.loads(bytes(value))
 
 
@@ -55,28 +57,25 @@ class SubstitutableDatabase:
         self.execute_sql("VACUUM;")
 
 
+def _isoformat(obj):
+    return obj.isoformat() if hasattr(obj, "isoformat") else obj
+
+
 class JSONField(TextField):
     """Simpler JSON field that doesn't support advanced querying and is human-readable"""
 
     def db_value(self, value):
-        return super().db_value(
-            json.dumps(
-                value,
-                ensure_ascii=False,
-                indent=2,
-                default=lambda x: x.isoformat() if hasattr(x, "isoformat") else x,
-            )
-        )
+        return super().db_value(codec.dumps(value, default=_isoformat))
 
     def python_value(self, value):
-        return json.loads(value)
+        return codec.loads(value)
 
 
 class TupleJSONField(JSONField):
     def python_value(self, value):
         if value is None:
             return None
-        data = json.loads(value)
+        data = codec.loads(value)
         if isinstance(data, list):
             data = tuple(data)
         return data
@@ -0,0 +1,67 @@
+"""Compare writing a database again with ``write`` and with ``sync`` when few nodes changed.
+
+Run with ``python dev/benchmark_database_sync.py``. Creates a temporary project with a database
+of ``ACTIVITIES`` activities with ``INPUTS`` inputs each, and writes it again with new amounts
+for ``CHANGED`` of the activities.
+
+Previously, the only option was ``write``, which deletes and inserts all nodes and edges, gives
+all nodes new ids, vacuums the SQLite database and indexes all nodes for search again.
+
+"""
+
+import copy
+import time
+
+import numpy as np
+
+from bw2data import Database, projects
+
+ACTIVITIES = 10000
+INPUTS = 20
+CHANGED = 0.01
+
+
+def generate(rng):
+    return {
+        ("db", f"a{i}"): {
+            "name": f"a{i}",
+            "unit": "kg",
+            "type": "process",
+            "location": "GLO",
+            "exchanges": [{"input": ("db", f"a{i}"), "amount": 1, "type": "production"}]
+            + [
+                {"input": ("db", f"a{j}"), "amount": 0.1, "type": "technosphere"}
+                for j in rng.choice(ACTIVITIES, INPUTS, replace=False)
+            ],
+        }
+        for i in range(ACTIVITIES)
+    }
+
+
+if __name__ == "__main__":
+    projects.set_current("database sync benchmark")
+    rng = np.random.default_rng(1)
+    data = generate(rng)
+    db = Database("db")
+    db.write(copy.deepcopy(data))
+
+    for i in rng.choice(ACTIVITIES, int(ACTIVITIES * CHANGED), replace=False):
+        data[("db", f"a{i}")]["exchanges"][1]["amount"] = 0.2
+
+    print(f"{ACTIVITIES} activities, {int(ACTIVITIES * CHANGED)} changed")
+    start = time.perf_counter()
+    db.write(copy.deepcopy(data))
+    print(f"write:             {time.perf_counter() - start:8.2f} s")
+
+    for i in rng.choice(ACTIVITIES, int(ACTIVITIES * CHANGED), replace=False):
+        data[("db", f"a{i}")]["exchanges"][1]["amount"] = 0.3
+    start = time.perf_counter()
+    counts = db.sync(copy.deepcopy(data))
+    print(f"sync:              {time.perf_counter() - start:8.2f} s")
+    print(counts)
+
+    start = time.perf_counter()
+    db.sync(copy.deepcopy(data))
+    print(f"sync, no changes:  {time.perf_counter() - start:8.2f} s")
+
+    projects.delete_project(delete_dir=True)
@@ -0,0 +1,62 @@
+"""Compare Monte Carlo evaluation of parameters with ``ParameterSet`` and with
+``bw2data.formula_compiler``.
+
+Run with ``python dev/benchmark_formula_compiler.py``. Creates a temporary project with a chain of
+project parameters, some with uncertainty distributions, and evaluates all of them for
+``ITERATIONS`` sampled input values.
+
+Previously, each iteration meant evaluating every formula with ``asteval`` via ``ParameterSet``.
+
+"""
+
+import time
+
+import numpy as np
+from bw2parameters import ParameterSet
+
+from bw2data import parameters, projects
+from bw2data.parameters import ProjectParameter
+
+ITERATIONS = 1000
+PARAMETERS = 200
+
+
+if __name__ == "__main__":
+    projects.set_current("formula compiler benchmark")
+    data = [
+        {"name": f"p{i}", "amount": 1.5, "uncertainty type": 4, "minimum": 1, "maximum": 2}
+        for i in range(PARAMETERS // 2)
+    ]
+    data.append({"name": "f0", "amount": 0})
+    data.extend(
+        {
+            "name": f"f{i}",
+            "formula": f"sqrt(p{i}) * max(p{i - 1}, 1.5) + (f{i - 1} if p{i} > 1.5 else 0)",
+        }
+        for i in range(1, PARAMETERS // 2)
+    )
+    parameters.new_project_parameters(data)
+
+    compiled = parameters.compile()
+    samples = compiled.sample(ITERATIONS, seed=1)
+
+    start = time.perf_counter()
+    stored = ProjectParameter.load()
+    for i in range(ITERATIONS):
+        dct = {name: dict(ds) for name, ds in stored.items()}
+        for (_, name), values in samples.items():
+            dct[name]["amount"] = values[i]
+        expected = ParameterSet(dct).evaluate()
+    before = time.perf_counter() - start
+
+    start = time.perf_counter()
+    result = parameters.compile().evaluate(samples)
+    after = time.perf_counter() - start
+
+    assert all(np.isclose(result[("project", k)][-1], v) for k, v in expected.items())
+
+    print(f"{PARAMETERS} parameters, {ITERATIONS} iterations")
+    print(f"ParameterSet:       {before:8.3f} s")
+    print(f"CompiledParameters: {after:8.3f} s ({before / after:.0f}x)")
+
+    projects.delete_project(delete_dir=True)
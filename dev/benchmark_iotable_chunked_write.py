@@ -0,0 +1,69 @@
+"""Compare the time and peak traced memory of writing a large IO table from an iterator of dicts
+and in chunks of arrays.
+
+Run with ``python dev/benchmark_iotable_chunked_write.py``. Creates a temporary project with an
+IO table database of ``SECTORS`` sectors with ``INPUTS`` inputs each, generated in chunks of
+``CHUNK_SECTORS`` sectors in random column order.
+
+Previously, tables which didn't fit in memory could only be written from an iterator of dicts,
+which builds the complete arrays in memory anyway.
+
+"""
+
+import time
+import tracemalloc
+
+import numpy as np
+
+from bw2data import Database, projects
+
+SECTORS = 20000
+INPUTS = 100
+CHUNK_SECTORS = 500
+
+
+def chunks(ids):
+    rng = np.random.default_rng(1)
+    for start in rng.permutation(np.arange(0, SECTORS, CHUNK_SECTORS)):
+        cols = np.repeat(ids[start : start + CHUNK_SECTORS], INPUTS)
+        yield rng.choice(ids, len(cols)), cols, rng.random(len(cols)), np.ones(len(cols), bool)
+
+
+def dicts(ids):
+    for rows, cols, values, flips in chunks(ids):
+        for row, col, value in zip(rows.tolist(), cols.tolist(), values.tolist()):
+            yield {"row": row, "col": col, "amount": value, "flip": True}
+
+
+def measure(label, function):
+    tracemalloc.start()
+    start = time.perf_counter()
+    function()
+    elapsed = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    print(f"{label:<24} {elapsed:8.2f} s {peak / 2**20:8.0f} MiB")
+
+
+if __name__ == "__main__":
+    projects.set_current("iotable chunked write benchmark")
+    db = Database("io", backend="iotable")
+    db.write(
+        {
+            ("io", f"s{i}"): {"name": f"s{i}", "unit": "EUR", "type": "process"}
+            for i in range(SECTORS)
+        }
+    )
+    ids = np.array(sorted(node.id for node in db))
+
+    print(f"{SECTORS} sectors, {SECTORS * INPUTS} edges")
+    measure(
+        "Iterator of dicts",
+        lambda: db.write_exchanges(technosphere=dicts(ids), biosphere=[], dependents=[]),
+    )
+    measure(
+        "Chunks of arrays",
+        lambda: db.write_exchange_chunks(technosphere=chunks(ids), biosphere=[], dependents=[]),
+    )
+
+    projects.delete_project(delete_dir=True)
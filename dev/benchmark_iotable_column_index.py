@@ -0,0 +1,56 @@
+"""Time reading the edges of single activities in a large IO table database.
+
+Run with ``python dev/benchmark_iotable_column_index.py``. Creates a temporary project with an IO
+table database of ``SECTORS`` sectors with ``INPUTS`` inputs each, and counts the technosphere
+edges of ``SAMPLES`` sectors.
+
+Previously, each call loaded the complete datapackage again and masked all arrays to find the
+column of one activity.
+
+"""
+
+import time
+
+import numpy as np
+
+from bw2data import Database, get_node, projects
+
+SECTORS = 10000
+INPUTS = 300
+SAMPLES = 20
+
+
+if __name__ == "__main__":
+    projects.set_current("iotable column index benchmark")
+    db = Database("io", backend="iotable")
+    db.write(
+        {
+            ("io", f"s{i}"): {"name": f"s{i}", "unit": "EUR", "type": "process"}
+            for i in range(SECTORS)
+        }
+    )
+    ids = np.array(sorted(node.id for node in db))
+    rng = np.random.default_rng(1)
+    indices = np.zeros(SECTORS * INPUTS, dtype=[("row", np.int64), ("col", np.int64)])
+    indices["row"] = rng.choice(ids, SECTORS * INPUTS)
+    indices["col"] = np.repeat(ids, INPUTS)
+    # Shuffle so that the input isn't already sorted by column
+    order = rng.permutation(len(indices))
+    db.write_exchanges(
+        technosphere={
+            "indices_array": indices[order],
+            "data_array": rng.random(len(indices))[order],
+            "flip_array": np.ones(len(indices), dtype=bool),
+        },
+        biosphere=[],
+        dependents=[],
+    )
+
+    nodes = [get_node(id=int(id_)) for id_ in rng.choice(ids, SAMPLES)]
+    print(f"{SECTORS} sectors, {SECTORS * INPUTS} edges")
+    start = time.perf_counter()
+    for node in nodes:
+        assert len(node.technosphere()) <= INPUTS
+    print(f"technosphere() per node: {(time.perf_counter() - start) / SAMPLES:8.4f} s")
+
+    projects.delete_project(delete_dir=True)
@@ -0,0 +1,71 @@
+"""Time building the edges DataFrame of a large IO table database.
+
+Run with ``python dev/benchmark_iotable_edges_dataframe.py``. Creates a temporary project with an
+IO table database of ``SECTORS`` sectors with ``INPUTS`` technosphere inputs and ``EMISSIONS``
+biosphere edges each, linked to a biosphere database of ``FLOWS`` flows.
+
+Previously, the metadata of each node was read through a node proxy, and each metadata row was
+built in Python.
+
+"""
+
+import time
+
+import numpy as np
+
+from bw2data import Database, projects
+
+SECTORS = 5000
+INPUTS = 100
+FLOWS = 20000
+EMISSIONS = 50
+
+
+if __name__ == "__main__":
+    projects.set_current("iotable edges dataframe benchmark")
+    bio = Database("bio")
+    bio.write(
+        {
+            ("bio", f"f{i}"): {
+                "name": f"flow {i}",
+                "unit": "kg",
+                "type": "emission",
+                "categories": ("air", f"compartment {i % 10}"),
+            }
+            for i in range(FLOWS)
+        }
+    )
+    db = Database("io", backend="iotable")
+    db.write(
+        {
+            ("io", f"s{i}"): {
+                "name": f"s{i}",
+                "unit": "EUR",
+                "type": "process",
+                "location": f"region {i % 50}",
+                "reference product": f"product {i}",
+            }
+            for i in range(SECTORS)
+        }
+    )
+    ids = np.array([node.id for node in db])
+    flows = np.array([node.id for node in bio])
+    rng = np.random.default_rng(1)
+
+    def vector(rows, inputs):
+        indices = np.zeros(len(rows), dtype=[("row", np.int64), ("col", np.int64)])
+        indices["row"], indices["col"] = rows, np.repeat(ids, inputs)
+        return {"indices_array": indices, "data_array": rng.random(len(rows)), "nrows": len(rows)}
+
+    db.write_exchanges(
+        technosphere=vector(rng.choice(ids, SECTORS * INPUTS), INPUTS),
+        biosphere=vector(rng.choice(flows, SECTORS * EMISSIONS), EMISSIONS),
+        dependents=["bio"],
+    )
+
+    print(f"{SECTORS} sectors, {FLOWS} flows, {SECTORS * (INPUTS + EMISSIONS)} edges")
+    start = time.perf_counter()
+    df = db.edges_to_dataframe()
+    print(f"edges_to_dataframe: {time.perf_counter() - start:8.2f} s")
+
+    projects.delete_project(delete_dir=True)
@@ -0,0 +1,55 @@
+"""Time reading the edges of one node in an IO table database.
+
+Run with ``python dev/benchmark_iotable_exchanges.py``. Creates a temporary project with an IO
+table database of ``SECTORS`` nodes, where each sector uses ``INPUTS`` other sectors.
+
+Previously, iteration retrieved the input and output node of each edge with two ``get_node``
+queries.
+
+"""
+
+import time
+
+import numpy as np
+
+from bw2data import Database, get_node, projects
+
+SECTORS = 2000
+INPUTS = 1000
+
+
+if __name__ == "__main__":
+    projects.set_current("iotable exchanges benchmark")
+    db = Database("io", backend="iotable")
+    db.write(
+        {
+            ("io", f"s{i}"): {"name": f"s{i}", "unit": "EUR", "type": "process"}
+            for i in range(SECTORS)
+        }
+    )
+    ids = [node.id for node in db]
+    rng = np.random.default_rng(1)
+    technosphere = [{"row": id_, "col": id_, "amount": 1} for id_ in ids]
+    technosphere.extend(
+        {"row": int(row), "col": id_, "amount": float(amount), "flip": True}
+        for id_ in ids[:10]
+        for row, amount in zip(rng.choice(ids, INPUTS, replace=False), rng.random(INPUTS))
+    )
+    db.write_exchanges(technosphere=technosphere, biosphere=[], dependents=[])
+    node = get_node(id=ids[0])
+
+    print(f"{SECTORS} sectors, {len(node.exchanges())} edges for one sector")
+    start = time.perf_counter()
+    edges = [(exc.input["name"], exc["amount"]) for exc in node.exchanges()]
+    print(f"Iteration:               {time.perf_counter() - start:8.3f} s")
+
+    start = time.perf_counter()
+    arrays = node.exchanges().as_arrays()
+    print(f"as_arrays():             {time.perf_counter() - start:8.3f} s")
+
+    start = time.perf_counter()
+    arrays = node.exchanges().as_arrays(fields=["name"])
+    print(f"as_arrays(['name']):     {time.perf_counter() - start:8.3f} s")
+    assert arrays["input_name"].tolist() == [name for name, _ in edges]
+
+    projects.delete_project(delete_dir=True)
@@ -0,0 +1,70 @@
+"""Compare storing and loading IO table scenarios as separate databases and in one database.
+
+Run with ``python dev/benchmark_iotable_scenarios.py``. Creates a temporary project with
+``SCENARIOS`` versions of an IO table with ``SECTORS`` sectors and ``INPUTS`` inputs each, in the
+``"directory"`` processed format.
+
+Previously, each scenario was a separate database, with its own nodes and indices arrays.
+
+"""
+
+import time
+
+import numpy as np
+
+from bw2data import Database, projects
+from bw2data.meta import preferences
+
+SECTORS = 5000
+INPUTS = 200
+SCENARIOS = 5
+
+
+def size(path):
+    return sum(obj.stat().st_size for obj in path.rglob("*") if obj.is_file()) / 2**20
+
+
+if __name__ == "__main__":
+    projects.set_current("iotable scenarios benchmark")
+    preferences["processed_format"] = "directory"
+    rng = np.random.default_rng(1)
+    rows = rng.integers(0, SECTORS, SECTORS * INPUTS)
+    cols = np.repeat(np.arange(SECTORS), INPUTS)
+    data = rng.random((len(rows), SCENARIOS))
+    nodes = {
+        f"s{i}": {"name": f"s{i}", "unit": "EUR", "type": "process"} for i in range(SECTORS)
+    }
+
+    def vector(db, values):
+        ids = np.array([node.id for node in sorted(db, key=lambda node: int(node["code"][1:]))])
+        indices = np.zeros(len(rows), dtype=[("row", np.int64), ("col", np.int64)])
+        indices["row"], indices["col"] = ids[rows], ids[cols]
+        return {"indices_array": indices, "data_array": values, "nrows": len(rows)}
+
+    separate = []
+    for scenario in range(SCENARIOS):
+        db = Database(f"io {scenario}", backend="iotable")
+        db.write({(db.name, code): node for code, node in nodes.items()})
+        db.write_exchanges(vector(db, data[:, scenario]), [], [])
+        separate.append(db)
+    combined = Database("io", backend="iotable")
+    combined.write({("io", code): node for code, node in nodes.items()})
+    combined.write_exchanges(
+        vector(combined, data), [], [], scenarios=[str(i) for i in range(SCENARIOS)]
+    )
+
+    print(f"{SCENARIOS} scenarios, {SECTORS} sectors, {len(rows)} edges")
+    print(f"Separate databases:  {sum(size(db.filepath_processed()) for db in separate):6.0f} MiB")
+    print(f"Scenario database:   {size(combined.filepath_processed()):6.0f} MiB")
+
+    start = time.perf_counter()
+    for db in separate:
+        db.datapackage().get_resource(db._matrix_name("technosphere") + ".data")[0].sum()
+    print(f"Load separate:       {time.perf_counter() - start:8.3f} s")
+    start = time.perf_counter()
+    for scenario in combined.scenarios:
+        data = combined.datapackage(scenario).get_resource("io_technosphere_matrix.data")[0]
+        data.sum()
+    print(f"Load scenarios:      {time.perf_counter() - start:8.3f} s")
+
+    projects.delete_project(delete_dir=True)
@@ -0,0 +1,59 @@
+"""Compare writing an IO table from a ``scipy.sparse`` matrix directly and through an iterator
+of dicts.
+
+Run with ``python dev/benchmark_iotable_sparse.py``. Creates a temporary project with an IO table
+database of ``SECTORS`` sectors, and a random technosphere matrix with ``DENSITY`` nonzero values
+in addition to the diagonal.
+
+Previously, sparse matrices had to be converted to dicts or structured arrays by hand.
+
+"""
+
+import time
+
+import numpy as np
+from scipy import sparse
+
+from bw2data import Database, projects
+
+SECTORS = 5000
+DENSITY = 0.04
+
+
+if __name__ == "__main__":
+    projects.set_current("iotable sparse benchmark")
+    db = Database("io", backend="iotable")
+    db.write(
+        {
+            ("io", f"s{i}"): {"name": f"s{i}", "unit": "EUR", "type": "process"}
+            for i in range(SECTORS)
+        }
+    )
+    ids = np.array(sorted(node.id for node in db))
+    matrix = (
+        sparse.eye(SECTORS) - sparse.random(SECTORS, SECTORS, density=DENSITY, random_state=1)
+    ).tocsr()
+
+    print(f"{SECTORS} sectors, {matrix.nnz} edges")
+    start = time.perf_counter()
+    coo = matrix.tocoo()
+    db.write_exchanges(
+        technosphere=(
+            {
+                "row": ids[row],
+                "col": ids[col],
+                "amount": value if row == col and value > 0 else -value,
+                "flip": not (row == col and value > 0),
+            }
+            for row, col, value in zip(coo.row.tolist(), coo.col.tolist(), coo.data.tolist())
+        ),
+        biosphere=[],
+        dependents=[],
+    )
+    print(f"Iterator of dicts:       {time.perf_counter() - start:8.2f} s")
+
+    start = time.perf_counter()
+    db.write_exchanges(technosphere=(matrix, ids, ids), biosphere=[], dependents=[])
+    print(f"Sparse matrix:           {time.perf_counter() - start:8.2f} s")
+
+    projects.delete_project(delete_dir=True)
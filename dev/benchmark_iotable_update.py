@@ -0,0 +1,60 @@
+"""Time changing a few coefficients of a large IO table database.
+
+Run with ``python dev/benchmark_iotable_update.py``. Creates a temporary project with an IO table
+database of ``SECTORS`` sectors with ``INPUTS`` inputs each, in both processed formats, and
+changes ``CHANGES`` existing coefficients, first in place or as an overlay, and then by writing
+the complete table again.
+
+Previously, the complete table had to be written again.
+
+"""
+
+import time
+
+import numpy as np
+
+from bw2data import Database, projects
+from bw2data.meta import preferences
+
+SECTORS = 10000
+INPUTS = 200
+CHANGES = 2000
+
+
+if __name__ == "__main__":
+    projects.set_current("iotable update benchmark")
+    db = Database("io", backend="iotable")
+    db.write(
+        {
+            ("io", f"s{i}"): {"name": f"s{i}", "unit": "EUR", "type": "process"}
+            for i in range(SECTORS)
+        }
+    )
+    ids = np.array(sorted(node.id for node in db))
+    rng = np.random.default_rng(1)
+    rows = rng.choice(ids, SECTORS * INPUTS)
+    cols = np.repeat(ids, INPUTS)
+    values = rng.random(len(rows))
+    changed = rng.choice(len(rows), CHANGES, replace=False)
+
+    print(f"{SECTORS} sectors, {len(rows)} edges, {CHANGES} changes")
+    for processed_format in ("zip", "directory"):
+        preferences["processed_format"] = processed_format
+        db.write_exchange_chunks(
+            technosphere=[(rows, cols, values, None)], biosphere=[], dependents=[]
+        )
+        db.datapackage()
+
+        start = time.perf_counter()
+        db.update_exchanges(technosphere=(rows[changed], cols[changed], values[changed] * 2))
+        db.datapackage()
+        print(f"{processed_format:<10} update_exchanges: {time.perf_counter() - start:8.2f} s")
+
+        start = time.perf_counter()
+        new = values.copy()
+        new[changed] *= 2
+        db.write_exchange_chunks(technosphere=[(rows, cols, new, None)], biosphere=[], dependents=[])
+        db.datapackage()
+        print(f"{processed_format:<10} write again:      {time.perf_counter() - start:8.2f} s")
+
+    projects.delete_project(delete_dir=True)
@@ -0,0 +1,134 @@
+"""Compare ``bw2data.json_codec.codec`` with the previous standard library JSON code paths.
+
+Run with ``python dev/benchmark_json_codec.py``. Needs ``orjson`` installed to show a difference.
+
+Previously:
+
+* ``JsonWrapper.dump`` and ``SerializedDict.serialize`` used ``json.dumps(..., indent=2)``
+* Revision files used ``revisions.JSONEncoder(indent=2)``, which encoded and decoded each
+  ``Delta`` one extra time
+* ``JSONField.db_value`` used ``json.dumps(..., indent=2, ensure_ascii=False)``
+
+"""
+
+import json
+import tempfile
+import timeit
+from pathlib import Path
+
+import deepdiff
+
+from bw2data.json_codec import JSONCodec, orjson
+from bw2data.revisions import Delta, JSONEncoder, json_default
+
+
+def databases_metadata(n=200):
+    return {
+        f"database {i}": {
+            "depends": ["biosphere3", f"database {i - 1}"],
+            "backend": "sqlite",
+            "geocollections": ["world", "ecoinvent"],
+            "modified": "2024-01-02T03:04:05.123456",
+            "number": 20000,
+            "version": 5,
+            "format": "Ecospold2",
+            "searchable": True,
+        }
+        for i in range(n)
+    }
+
+
+def methods_metadata(n=1000):
+    return [
+        [
+            ["ecoinvent 3.10", f"category {i}", f"indicator {i}"],
+            {
+                "unit": "kg CO2-Eq",
+                "abbreviation": f"ecoinvent-310c.{i:06x}",
+                "num_cfs": 1200,
+                "description": "Zürich " * 20,
+                "filename": "LCIA.xlsx",
+            },
+        ]
+        for i in range(n)
+    ]
+
+
+def revision(n=500):
+    deltas = []
+    for i in range(n):
+        old = {"name": f"node {i}", "amount": 1.0, "tags": {"a": [1, 2, 3]}}
+        new = {"name": f"node {i}!", "amount": 2.5, "tags": {"a": [1, 2, 3, 4]}}
+        delta = Delta.from_difference(
+            "lci_node", i, "update", deepdiff.DeepDiff(old, new, verbose_level=2)
+        )
+        deltas.append(
+            {"type": delta.type, "id": delta.id, "change_type": delta.change_type, "delta": delta}
+        )
+    return {"metadata": {"revision": 1, "parent_revision": None}, "data": deltas}
+
+
+def bench(label, before, after, number=20):
+    t_before = min(timeit.repeat(before, number=number, repeat=5)) / number
+    t_after = min(timeit.repeat(after, number=number, repeat=5)) / number
+    print(
+        f"{label:<40} {t_before * 1e3:9.3f} ms {t_after * 1e3:9.3f} ms {t_before / t_after:6.1f}x"
+    )
+
+
+if __name__ == "__main__":
+    codec = JSONCodec()
+    print(f"JSON backend: {codec.backend}" + ("" if orjson else " (install orjson for speed)"))
+    print(f"{'':<40} {'before':>12} {'after':>12} {'speedup':>7}")
+
+    dirpath = Path(tempfile.mkdtemp())
+    fp = dirpath / "test.json"
+
+    for label, data in (
+        ("databases.json (200 databases)", databases_metadata()),
+        ("methods.json (1000 methods)", methods_metadata()),
+    ):
+
+        def before():
+            with open(fp, "w") as f:
+                f.write(json.dumps(data, indent=2))
+            with open(fp, encoding="utf-8") as f:
+                json.load(f)
+
+        def after():
+            codec.dump(data, fp)
+            codec.load(fp)
+
+        bench(f"write + read {label}", before, after)
+
+    rev = revision()
+
+    def before():
+        with open(fp, "w") as f:
+            f.write(JSONEncoder(indent=2).encode(rev))
+
+    def after():
+        codec.dump(rev, fp, default=json_default)
+
+    bench("write revision (500 deltas)", before, after)
+
+    def before():
+        with open(fp, encoding="utf-8") as f:
+            json.load(f)
+
+    def after():
+        codec.load(fp)
+
+    bench("read revision (500 deltas)", before, after)
+
+    field = {"amount": 1.5, "formula": "a * b", "when": "2024-01-02", "tags": list(range(20))}
+
+    def before():
+        for _ in range(1000):
+            json.loads(json.dumps(field, ensure_ascii=False, indent=2))
+
+    def after():
+        for _ in range(1000):
+            codec.loads(codec.dumps(field))
+
+    bench("1000 JSON field round trips", before, after)
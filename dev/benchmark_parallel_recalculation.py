@@ -0,0 +1,62 @@
+"""Compare recalculating independent activity parameter groups one after the other and in
+worker processes.
+
+Run with ``python dev/benchmark_parallel_recalculation.py``. Creates a temporary project with
+``GROUPS`` activity parameter groups, each with its own activity, ``PARAMETERS`` parameters which
+only depend on project and database parameters, and ``EXCHANGES`` parameterized exchanges.
+
+"""
+
+import os
+import time
+
+from bw2data import Database, parameters, projects
+from bw2data.parameters import Group
+
+GROUPS = 300
+PARAMETERS = 30
+EXCHANGES = 10
+
+
+def expire_all():
+    Group.update(fresh=False).where(Group.name.startswith("group ")).execute()
+
+
+if __name__ == "__main__":
+    projects.set_current("parallel recalculation benchmark")
+    db = Database("db")
+    db.write(
+        {("db", f"a{i}"): {"name": f"a{i}", "unit": "kg", "type": "process"} for i in range(GROUPS)}
+    )
+    parameters.new_project_parameters([{"name": "price", "amount": 2}])
+    parameters.new_database_parameters([{"name": "efficiency", "amount": 0.8}], "db")
+    for i in range(GROUPS):
+        group = f"group {i}"
+        data = [
+            {
+                "name": f"p{j}",
+                "database": "db",
+                "code": f"a{i}",
+                "formula": f"sqrt(price * {j + 1}) / efficiency + max(price, {j}) ** 0.5",
+            }
+            for j in range(PARAMETERS)
+        ]
+        parameters.new_activity_parameters(data, group)
+        node = db.get(f"a{i}")
+        for j in range(EXCHANGES):
+            node.new_exchange(
+                input=("db", f"a{(i + j + 1) % GROUPS}"),
+                amount=0,
+                type="technosphere",
+                formula=f"p{j} * p{j + 1} + {j}",
+            ).save()
+        parameters.add_exchanges_to_group(group, node)
+
+    print(f"{GROUPS} groups, {PARAMETERS} parameters and {EXCHANGES} exchanges each")
+    for label, processes in (("One after the other", 1), (f"{os.cpu_count()} processes", None)):
+        expire_all()
+        start = time.perf_counter()
+        parameters.recalculate(processes=processes)
+        print(f"{label:<24} {time.perf_counter() - start:8.2f} s")
+
+    projects.delete_project(delete_dir=True)
@@ -0,0 +1,57 @@
+"""Time dependency checks and renames of parameters which are used in many activity parameter
+groups.
+
+Run with ``python dev/benchmark_parameter_rename.py``. Creates a temporary project with ``GROUPS``
+activity parameter groups with ``PARAMETERS`` parameters each. All groups depend on project
+parameters, but only every tenth group uses the renamed parameter.
+
+Previously, each check parsed the formulas of all groups depending on the project parameters,
+renaming parsed all formulas of a group again for each of its parameters (and failed with
+``MissingName`` once more than 50 parameters were changed), and all groups depending on the
+project parameters were recalculated after the rename.
+
+"""
+
+import time
+
+from bw2data import Database, parameters, projects
+from bw2data.parameters import ProjectParameter
+
+GROUPS = 200
+PARAMETERS = 20
+
+
+if __name__ == "__main__":
+    projects.set_current("parameter rename benchmark")
+    db = Database("db")
+    db.write(
+        {("db", f"a{i}"): {"name": f"a{i}", "unit": "kg", "type": "process"} for i in range(GROUPS)}
+    )
+    parameters.new_project_parameters(
+        [{"name": "price", "amount": 2}, {"name": "rate", "amount": 3}]
+    )
+    for i in range(GROUPS):
+        used = "price" if i % 10 == 0 else "rate"
+        data = [
+            {
+                "name": f"p{j}",
+                "database": "db",
+                "code": f"a{i}",
+                "formula": f"{used} * {j + 1} + sqrt(rate)",
+            }
+            for j in range(PARAMETERS)
+        ]
+        parameters.new_activity_parameters(data, f"group {i}")
+
+    print(f"{GROUPS} groups with {PARAMETERS} parameters each")
+    start = time.perf_counter()
+    assert not ProjectParameter.get(name="price").is_deletable()
+    print(f"is_deletable:     {time.perf_counter() - start:8.2f} s")
+
+    start = time.perf_counter()
+    parameters.rename_project_parameter(
+        ProjectParameter.get(name="price"), "cost", update_dependencies=True
+    )
+    print(f"Rename:           {time.perf_counter() - start:8.2f} s")
+
+    projects.delete_project(delete_dir=True)
@@ -0,0 +1,76 @@
+"""Time extracting databases to the Wurst internal format.
+
+Run with ``python dev/benchmark_wurst_extraction.py``. Creates a temporary project with a
+biosphere database of ``FLOWS`` flows, and a database of ``ACTIVITIES`` activities with
+``INPUTS`` technosphere inputs and ``EMISSIONS`` biosphere flows each, and extracts the activity
+database.
+
+Previously, all activities and exchanges were decoded one after the other in one process, and the
+metadata of each input from the biosphere database was read with its own query.
+
+"""
+
+import os
+import time
+
+import numpy as np
+
+from bw2data import Database, extract_brightway_databases, projects
+
+ACTIVITIES = 5000
+FLOWS = 2000
+INPUTS = 20
+EMISSIONS = 10
+
+
+if __name__ == "__main__":
+    projects.set_current("wurst extraction benchmark")
+    rng = np.random.default_rng(1)
+    Database("bio").write(
+        {
+            ("bio", f"f{i}"): {
+                "name": f"f{i}",
+                "unit": "kg",
+                "type": "emission",
+                "categories": ("air",),
+            }
+            for i in range(FLOWS)
+        }
+    )
+    Database("db").write(
+        {
+            ("db", f"a{i}"): {
+                "name": f"a{i}",
+                "unit": "kg",
+                "type": "process",
+                "location": "GLO",
+                "reference product": f"p{i}",
+                "exchanges": [
+                    {"input": ("db", f"a{i}"), "amount": 1, "type": "production"}
+                ]
+                + [
+                    {"input": ("db", f"a{j}"), "amount": 0.1, "type": "technosphere"}
+                    for j in rng.choice(ACTIVITIES, INPUTS, replace=False)
+                ]
+                + [
+                    {"input": ("bio", f"f{j}"), "amount": 0.01, "type": "biosphere"}
+                    for j in rng.choice(FLOWS, EMISSIONS, replace=False)
+                ],
+            }
+            for i in range(ACTIVITIES)
+        },
+        process=False,
+    )
+
+    print(f"{ACTIVITIES} activities, {ACTIVITIES * (INPUTS + EMISSIONS + 1)} exchanges")
+    for label, processes in (("One process", 1), (f"{os.cpu_count()} processes", None)):
+        start = time.perf_counter()
+        extract_brightway_databases("db", processes=processes)
+        print(f"{label:<16} {time.perf_counter() - start:8.2f} s")
+
+    start = time.perf_counter()
+    for ds in extract_brightway_databases("db", as_generator=True):
+        pass
+    print(f"{'Generator':<16} {time.perf_counter() - start:8.2f} s")
+
+    projects.delete_project(delete_dir=True)
@@ -0,0 +1,103 @@
+"""Time writing scenario databases from Wurst internal format documents.
+
+Run with ``python dev/benchmark_wurst_write.py``. Creates a temporary project with a biosphere
+database of ``FLOWS`` flows, and a database of ``ACTIVITIES`` activities with ``INPUTS``
+technosphere inputs and ``EMISSIONS`` biosphere flows each, extracts it, and writes the documents
+back as ``SCENARIOS`` scenario databases.
+
+Previously, documents had to be converted to the ``Database.write`` format, and each write
+checked the data for typos, rebuilt the table indices, vacuumed the SQLite database and indexed
+the nodes for search.
+
+"""
+
+import time
+
+import numpy as np
+
+from bw2data import (
+    Database,
+    databases,
+    extract_brightway_databases,
+    projects,
+    write_wurst_documents,
+)
+
+ACTIVITIES = 5000
+FLOWS = 2000
+INPUTS = 20
+EMISSIONS = 10
+SCENARIOS = 3
+
+
+def as_database_write_data(documents, name):
+    """Convert documents extracted with ``add_identifiers`` to the ``Database.write`` format"""
+    data = {}
+    for ds in documents:
+        exchanges = []
+        for exc in ds["exchanges"]:
+            edge = {k: v for k, v in exc.items() if k not in ("id", "code", "database")}
+            if "input" not in edge:
+                edge["input"] = (name, exc["code"])
+            exchanges.append(edge)
+        data[(name, ds["code"])] = {
+            k: v for k, v in ds.items() if k not in ("id", "parameters", "parameters full")
+        }
+        data[(name, ds["code"])]["exchanges"] = exchanges
+    return data
+
+
+if __name__ == "__main__":
+    projects.set_current("wurst write benchmark")
+    rng = np.random.default_rng(1)
+    Database("bio").write(
+        {
+            ("bio", f"f{i}"): {"name": f"f{i}", "unit": "kg", "type": "emission"}
+            for i in range(FLOWS)
+        }
+    )
+    Database("db").write(
+        {
+            ("db", f"a{i}"): {
+                "name": f"a{i}",
+                "unit": "kg",
+                "type": "process",
+                "location": "GLO",
+                "reference product": f"p{i}",
+                "exchanges": [{"input": ("db", f"a{i}"), "amount": 1, "type": "production"}]
+                + [
+                    {"input": ("db", f"a{j}"), "amount": 0.1, "type": "technosphere"}
+                    for j in rng.choice(ACTIVITIES, INPUTS, replace=False)
+                ]
+                + [
+                    {"input": ("bio", f"f{j}"), "amount": 0.01, "type": "biosphere"}
+                    for j in rng.choice(FLOWS, EMISSIONS, replace=False)
+                ],
+            }
+            for i in range(ACTIVITIES)
+        },
+        process=False,
+    )
+    documents = extract_brightway_databases("db", add_identifiers=True)
+
+    print(f"{SCENARIOS} scenarios of {ACTIVITIES} activities")
+    start = time.perf_counter()
+    for i in range(SCENARIOS):
+        name = f"write {i}"
+        Database(name).write(as_database_write_data(documents, name))
+    print(f"Database.write:                   {time.perf_counter() - start:8.2f} s")
+
+    start = time.perf_counter()
+    for i in range(SCENARIOS):
+        write_wurst_documents(f"scenario {i}", documents)
+    print(f"write_wurst_documents:            {time.perf_counter() - start:8.2f} s")
+
+    start = time.perf_counter()
+    for i in range(SCENARIOS):
+        write_wurst_documents(f"deferred {i}", documents, process=False, searchable=False)
+    print(f"  without processing and search:  {time.perf_counter() - start:8.2f} s")
+    start = time.perf_counter()
+    databases.clean()
+    print(f"  databases.clean():              {time.perf_counter() - start:8.2f} s")
+
+    projects.delete_project(delete_dir=True)
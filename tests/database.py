@@ -14,6 +14,7 @@ from bw2data import (
     get_activity,
     get_id,
     get_node,
+    preferences,
     projects,
 )
 from bw2data.backends import Activity as PWActivity
@@ -590,6 +591,70 @@ def test_processed_array():
     assert array[0]["uncertainty_type"] == 7
 
 
+@bw2test
+def test_processed_array_directory_format():
+    preferences["processed_format"] = "directory"
+    database = Database("a database")
+    database.write(
+        {
+            ("a database", "2"): {
+                "type": "process",
+                "exchanges": [
+                    {
+                        "input": ("a database", "2"),
+                        "amount": 42,
+                        "type": "production",
+                    }
+                ],
+            }
+        }
+    )
+    assert database.filepath_processed().is_dir()
+    assert not (database.dirpath_processed() / database.filename_processed("zip")).exists()
+
+    package = database.datapackage()
+    array = package.get_resource("a_database_technosphere_matrix.data")[0]
+    assert isinstance(array, np.memmap)
+    assert not array.flags.writeable
+    assert array[0] == 42
+
+
+@bw2test
+def test_processed_format_change_reads_existing_then_reprocesses():
+    database = Database("a database")
+    database.write(
+        {
+            ("a database", "2"): {
+                "type": "process",
+                "exchanges": [
+                    {
+                        "input": ("a database", "2"),
+                        "amount": 42,
+                        "type": "production",
+                    }
+                ],
+            }
+        }
+    )
+    zip_fp = database.filepath_processed()
+    assert zip_fp.is_file()
+
+    preferences["processed_format"] = "directory"
+    assert database.filepath_processed() == zip_fp
+    assert database.datapackage().get_resource("a_database_technosphere_matrix.data")[0][0] == 42
+
+    database.process()
+    assert database.filepath_processed().is_dir()
+    assert not zip_fp.exists()
+
+
+@bw2test
+def test_processed_format_invalid():
+    preferences["processed_format"] = "tarball"
+    with pytest.raises(ValueError):
+        Database("a database").filename_processed()
+
+
 @bw2test
 def test_process_writes_database_dependencies_to_datapackage():
     Database("other database").write(
@@ -1535,3 +1600,152 @@ def test_iotable_sourced_project():
     projects.dataset.set_sourced()
     with pytest.raises(ValueError):
         Database("foo", backend="iotable")
+
+
+### Sync
+
+
+def sync_fixture():
+    Database("biosphere").write(copy.deepcopy(biosphere))
+    db = Database("food")
+    db.write(copy.deepcopy(food_data))
+    return db
+
+
+def edge_ids(db):
+    return {
+        (exc["output"][1], exc["input"][1]): exc._document.id
+        for node in db
+        for exc in node.exchanges()
+    }
+
+
+@bw2test
+def test_sync_unchanged():
+    db = sync_fixture()
+    ids, edges = {node["code"]: node.id for node in db}, edge_ids(db)
+    processed = databases["food"]["processed"]
+
+    counts = db.sync(copy.deepcopy(food_data))
+    assert counts == {
+        "nodes": {"inserted": 0, "updated": 0, "deleted": 0, "unchanged": 2},
+        "edges": {"inserted": 0, "updated": 0, "deleted": 0, "unchanged": 4},
+    }
+    assert {node["code"]: node.id for node in db} == ids
+    assert edge_ids(db) == edges
+    assert databases["food"]["processed"] == processed
+
+
+@bw2test
+def test_sync_unchanged_key_order():
+    db = sync_fixture()
+    data = {
+        key: dict(reversed(list(copy.deepcopy(ds).items())))
+        for key, ds in reversed(list(food_data.items()))
+    }
+    counts = db.sync(data)
+    assert counts["nodes"]["unchanged"] == 2
+    assert counts["edges"]["unchanged"] == 4
+
+
+@bw2test
+def test_sync_changes():
+    db = sync_fixture()
+    ids, edges = {node["code"]: node.id for node in db}, edge_ids(db)
+
+    data = copy.deepcopy(food_data)
+    del data[("food", "2")]
+    data[("food", "1")]["name"] = "brunch"
+    data[("food", "1")]["exchanges"][0]["input"] = ("food", "3")
+    data[("food", "1")]["exchanges"][1]["amount"] = 0.1
+    data[("food", "3")] = {
+        "name": "breakfast",
+        "location": "CH",
+        "unit": "kg",
+        "exchanges": [{"input": ("biosphere", "2"), "amount": 0.2, "type": "biosphere"}],
+    }
+    counts = db.sync(data)
+    assert counts == {
+        "nodes": {"inserted": 1, "updated": 1, "deleted": 1, "unchanged": 0},
+        "edges": {"inserted": 1, "updated": 2, "deleted": 2, "unchanged": 0},
+    }
+
+    assert len(db) == 2
+    assert databases["food"]["number"] == 2
+    assert db.get("1").id == ids["1"]
+    assert db.get("1")["name"] == "brunch"
+    with pytest.raises(UnknownObject):
+        get_id(("food", "2"))
+    assert edge_ids(db)[("1", "3")] == edges[("1", "2")]
+    assert edge_ids(db)[("1", "1")] == edges[("1", "1")]
+    assert {exc["amount"] for exc in db.get("1").biosphere()} == {0.1}
+    assert [node["name"] for node in db.search("brunch")] == ["brunch"]
+    assert [node["name"] for node in db.search("breakfast")] == ["breakfast"]
+    assert not db.search("dinner")
+
+    expected = copy.deepcopy(data)
+    Database("written").write(
+        {
+            ("written", code): dict(
+                ds,
+                exchanges=[
+                    {
+                        "input": (
+                            ("written", exc["input"][1])
+                            if exc["input"][0] == "food"
+                            else exc["input"]
+                        ),
+                        "amount": exc["amount"],
+                        "type": exc["type"],
+                    }
+                    for exc in ds["exchanges"]
+                ],
+            )
+            for (_, code), ds in expected.items()
+        }
+    )
+    assert (
+        db.datapackage().get_resource("food_technosphere_matrix.data")[0].tolist()
+        == Database("written")
+        .datapackage()
+        .get_resource("written_technosphere_matrix.data")[0]
+        .tolist()
+    )
+
+
+@bw2test
+def test_sync_new_database():
+    Database("biosphere").write(copy.deepcopy(biosphere))
+    db = Database("food")
+    counts = db.sync(copy.deepcopy(food_data))
+    assert counts["nodes"]["inserted"] == 2
+    assert counts["edges"]["inserted"] == 4
+    assert databases["food"]["number"] == 2
+    assert databases["food"]["depends"] == ["biosphere"]
+    assert len(db.search("lunch")) == 1
+
+
+@bw2test
+def test_sync_deferred_processing():
+    db = sync_fixture()
+    data = copy.deepcopy(food_data)
+    data[("food", "1")]["exchanges"][1]["amount"] = 0.1
+    db.sync(data, process=False)
+    assert databases["food"]["dirty"]
+
+
+@bw2test
+def test_sync_errors():
+    db = sync_fixture()
+    with pytest.raises(DuplicateNode):
+        db.sync(
+            [dict(ds, database=db_name, code=code) for (db_name, code), ds in food_data.items()]
+            * 2
+        )
+    data = copy.deepcopy(food_data)
+    del data[("food", "1")]["exchanges"][0]["type"]
+    with pytest.raises(UntypedExchange):
+        db.sync(data)
+    with pytest.raises(WrongDatabase):
+        db.sync({("other", "1"): {}})
+    assert len(db) == 2
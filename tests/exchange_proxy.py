@@ -1,6 +1,8 @@
 from bw2data import Method, databases, geomapping, get_activity, get_node, methods, projects
+from bw2data.backends.proxies import Exchanges
 from bw2data.configuration import labels
 from bw2data.database import DatabaseChooser
+from bw2data.errors import UnknownObject
 from bw2data.parameters import ActivityParameter, ParameterizedExchange, parameters
 from bw2data.tests import bw2test
 
@@ -223,6 +225,37 @@ def test_exchanges_to_dataframe(activity):
     )
 
 
+def test_exchanges_prefetch(activity):
+    exchanges = list(Exchanges(activity.key, prefetch=("input", "output")))
+    assert len(exchanges) == 3
+    for exc in exchanges:
+        assert "_input" in exc.__dict__ and "_output" in exc.__dict__
+        assert exc.input == get_activity(exc["input"])
+        assert exc.output == activity
+    assert sorted(exc.input["name"] for exc in exchanges) == ["a", "b", "c"]
+
+
+def test_exchanges_prefetch_only_input(activity):
+    for exc in Exchanges(activity.key, prefetch=("input",)):
+        assert "_input" in exc.__dict__
+        assert "_output" not in exc.__dict__
+
+
+def test_exchanges_prefetch_invalid(activity):
+    with pytest.raises(ValueError):
+        Exchanges(activity.key, prefetch=("foo",))
+
+
+def test_exchanges_prefetch_missing_node(activity):
+    exc = activity.new_edge(input=("db", "missing"), amount=1, type="technosphere")
+    exc.save()
+    exchanges = list(Exchanges(activity.key, prefetch=("input",)))
+    assert len(exchanges) == 4
+    assert sum("_input" in exc.__dict__ for exc in exchanges) == 3
+    with pytest.raises(UnknownObject):
+        activity.exchanges().to_dataframe()
+
+
 @bw2test
 def test_uncertainty():
     database = DatabaseChooser("db")
@@ -934,16 +967,16 @@ def test_temporal_distribution_restoration_logging_missing_library():
     )
     exc.save()
 
+    saved_exc = list(a.exchanges())[0]
+
     # Capture log messages
     with pytest.warns(UserWarning) as warning_list:
-        # Get the saved exchange from database (this should trigger the warning)
-        saved_exc = list(a.exchanges())[0]
-
-    # Verify that temporal_distribution remains as JSON
-    assert saved_exc["temporal_distribution"] == {
-        "type": "temporal_distribution",
-        "data": {"year": 2020, "value": 0.5},
-    }
+        # Accessing the temporal distribution should trigger the warning
+        # Verify that temporal_distribution remains as JSON
+        assert saved_exc["temporal_distribution"] == {
+            "type": "temporal_distribution",
+            "data": {"year": 2020, "value": 0.5},
+        }
 
 
 @bw2test
@@ -981,16 +1014,16 @@ def test_temporal_distribution_restoration_logging_conversion_failure():
         )
         exc.save()
 
+        saved_exc = list(a.exchanges())[0]
+
         # Capture log messages
         with pytest.warns(UserWarning) as warning_list:
-            # Get the saved exchange from database (this should trigger the warning)
-            saved_exc = list(a.exchanges())[0]
-
-        # Verify that temporal_distribution remains as JSON due to conversion failure
-        assert saved_exc["temporal_distribution"] == {
-            "type": "temporal_distribution",
-            "data": {"year": 2020, "value": 0.5},
-        }
+            # Accessing the temporal distribution should trigger the warning
+            # Verify that temporal_distribution remains as JSON due to conversion failure
+            assert saved_exc["temporal_distribution"] == {
+                "type": "temporal_distribution",
+                "data": {"year": 2020, "value": 0.5},
+            }
 
     finally:
         # Restore original import
@@ -1130,3 +1163,82 @@ def test_typo_exchange_type_multiple_corrections():
     )
     with pytest.warns(UserWarning, match=expected):
         exc.save()
+
+
+@bw2test
+def test_temporal_distribution_restoration_is_lazy():
+    """Test that temporal_distribution JSON is only converted when the key is accessed"""
+    import bw2data.backends.proxies as proxies_module
+
+    # Temporarily replace the TemporalDistribution import
+    original_temporal_distribution = proxies_module.TemporalDistribution
+    proxies_module.TemporalDistribution = MockTemporalDistribution
+
+    try:
+        db = DatabaseChooser("example")
+        db.register()
+
+        a = db.new_activity(code="A", name="An activity")
+        a.save()
+        b = db.new_activity(code="B", name="Another activity")
+        b.save()
+
+        exc = a.new_exchange(
+            amount=1.0,
+            input=b,
+            type="technosphere",
+            temporal_distribution=MockTemporalDistribution({"year": 2020, "value": 0.5}),
+        )
+        exc.save()
+
+        saved_exc = list(a.exchanges())[0]
+        # Loading doesn't copy the document data or convert the JSON
+        assert saved_exc._data is saved_exc._document.data
+        assert isinstance(saved_exc._data["temporal_distribution"], dict)
+
+        assert isinstance(saved_exc["temporal_distribution"], MockTemporalDistribution)
+        # The document data is left unchanged by the conversion
+        assert saved_exc._document.data["temporal_distribution"] == {
+            "type": "temporal_distribution",
+            "data": {"year": 2020, "value": 0.5},
+        }
+        assert isinstance(saved_exc.as_dict()["temporal_distribution"], MockTemporalDistribution)
+
+        # Values set after loading are not converted
+        saved_exc = list(a.exchanges())[0]
+        saved_exc["temporal_distribution"] = {"type": "temporal_distribution", "data": 1}
+        assert saved_exc["temporal_distribution"] == {"type": "temporal_distribution", "data": 1}
+
+    finally:
+        # Restore original import
+        proxies_module.TemporalDistribution = original_temporal_distribution
+
+
+@bw2test
+def test_exchange_without_temporal_distribution_not_copied():
+    """Test that exchanges without temporal_distribution share the document data"""
+    import bw2data.backends.proxies as proxies_module
+
+    # Temporarily replace the TemporalDistribution import
+    original_temporal_distribution = proxies_module.TemporalDistribution
+    proxies_module.TemporalDistribution = MockTemporalDistribution
+
+    try:
+        db = DatabaseChooser("example")
+        db.register()
+
+        a = db.new_activity(code="A", name="An activity")
+        a.save()
+        b = db.new_activity(code="B", name="Another activity")
+        b.save()
+        exc = a.new_exchange(amount=1.0, input=b, type="technosphere")
+        assert exc._process_temporal_distributions(exc._data) is exc._data
+        exc.save()
+
+        saved_exc = list(a.exchanges())[0]
+        assert saved_exc._data is saved_exc._document.data
+        assert saved_exc.as_dict() is saved_exc._document.data
+
+    finally:
+        # Restore original import
+        proxies_module.TemporalDistribution = original_temporal_distribution
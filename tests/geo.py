@@ -83,3 +83,70 @@ def test_database_write_adds_to_geomapping(add_biosphere):
     d.write(food, process=False)
     assert "CA" in geomapping
     assert "CH" in geomapping
+
+
+@bw2test
+def test_geomapping_ids_not_reused():
+    geomapping.add(["a", "b"])
+    first = geomapping["b"]
+    geomapping.delete(["b"])
+    assert "b" not in geomapping
+    geomapping.add(["b", "c"])
+    assert geomapping["b"] > first
+    assert geomapping["c"] > first
+
+
+@bw2test
+def test_geomapping_tuple_locations_processed():
+    database = Database("regional")
+    database.write(
+        {
+            ("regional", "1"): {"name": "a", "location": ("ecoinvent", "RER w/o CH")},
+            ("regional", "2"): {"name": "b", "location": "Europe (without Switzerland)"},
+            ("regional", "3"): {"name": "c", "location": "__import__('os')"},
+        }
+    )
+    assert ("ecoinvent", "RER w/o CH") in geomapping
+
+    package = load_datapackage(ZipFileSystem(database.filepath_processed()))
+    data = package.get_resource("regional_inventory_geomapping_matrix.indices")[0]
+    assert data["row"].tolist() == sorted(get_id(("regional", x)) for x in "123")
+    assert dict(zip(data["row"].tolist(), data["col"].tolist())) == {
+        get_id(("regional", "1")): geomapping[("ecoinvent", "RER w/o CH")],
+        get_id(("regional", "2")): geomapping["Europe (without Switzerland)"],
+        get_id(("regional", "3")): geomapping["__import__('os')"],
+    }
+
+
+@bw2test
+def test_geomapping_imported_from_pickle():
+    import pickle
+
+    from bw2data.backends.schema import GeoMappingDataset
+
+    with open(projects.dir / "geomapping.pickle", "wb") as f:
+        pickle.dump({"GLO": 1, ("a", "b"): 7}, f)
+    GeoMappingDataset.delete().execute()
+    geomapping.__init__()
+
+    assert geomapping[("a", "b")] == 7
+    geomapping.add(["new"])
+    assert geomapping["new"] == 8
+
+
+@bw2test
+def test_geomapping_pickled_dict_compatibility():
+    import pickle
+
+    geomapping.add(["a"])
+    geomapping.flush()
+    assert geomapping.filepath == projects.dir / "geomapping.pickle"
+    assert geomapping.random() in geomapping
+    assert geomapping.list == ["GLO", "a"]
+
+    geomapping.serialize()
+    with open(geomapping.filepath, "rb") as f:
+        assert pickle.load(f) == dict(geomapping)
+    geomapping.backup()
+    backups = (projects.dir / "backups").iterdir()
+    assert any(fp.name.startswith("geomapping.pickle.") for fp in backups)
@@ -13,7 +13,7 @@ from bw2data.database import DatabaseChooser
 from bw2data.errors import UnknownObject
 from bw2data.ia_data_store import ImpactAssessmentDataStore as IADS
 from bw2data.ia_data_store import abbreviate
-from bw2data.meta import databases, geomapping, methods, normalizations, weightings
+from bw2data.meta import databases, geomapping, methods, normalizations, preferences, weightings
 from bw2data.method import Method
 from bw2data.serialization import CompoundJSONDict
 from bw2data.tests import bw2test
@@ -133,6 +133,20 @@ def test_method_processed_array(reset):
     assert np.allclose(indices["col"], geomapping[config.global_location])
 
 
+def test_method_processed_array_directory_format(reset):
+    preferences["processed_format"] = "directory"
+    database = DatabaseChooser("foo")
+    database.write({("foo", "bar"): {}})
+
+    method = Method(("a", "method"))
+    method.write([[("foo", "bar"), 42]])
+    assert method.filepath_processed().is_dir()
+    package = method.datapackage()
+    data = package.get_resource("a_method_matrix_data.data")[0]
+    assert isinstance(data, np.memmap)
+    assert np.allclose(data, [42])
+
+
 def test_method_processed_array_add_identifier(reset):
     database = DatabaseChooser("foo")
     database.write({("foo", "bar"): {}})
@@ -3,11 +3,14 @@ import pandas as pd
 import pytest
 from bw2calc import LCA
 from pandas.testing import assert_frame_equal
+from scipy import sparse
 
 from bw2data import Database, Method, databases, get_activity, get_id, get_node, methods, projects
 from bw2data.backends import Activity
 from bw2data.backends.iotable.proxies import IOTableActivity, IOTableExchanges, ReadOnlyExchange
+from bw2data.data_store import load_processed_datapackage
 from bw2data.errors import InvalidDatapackage
+from bw2data.meta import preferences
 from bw2data.tests import bw2test
 
 
@@ -258,6 +261,20 @@ def test_iotable_edges_to_dataframe(iotable_fixture):
     )
 
 
+def test_iotable_edges_to_dataframe_chunks(iotable_fixture):
+    df = Database("cat").edges_to_dataframe()
+    chunks = list(Database("cat").edges_to_dataframe(chunk_size=4))
+    assert [len(chunk) for chunk in chunks] == [4, 4, 1]
+    assert_frame_equal(pd.concat(chunks, ignore_index=True), df)
+
+
+def test_iotable_edges_to_dataframe_undeclared_dependency(iotable_fixture):
+    df = Database("cat").edges_to_dataframe()
+    databases["cat"]["depends"] = []
+    databases.flush()
+    assert_frame_equal(Database("cat").edges_to_dataframe(), df)
+
+
 def test_iotable_nodes_to_dataframe(iotable_fixture):
     df = Database("cat").nodes_to_dataframe()
     expected = pd.DataFrame(
@@ -489,3 +506,335 @@ def test_iotable_readonlyexchange_iterator(iotable_fixture):
     db.write_exchanges(technosphere=[], biosphere=[], dependents=[])
     act = get_activity(("nobio", "a"))
     list(act.exchanges())
+
+
+def test_iotable_exchanges_as_arrays(iotable_fixture):
+    exchanges = IOTableExchanges(datapackage=Database("cat").datapackage())
+    arrays = exchanges.as_arrays()
+    assert len(arrays["row"]) == len(exchanges) == 9
+    assert arrays["type"].tolist() == [0] * 3 + [1] * 4 + [2] * 2
+    assert [
+        (exc.input.id, exc.output.id, exc["amount"], exc["type"]) for exc in exchanges
+    ] == list(
+        zip(
+            arrays["row"].tolist(),
+            arrays["col"].tolist(),
+            arrays["amount"].tolist(),
+            [exchanges.edge_types[code] for code in arrays["type"]],
+        )
+    )
+
+    arrays = get_node(code="a").biosphere().as_arrays()
+    assert all(len(array) == 0 for array in arrays.values())
+
+
+def test_iotable_exchanges_as_arrays_fields(iotable_fixture):
+    arrays = get_node(code="b").exchanges().as_arrays(fields=["name", "unit"])
+    assert arrays["input_name"].tolist() == ["b", "c", "squeak"]
+    assert arrays["input_unit"].tolist() == ["purr", "meow", None]
+    assert arrays["output_name"].tolist() == ["b"] * 3
+
+
+def test_iotable_exchanges_retrieve_nodes_in_bulk(iotable_fixture, monkeypatch):
+    node = get_node(code="b")
+
+    def get_node_(**kwargs):
+        raise AssertionError("Nodes should be retrieved in bulk")
+
+    monkeypatch.setattr("bw2data.backends.iotable.proxies.get_node", get_node_)
+    exchanges = list(node.exchanges())
+    assert [exc.input["name"] for exc in exchanges] == ["b", "c", "squeak"]
+    assert all(exc.output == node for exc in exchanges)
+
+
+def test_iotable_column_index(iotable_fixture):
+    dp = Database("cat").datapackage()
+    assert len([obj for obj in dp.resources if obj.get("kind") == "column_index"]) == 2
+    for resource in dp.resources:
+        if resource.get("kind") == "indices" and resource["matrix"] != "inv_geomapping_matrix":
+            cols = dp.get_resource(resource["name"])[0]["col"]
+            assert (np.diff(cols) >= 0).all()
+
+    def edges(dp, target):
+        return [
+            (exc.input.id, exc["amount"], exc["type"])
+            for exc in IOTableExchanges(datapackage=dp, target=target)
+        ]
+
+    for code in "abc":
+        node = get_node(code=code)
+        without_index = Database("cat").datapackage()
+        keep = [
+            index
+            for index, resource in enumerate(without_index.resources)
+            if resource.get("kind") != "column_index"
+        ]
+        without_index.resources = [without_index.resources[index] for index in keep]
+        without_index.data = [without_index.data[index] for index in keep]
+        assert edges(Database("cat").datapackage(), node) == edges(without_index, node)
+    assert edges(Database("cat").datapackage(), get_node(code="d")) == []
+
+
+def test_iotable_datapackage_cached(iotable_fixture):
+    db = Database("cat")
+    first, second = db.datapackage(), db.datapackage()
+    assert first is not second
+    assert first.data[0] is second.data[0]
+    IOTableExchanges(datapackage=first, target=get_node(code="a"))
+    IOTableExchanges(datapackage=second, target=get_node(code="b"))
+
+    db.write_exchanges(
+        technosphere=[{"row": get_node(code="a").id, "col": get_node(code="a").id, "amount": 5}],
+        biosphere=[],
+        dependents=[],
+    )
+    assert [exc["amount"] for exc in get_node(code="a").exchanges()] == [5]
+
+
+def chunked_edges(codes, chunk_size):
+    data = [
+        (get_node(code=row).id, get_node(code=col).id, amount, flip)
+        for row, col, amount, flip in codes
+    ]
+    for start in range(0, len(data), chunk_size):
+        rows, cols, amounts, flips = zip(*data[start : start + chunk_size])
+        yield np.array(rows), np.array(cols), np.array(amounts), np.array(flips)
+
+
+def edges(code):
+    return [
+        (exc.input["code"], round(exc["amount"], 5), exc["type"])
+        for exc in get_node(code=code).exchanges()
+    ]
+
+
+@pytest.mark.parametrize("chunk_size,ordered", [(2, True), (2, False), (100, False)])
+def test_iotable_write_exchange_chunks(iotable_fixture, monkeypatch, chunk_size, ordered):
+    tech_exchanges = [
+        ("a", "a", 2, False),
+        ("b", "a", -1, False),
+        ("c", "a", 4, False),
+        ("b", "b", -1, True),
+        ("c", "b", 0.2, True),
+        ("a", "c", 3, True),
+        ("c", "c", 1, True),
+    ]
+    if not ordered:
+        tech_exchanges.reverse()
+    monkeypatch.setattr("bw2data.backends.iotable.backend.CHUNK_QUEUE_SIZE", 1)
+    db = Database("cat")
+    expected = {code: sorted(edges(code)) for code in "abc"}
+    lca = LCA({("cat", "a"): 1}, ("a method",))
+    lca.lci()
+    lca.lcia()
+    score = lca.score
+
+    db.write_exchange_chunks(
+        technosphere=chunked_edges(tech_exchanges, chunk_size),
+        biosphere=chunked_edges([("d", "b", -1, True), ("d", "c", 2, False)], chunk_size),
+        dependents=["mouse"],
+    )
+    assert {code: sorted(edges(code)) for code in "abc"} == expected
+    lca = LCA({("cat", "a"): 1}, ("a method",))
+    lca.lci()
+    lca.lcia()
+    assert np.allclose(lca.score, score)
+
+    dp = db.datapackage()
+    index = dp.get_resource("cat_technosphere_matrix_column_index")[0]
+    ids = [get_node(code=code).id for code in "abc"]
+    assert index == {"columns": ids, "pointers": [0, 3, 5, 7]}
+    cols = dp.get_resource("cat_technosphere_matrix.indices")[0]["col"]
+    assert cols.tolist() == [ids[0]] * 3 + [ids[1]] * 2 + [ids[2]] * 2
+    assert databases["cat"]["depends"] == ["mouse"]
+    assert not list(db.dirpath_processed().glob("tmp*"))
+
+
+def test_iotable_write_exchange_chunks_empty(iotable_fixture):
+    db = Database("cat")
+    db.write_exchange_chunks(technosphere=[], biosphere=iter([]), dependents=[])
+    assert not list(get_node(code="a").exchanges())
+
+
+def test_iotable_write_exchange_chunks_length_mismatch(iotable_fixture):
+    with pytest.raises(ValueError):
+        Database("cat").write_exchange_chunks(
+            technosphere=[(np.array([1, 2]), np.array([1, 2]), np.array([1.0]), None)],
+            biosphere=[],
+            dependents=[],
+        )
+
+
+def test_iotable_write_exchanges_sparse(iotable_fixture):
+    lca = LCA({("cat", "a"): 1}, ("a method",))
+    lca.lci()
+    lca.lcia()
+    technosphere, biosphere, score = lca.technosphere_matrix, lca.biosphere_matrix, lca.score
+    products = sorted(lca.dicts.product, key=lca.dicts.product.get)
+    activities = sorted(lca.dicts.activity, key=lca.dicts.activity.get)
+    flows = sorted(lca.dicts.biosphere, key=lca.dicts.biosphere.get)
+
+    Database("cat").write_exchanges(
+        technosphere=(technosphere.tocsr(), products, activities),
+        biosphere=(biosphere.tocoo(), np.array(flows), activities),
+        dependents=["mouse"],
+    )
+    assert edges("b") == [
+        ("b", 1, "production"),
+        ("c", 0.2, "technosphere"),
+        ("d", 1, "biosphere"),
+    ]
+    flip = Database("cat").datapackage().get_resource("cat_technosphere_matrix.flip")[0]
+    assert flip.sum() == 5
+    lca = LCA({("cat", "a"): 1}, ("a method",))
+    lca.lci()
+    lca.lcia()
+    assert np.allclose(lca.technosphere_matrix.toarray(), technosphere.toarray())
+    assert np.allclose(lca.score, score)
+
+
+def test_iotable_write_exchanges_sparse_shape_mismatch(iotable_fixture):
+    with pytest.raises(ValueError):
+        Database("cat").write_exchanges(
+            technosphere=(sparse.eye(3, format="csr"), [1, 2, 3], [1, 2]),
+            biosphere=[],
+            dependents=[],
+        )
+
+
+def lca_matrices():
+    lca = LCA({("cat", "a"): 1}, ("a method",))
+    lca.lci()
+    return lca.technosphere_matrix.toarray(), lca.biosphere_matrix.toarray(), lca.dicts
+
+
+@pytest.mark.parametrize("processed_format", ["zip", "directory"])
+def test_iotable_update_exchanges(iotable_fixture, processed_format):
+    preferences["processed_format"] = processed_format
+    db = Database("cat")
+    db.write_exchanges(
+        technosphere=[
+            {"row": get_node(code=m).id, "col": get_node(code=n).id, "amount": o, "flip": p}
+            for m, n, o, p in [
+                ("a", "a", 2, False),
+                ("b", "a", 1, True),
+                ("b", "b", 1, False),
+                ("c", "b", 0.2, True),
+                ("c", "c", 1, False),
+            ]
+        ],
+        biosphere=[{"row": get_node(code="d").id, "col": get_node(code="b").id, "amount": 1}],
+        dependents=["mouse"],
+    )
+    a, b, c, d = (get_node(code=code).id for code in "abcd")
+
+    db.update_exchanges(technosphere=([b, c], [a, b], [3, 0.5]))
+    assert db._overlay_path().exists() == (processed_format == "zip")
+    assert edges("a") == [("a", 2, "production"), ("b", 3, "technosphere")]
+    technosphere, _, dicts = lca_matrices()
+    assert technosphere[dicts.product[c], dicts.activity[b]] == -0.5
+
+    db.update_exchanges(
+        technosphere=([c, a], [a, a], [4, 5], [False, False]), biosphere=([d], [b], [7])
+    )
+    assert db._overlay_path().exists()
+    assert sorted(edges("a")) == [
+        ("a", 5, "production"),
+        ("b", 3, "technosphere"),
+        ("c", 4, "production"),
+    ]
+    db.update_exchanges(technosphere=([c], [a], [6]))
+    assert ("c", 6, "production") in edges("a")
+    assert ("d", 7, "biosphere") in edges("b")
+    technosphere, biosphere, dicts = lca_matrices()
+
+    db.compact()
+    assert not db._overlay_path().exists()
+    assert len(db.datapackage().get_resource("cat_technosphere_matrix.indices")[0]) == 6
+    assert sorted(edges("a")) == [
+        ("a", 5, "production"),
+        ("b", 3, "technosphere"),
+        ("c", 6, "production"),
+    ]
+    compacted = lca_matrices()
+    assert np.allclose(compacted[0], technosphere)
+    assert np.allclose(compacted[1], biosphere)
+    assert databases["cat"]["depends"] == ["mouse"]
+
+
+def test_iotable_update_exchanges_duplicates(iotable_fixture):
+    preferences["processed_format"] = "directory"
+    db = Database("cat")
+    a, b = get_node(code="a").id, get_node(code="b").id
+    db.write_exchanges(
+        technosphere=[{"row": b, "col": a, "amount": 1}, {"row": b, "col": a, "amount": 2}],
+        biosphere=[],
+        dependents=[],
+    )
+    db.update_exchanges(technosphere=([b, b], [a, a], [4, 5]))
+    assert not db._overlay_path().exists()
+    assert sorted(exc["amount"] for exc in get_node(code="a").exchanges()) == [0, 5]
+
+
+def test_iotable_scenarios(iotable_fixture):
+    db = Database("cat")
+    a, b, c, d = (get_node(code=code).id for code in "abcd")
+    indices = np.array([(a, a), (b, a), (b, b), (c, c)], dtype=[("row", int), ("col", int)])
+    db.write_exchanges(
+        technosphere={
+            "indices_array": indices,
+            "data_array": np.array([[1, 2], [0.5, 0.25], [1, 1], [1, 4]]),
+            "flip_array": np.array([False, True, False, False]),
+            "nrows": 4,
+        },
+        biosphere={
+            "indices_array": np.array([(d, b)], dtype=[("row", int), ("col", int)]),
+            "data_array": np.array([3.0]),
+            "nrows": 1,
+        },
+        dependents=["mouse"],
+        scenarios=["2030", "2050"],
+    )
+    assert db.scenarios == ["2030", "2050"]
+    stored = load_processed_datapackage(db.filepath_processed())
+    assert len([obj for obj in stored.resources if obj["kind"] == "indices"]) == 3
+    assert stored.get_resource("cat_technosphere_matrix.data")[0].shape == (4, 2)
+
+    scores = []
+    for scenario in db.scenarios:
+        assert [
+            exc["amount"]
+            for exc in IOTableExchanges(datapackage=db.datapackage(scenario), target=get_node(id=a))
+        ] == ([1, 0.5] if scenario == "2030" else [2, 0.25])
+        databases["cat"]["scenario"] = scenario
+        databases.flush()
+        lca = LCA({("cat", "a"): 1}, ("a method",))
+        lca.lci()
+        lca.lcia()
+        scores.append(lca.score)
+    # 1 a needs 0.5 (2030) or 0.125 (2050) b, which emits 3 d each, characterized with 42
+    assert np.allclose(scores, [0.5 * 3 * 42, 0.125 * 3 * 42])
+
+    with pytest.raises(ValueError):
+        db.datapackage("2040")
+    with pytest.raises(ValueError):
+        db.update_exchanges(technosphere=([a], [a], [5]))
+
+    db.write_exchanges(technosphere=[], biosphere=[], dependents=[])
+    assert db.scenarios == []
+    assert "scenario" not in databases["cat"]
+
+
+def test_iotable_scenarios_columns_mismatch(iotable_fixture):
+    a = get_node(code="a").id
+    with pytest.raises(ValueError):
+        Database("cat").write_exchanges(
+            technosphere={
+                "indices_array": np.array([(a, a)], dtype=[("row", int), ("col", int)]),
+                "data_array": np.array([[1.0, 2.0]]),
+                "nrows": 1,
+            },
+            biosphere=[],
+            dependents=[],
+            scenarios=["only one"],
+        )
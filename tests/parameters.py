@@ -1,3 +1,4 @@
+import importlib
 import re
 import time
 
@@ -5,10 +6,11 @@ import pytest
 from bw2parameters.errors import MissingName
 from peewee import IntegrityError
 
-from bw2data import Database, get_activity, parameters
+from bw2data import Database, databases, get_activity, parameters
 from bw2data.parameters import (
     ActivityParameter,
     DatabaseParameter,
+    FormulaSymbol,
     Group,
     GroupDependency,
     ParameterizedExchange,
@@ -1078,11 +1080,112 @@ def test_recalculate_exchanges_no_activities_parameters():
         assert exc.amount == 5
         assert exc.get("formula")
 
+
+@bw2test
+def test_recalculate_exchanges_shared_formulas():
+    db = Database("example")
+    db.register()
+    a = db.new_activity(code="A", name="An activity")
+    a.save()
+    b = db.new_activity(code="B", name="Another activity")
+    b.save()
+    for i in range(10):
+        a.new_exchange(
+            amount=0, input=b, type="technosphere", formula="foo * 2" if i % 2 else "foo + bar"
+        ).save()
+    b.new_exchange(amount=0, input=b, type="production", formula="foo * 100").save()
+
+    parameters.new_project_parameters([{"name": "foo", "amount": 3}])
+    parameters.new_database_parameters([{"name": "bar", "formula": "foo + 1"}], "example")
+    parameters.add_exchanges_to_group("my group", a)
+    ActivityParameter.recalculate_exchanges("my group")
+
+    assert sorted(exc.amount for exc in a.exchanges()) == [6] * 5 + [7] * 5
+    assert all(exc.get("formula") for exc in a.exchanges())
+    assert DatabaseParameter.get(name="bar").amount == 4
+    # Not in a parameter group
+    assert [exc.amount for exc in b.production()] == [0]
+
+    parameters.new_project_parameters([{"name": "foo", "amount": 5}])
+    ActivityParameter.recalculate("my group")
+    assert sorted(exc.amount for exc in a.exchanges()) == [10] * 5 + [11] * 5
+
     assert ActivityParameter.select().count() == 1
     a = ActivityParameter.get()
     assert a.name.startswith("__dummy_") and uuid4hex.search(a.name)
 
 
+@bw2test
+def test_recalculate_updates_only_dependents(monkeypatch):
+    # ``bw2data.parameters`` is shadowed by the ``ParameterManager`` instance
+    parameters_module = importlib.import_module("bw2data.parameters")
+
+    db = Database("example")
+    db.register()
+    a = db.new_activity(code="A", name="An activity", type="process")
+    a.save()
+    b = db.new_activity(code="B", name="Another activity", type="process")
+    b.save()
+    a.new_exchange(amount=0, input=b, type="technosphere", formula="y").save()
+    a.new_exchange(amount=0, input=b, type="technosphere", formula="z").save()
+    b.new_exchange(amount=0, input=b, type="production", formula="w").save()
+
+    parameters.new_project_parameters([{"name": "foo", "amount": 1}, {"name": "baz", "amount": 2}])
+    parameters.new_activity_parameters(
+        [
+            {"name": "x", "formula": "foo * 2", "database": "example", "code": "A"},
+            {"name": "y", "formula": "x + 1", "database": "example", "code": "A"},
+            {"name": "z", "amount": 5, "database": "example", "code": "A"},
+        ],
+        "first",
+    )
+    parameters.new_activity_parameters(
+        [{"name": "w", "formula": "baz * 10", "database": "example", "code": "B"}], "second"
+    )
+    parameters.add_exchanges_to_group("first", a)
+    parameters.add_exchanges_to_group("second", b)
+    parameters.recalculate()
+    assert sorted(exc.amount for exc in a.exchanges()) == [3, 5]
+
+    written, evaluated = [], []
+    write_amounts = parameters_module._write_amounts
+    write_exchange_amounts = parameters_module._write_exchange_amounts
+
+    def record_amounts(model, data, **where):
+        written.append((model.__name__, set(data)))
+        return write_amounts(model, data, **where)
+
+    def record_exchanges(formulas, interpreter, group):
+        evaluated.append((group, sorted(formulas.values())))
+        return write_exchange_amounts(formulas, interpreter, group)
+
+    monkeypatch.setattr(parameters_module, "_write_amounts", record_amounts)
+    monkeypatch.setattr(parameters_module, "_write_exchange_amounts", record_exchanges)
+
+    parameters.new_project_parameters([{"name": "foo", "amount": 4}])
+
+    assert ("ActivityParameter", {"x", "y"}) in written
+    assert evaluated == [("first", ["y"])]
+    assert Group.get(name="first").fresh and Group.get(name="second").fresh
+    assert ActivityParameter.get(name="y").amount == 9
+    assert sorted(exc.amount for exc in a.exchanges()) == [5, 9]
+    assert [exc.amount for exc in b.production()] == [20]
+    assert databases["example"]["dirty"]
+
+
+@bw2test
+def test_recalculate_new_name_shadows_upstream():
+    Database("B").register()
+    ProjectParameter.create(name="foo", amount=1)
+    ActivityParameter.create(group="A", database="B", code="C", name="D", formula="foo * 2")
+    parameters.recalculate()
+    assert ActivityParameter.get(name="D").amount == 2
+
+    parameters.new_database_parameters([{"name": "foo", "amount": 7}], "B")
+    assert ActivityParameter.get(name="D").amount == 14
+    assert Group.get(name="A").fresh
+
+
 @bw2test
 def test_activity_parameter_recalculate():
     Database("B").register()
@@ -1477,6 +1580,64 @@ def test_parameters_recalculate():
     assert ActivityParameter.get(name="D").amount == 8
 
 
+@bw2test
+def test_parameters_recalculate_in_parallel(monkeypatch):
+    parameters_module = importlib.import_module("bw2data.parameters")
+    monkeypatch.setattr(parameters_module, "PARALLEL_RECALCULATION_MIN_GROUPS", 2)
+    db = Database("B")
+    db.write({("B", str(i)): {"name": str(i), "unit": "kg"} for i in range(5)})
+    parameters.new_project_parameters([{"name": "bar", "amount": 2}])
+    parameters.new_database_parameters([{"name": "foo", "formula": "bar * 2"}], "B")
+    for i in range(4):
+        parameters.new_activity_parameters(
+            [{"name": "D", "database": "B", "code": str(i), "formula": f"foo * {i}"}], f"A{i}"
+        )
+        node = db.get(str(i))
+        node.new_exchange(input=node, amount=0, type="production", formula="D + bar").save()
+        parameters.add_exchanges_to_group(f"A{i}", node)
+    # Depends on group "A3"
+    ActivityParameter.create(group="top", database="B", code="4", name="F", formula="D * 10")
+    g = Group.get(name="top")
+    g.order = ["A3"]
+    g.save()
+
+    ProjectParameter.update(amount=3).execute()
+    Group.update(fresh=False).execute()
+    parameters.recalculate(processes=2)
+
+    assert not Group.select().where(Group.fresh == False).count()
+    assert DatabaseParameter.get(name="foo").amount == 6
+    for i in range(4):
+        assert ActivityParameter.get(group=f"A{i}").amount == 6 * i
+        assert [exc["amount"] for exc in db.get(str(i)).production()] == [6 * i + 3]
+    assert ActivityParameter.get(group="top").amount == 180
+    assert [o.depends for o in GroupDependency.select().where(GroupDependency.group == "top")] == [
+        "A3"
+    ]
+
+
+@bw2test
+def test_parameters_recalculate_without_worker_processes_by_default(monkeypatch):
+    parameters_module = importlib.import_module("bw2data.parameters")
+    monkeypatch.setattr(parameters_module, "PARALLEL_RECALCULATION_MIN_GROUPS", 1)
+
+    def no_pool(*args, **kwargs):
+        raise AssertionError("Worker processes started")
+
+    monkeypatch.setattr(parameters_module, "ProcessPoolExecutor", no_pool)
+    monkeypatch.setattr("os.cpu_count", lambda: 4)
+    Database("B").write({("B", str(i)): {"name": str(i), "unit": "kg"} for i in range(3)})
+    parameters.new_project_parameters([{"name": "bar", "amount": 2}])
+    for i in range(3):
+        parameters.new_activity_parameters(
+            [{"name": "D", "database": "B", "code": str(i), "formula": f"bar * {i}"}], f"A{i}"
+        )
+    ProjectParameter.update(amount=3).execute()
+    Group.update(fresh=False).execute()
+    parameters.recalculate()
+    assert [ActivityParameter.get(group=f"A{i}").amount for i in range(3)] == [0, 3, 6]
+
+
 @bw2test
 def test_parameters_new_database_parameters():
     with pytest.raises(AssertionError):
@@ -1769,6 +1930,92 @@ def test_parameters_rename_activity_parameter_order_exchange():
     assert exc.get("formula") == "Correct + 2"
 
 
+def test_parameters_rename_project_parameter_similar_names(chain):
+    ProjectParameter.create(name="barbar", amount=1)
+    ActivityParameter.create(
+        group="A", database="B", code="E", name="K", amount=0, formula="barbar * bar"
+    )
+    parameters.recalculate()
+    param = ProjectParameter.get(name="bar")
+    parameters.rename_project_parameter(param, "baz", update_dependencies=True)
+    assert ActivityParameter.get(name="F", group="A").formula == "foo + baz + D"
+    assert ActivityParameter.get(name="K", group="A").formula == "barbar * baz"
+    assert ActivityParameter.get(name="K", group="A").amount == 8
+
+
+@bw2test
+def test_parameters_rename_project_parameter_many_dependents():
+    Database("B").register()
+    parameters.new_project_parameters([{"name": "foo", "amount": 2}])
+    parameters.new_activity_parameters(
+        [
+            {"name": f"p{i}", "database": "B", "code": "C", "formula": f"foo * {i}"}
+            for i in range(60)
+        ],
+        "A",
+    )
+    param = ProjectParameter.get(name="foo")
+    parameters.rename_project_parameter(param, "bar", update_dependencies=True)
+    assert not ActivityParameter.select().where(ActivityParameter.formula.contains("foo")).count()
+    assert ActivityParameter.get(name="p59").amount == 118
+
+
+def formula_symbols(group, name):
+    return {
+        symbol: amount
+        for symbol, amount in FormulaSymbol.select(FormulaSymbol.symbol, FormulaSymbol.amount)
+        .where(FormulaSymbol.group == group, FormulaSymbol.name == name)
+        .tuples()
+    }
+
+
+def test_formula_symbols_updated_on_save(chain):
+    parameters.recalculate()
+    assert formula_symbols("A", "F") == {"foo": 20, "bar": 20, "D": 20}
+
+    param = ActivityParameter.get(name="F", group="A")
+    param.formula = "D * 2"
+    param.save()
+    # Amount is kept until the group is recalculated
+    assert formula_symbols("A", "F") == {"D": 20}
+    ActivityParameter.create(group="A", database="B", code="E", name="K", amount=0)
+    assert formula_symbols("A", "K") == {None: None}
+    parameters.recalculate()
+    assert formula_symbols("A", "F") == {"D": 16}
+    assert formula_symbols("A", "K") == {None: 0}
+
+    # Groups are only indexed completely when they are recalculated
+    ActivityParameter.create(group="Z", database="K", code="Y", name="X", formula="bar")
+    assert not formula_symbols("Z", "X")
+
+
+def test_formula_symbols_dependency_lookups(chain):
+    parameters.recalculate()
+    assert ActivityParameter.is_dependent_on("bar", "project")
+    param = ActivityParameter.get(name="F", group="A")
+    param.formula = "foo + D"
+    param.save()
+    assert not ActivityParameter.is_dependent_on("bar", "project")
+
+    # Groups without symbols are always checked
+    FormulaSymbol.delete().where(FormulaSymbol.group == "A").execute()
+    param.formula = "foo + bar + D"
+    param.save()
+    assert not formula_symbols("A", "F")
+    assert ActivityParameter.is_dependent_on("bar", "project")
+
+
+def test_get_new_symbols_parses_formulas_once():
+    # ``bw2data.parameters`` is shadowed by the ``ParameterManager`` instance
+    parameters_module = importlib.import_module("bw2data.parameters")
+    parameters_module._formula_names.cache_clear()
+
+    data = [{"formula": "a * sqrt(b) + c"}, {"amount": 1}, "a ** 2"]
+    assert parameters_module.get_new_symbols(data, context={"c"}) == {"a", "b"}
+    assert parameters_module.get_new_symbols(data) == {"a", "b", "c"}
+    assert parameters_module._formula_names.cache_info().misses == 2
+
+
 @bw2test
 def test_parameters_add_to_group_empty():
     db = Database("example")
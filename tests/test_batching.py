@@ -0,0 +1,197 @@
+import pytest
+
+from bw2data import Database, batch, databases, geomapping, get_node
+from bw2data.backends import ActivityDataset
+from bw2data.batching import current_batch
+from bw2data.serialization import SerializedDict
+from bw2data.signals import signaleddataset_on_save
+from bw2data.tests import bw2test
+
+
+def _fixture():
+    Database("food").write(
+        {
+            ("food", "1"): {"name": "lunch", "type": "process", "location": "CH", "exchanges": []},
+            ("food", "2"): {"name": "dinner", "type": "process", "location": "CH", "exchanges": []},
+        }
+    )
+    databases.clean()
+
+
+@bw2test
+def test_batch_session_only_inside_block():
+    assert current_batch() is None
+    with batch() as session:
+        assert current_batch() is session
+        with batch() as nested:
+            assert nested is session
+        assert current_batch() is session
+    assert current_batch() is None
+
+
+@bw2test
+def test_batch_metadata_written_once(monkeypatch):
+    _fixture()
+    calls = []
+    original = SerializedDict.serialize
+
+    def counting(self, *args, **kwargs):
+        calls.append(self.filename)
+        return original(self, *args, **kwargs)
+
+    monkeypatch.setattr(SerializedDict, "serialize", counting)
+
+    with batch():
+        for node in Database("food"):
+            node["comment"] = "checked"
+            node.save()
+            node.new_edge(input=node, amount=1, type="production").save()
+        # In-memory metadata is already current
+        assert databases["food"]["dirty"]
+        assert not calls
+
+    assert calls == ["databases.json"]
+    databases.load()
+    assert databases["food"]["dirty"]
+    assert all(node["comment"] == "checked" for node in Database("food"))
+    assert len(Database("food").get("1").production()) == 1
+
+
+@bw2test
+def test_batch_geomapping():
+    _fixture()
+    with batch():
+        node = Database("food").new_node(code="3", name="snack", type="process", location="DK")
+        node.save()
+        assert "DK" in geomapping
+    geomapping.load()
+    assert "DK" in geomapping
+
+
+@bw2test
+def test_batch_rollback():
+    _fixture()
+    with pytest.raises(ZeroDivisionError):
+        with batch():
+            Database("food").new_node(
+                code="3", name="snack", type="process", location="DK"
+            ).save()
+            node = get_node(code="1")
+            node["name"] = "brunch"
+            node.save()
+            1 / 0
+
+    assert current_batch() is None
+    assert not ActivityDataset.select().where(ActivityDataset.code == "3").count()
+    assert get_node(code="1")["name"] == "lunch"
+    assert not Database("food").search("snack")
+    assert not Database("food").search("brunch")
+    assert "DK" not in geomapping
+
+
+def _many_nodes(name, number=600):
+    return {
+        (name, str(i)): {"name": f"n{i}", "type": "process", "exchanges": []}
+        for i in range(number)
+    }
+
+
+@bw2test
+def test_batch_database_write_and_delete():
+    _fixture()
+    with batch():
+        Database("many").write(_many_nodes("many"))
+        assert len(Database("many")) == 600
+        Database("many").delete(warn=False)
+        assert not len(Database("many"))
+        Database("food").write(_many_nodes("food", 2))
+
+    assert current_batch() is None
+    assert not len(Database("many"))
+    assert {node["name"] for node in Database("food")} == {"n0", "n1"}
+
+
+@bw2test
+def test_batch_database_write_rollback():
+    _fixture()
+    with pytest.raises(ZeroDivisionError):
+        with batch():
+            Database("food").write(_many_nodes("food"))
+            1 / 0
+
+    assert {node["name"] for node in Database("food")} == {"lunch", "dinner"}
+
+
+@bw2test
+def test_batch_search_index():
+    _fixture()
+    with batch():
+        node = get_node(code="1")
+        node["name"] = "brunch"
+        node.save()
+        Database("food").new_node(code="3", name="snack", type="process").save()
+        get_node(code="2").delete()
+        # Search index changes are applied at the end
+        assert not Database("food").search("brunch")
+
+    assert [x["code"] for x in Database("food").search("brunch")] == ["1"]
+    assert [x["code"] for x in Database("food").search("snack")] == ["3"]
+    assert not Database("food").search("dinner")
+    assert not Database("food").search("lunch")
+
+
+@bw2test
+def test_batch_search_index_code_change():
+    _fixture()
+    with batch():
+        node = get_node(code="1")
+        node["name"] = "brunch"
+        node.save()
+        node["code"] = "4"
+
+    assert [x["code"] for x in Database("food").search("brunch")] == ["4"]
+
+
+@bw2test
+def test_batch_save_signals_merged():
+    _fixture()
+    received = []
+
+    def receiver(sender, old, new):
+        received.append((old.data["name"] if old else None, new.data["name"]))
+
+    signaleddataset_on_save.connect(receiver)
+    try:
+        with batch():
+            node = get_node(code="1")
+            node["name"] = "brunch"
+            node.save()
+            node["name"] = "elevenses"
+            node.save()
+            Database("food").new_node(code="3", name="snack", type="process").save()
+            assert not received
+    finally:
+        signaleddataset_on_save.disconnect(receiver)
+
+    assert received == [("lunch", "elevenses"), (None, "snack")]
+
+
+@bw2test
+def test_batch_save_signals_state_at_save():
+    _fixture()
+    received = []
+
+    def receiver(sender, old, new):
+        received.append((new.name, new.data["name"]))
+
+    signaleddataset_on_save.connect(receiver)
+    try:
+        with batch():
+            ds = ActivityDataset.get(ActivityDataset.code == "1")
+            ds.name = ds.data["name"] = "brunch"
+            ds.save()
+            ds.name = ds.data["name"] = "elevenses"
+    finally:
+        signaleddataset_on_save.disconnect(receiver)
+
+    assert received == [("brunch", "brunch")]
@@ -0,0 +1,87 @@
+import sqlite3
+
+import pytest
+
+from bw2data import Database, Method, databases, geomapping, get_id, methods, projects
+from bw2data.backends import sqlite3_lci_db
+from bw2data.backends.schema import _get_id_cache
+from bw2data.errors import UnknownObject
+from bw2data.meta import Databases, GeoMapping, Methods
+from bw2data.tests import bw2test
+
+
+@bw2test
+def test_get_id_cache_invalidated_by_other_connection():
+    Database("db").write({("db", "a"): {}, ("db", "b"): {}})
+    get_id(("db", "a"))
+    assert ("db", "a") in _get_id_cache
+
+    # Another process changes the code without sending any signals
+    connection = sqlite3.connect(sqlite3_lci_db._filepath)
+    with connection:
+        connection.execute("UPDATE activitydataset SET code = 'c' WHERE code = 'a'")
+    connection.close()
+
+    with pytest.raises(UnknownObject):
+        get_id(("db", "a"))
+    assert get_id(("db", "c"))
+
+
+@bw2test
+def test_get_id_cache_kept_for_own_changes():
+    Database("db").write({("db", "a"): {}, ("db", "b"): {}})
+    get_id(("db", "a"))
+    node = Database("db").get("b")
+    node["name"] = "b"
+    node["unit"] = "kg"
+    node.save()
+    assert ("db", "a") in _get_id_cache
+
+
+@bw2test
+def test_databases_reloaded_when_file_changes():
+    Database("food").register()
+    # Simulates another process with its own copy of ``databases``
+    Databases()["other"] = {"backend": "sqlite"}
+    assert "other" in databases
+    assert sorted(databases) == ["food", "other"]
+
+
+@bw2test
+def test_methods_reloaded_when_file_changes():
+    Method(("a", "method")).register(unit="kg")
+    other = Methods()
+    other[("a", "method")] = {"unit": "MJ"}
+    assert methods[("a", "method")]["unit"] == "MJ"
+
+
+@bw2test
+def test_geomapping_add_sees_other_process_keys():
+    GeoMapping().add(["CH"])
+    geomapping.add(["DE"])
+    assert geomapping["CH"] != geomapping["DE"]
+    assert GeoMapping()["DE"] == geomapping["DE"]
+
+
+@bw2test
+def test_own_writes_not_reloaded(monkeypatch):
+    Database("food").register()
+    monkeypatch.setattr(Databases, "load", lambda self: pytest.fail("Unnecessary reload"))
+    databases.set_dirty("food")
+    assert "food" in databases
+
+
+@bw2test
+def test_sqlite_store_reloaded_only_for_changed_name(monkeypatch):
+    projects.create_project("sqlite-metadata", metadata_backend="sqlite")
+    projects.set_current("sqlite-metadata")
+    Database("food").register()
+
+    # Another process writes a different dictionary in ``metadata.db``
+    Methods()[("a", "method")] = {"unit": "kg"}
+    monkeypatch.setattr(Databases, "load", lambda self: pytest.fail("Unnecessary reload"))
+    assert "food" in databases
+    monkeypatch.undo()
+
+    Databases()["other"] = {}
+    assert sorted(databases) == ["food", "other"]
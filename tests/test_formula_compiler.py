@@ -0,0 +1,282 @@
+import numpy as np
+import pytest
+from asteval import Interpreter
+from bw2parameters.errors import MissingName
+
+from bw2data import Database, Method, databases, get_id, parameters
+from bw2data.errors import UnknownObject, UnsupportedFormula
+from bw2data.formula_compiler import compile_formula
+from bw2data.parameters import ActivityParameter, DatabaseParameter, ProjectParameter
+from bw2data.tests import bw2test
+
+
+@pytest.mark.parametrize(
+    "formula",
+    [
+        "a * b + 2 ** a - b / 4",
+        "-a // 2 + a % 3",
+        "sqrt(a) + exp(-b) + log10(a) + ln(b) + abs(-a)",
+        "max(a, b, 3) - min(a, b)",
+        "a if a > b else b * 2",
+        "1 < a <= 4",
+        "a > 2 and b or 7",
+        "not a > 2",
+        "pi * e + atan2(a, b)",
+        "round(a / 3, 2)",
+    ],
+)
+def test_compile_formula_matches_asteval(formula):
+    interpreter = Interpreter()
+    a = np.array([0.5, 1, 2, 3.5, 5])
+    b = np.array([4, 3, 2, 1, 0.25])
+    expected = []
+    for x, y in zip(a, b):
+        interpreter.symtable.update({"a": float(x), "b": float(y)})
+        expected.append(interpreter(formula))
+    result = compile_formula(formula)({"a": a, "b": b, "pi": np.pi, "e": np.e})
+    assert np.allclose(result, expected)
+
+
+@pytest.mark.parametrize(
+    "formula",
+    [
+        "__import__('os')",
+        "a.real",
+        "a[0]",
+        "open('foo')",
+        "[a, b]",
+        "lambda: a",
+        "'text'",
+        "sqrt(x=a)",
+        "a +",
+    ],
+)
+def test_compile_formula_unsupported(formula):
+    with pytest.raises(UnsupportedFormula):
+        compile_formula(formula)
+
+
+def test_compile_formula_symbols():
+    assert compile_formula("max(a, sqrt(b)) * pi + True").symbols == {"a", "b", "pi"}
+
+
+@pytest.fixture
+@bw2test
+def parameterized():
+    db = Database("db")
+    db.write(
+        {
+            ("db", "product"): {"name": "product", "unit": "kg", "type": "process"},
+            ("db", "co2"): {"name": "CO2", "unit": "kg", "type": "emission"},
+            ("db", "process"): {"name": "process", "unit": "kg", "type": "process"},
+        }
+    )
+    parameters.new_project_parameters(
+        [
+            {
+                "name": "efficiency",
+                "amount": 0.5,
+                "uncertainty type": 4,
+                "minimum": 0.4,
+                "maximum": 0.6,
+            },
+            {"name": "fuel", "formula": "10 / efficiency"},
+        ]
+    )
+    parameters.new_database_parameters([{"name": "factor", "amount": 3.0}], "db")
+    parameters.new_activity_parameters(
+        [
+            {"name": "factor", "database": "db", "code": "process", "amount": 2.0},
+            {"name": "emissions", "database": "db", "code": "process", "formula": "fuel * factor"},
+        ],
+        "group",
+    )
+    process = db.get("process")
+    for code, kind, formula in (
+        ("product", "technosphere", "fuel"),
+        ("co2", "biosphere", "emissions"),
+        ("process", "production", "1"),
+    ):
+        process.new_exchange(input=("db", code), amount=0, type=kind, formula=formula).save()
+    parameters.add_exchanges_to_group("group", process)
+    parameters.recalculate()
+
+
+def test_compiled_parameters_match_recalculate(parameterized):
+    values = parameters.compile("group").evaluate()
+    assert values[("project", "fuel")] == [20]
+    assert values[("db", "factor")] == [3]
+    assert values[("group", "factor")] == [2]
+    assert values[("group", "emissions")] == [ActivityParameter.get(name="emissions").amount]
+
+    amounts = parameters.compile("group").exchange_amounts()
+    for exc in Database("db").get("process").exchanges():
+        assert amounts[exc._document.id] == [exc["amount"]]
+
+
+def test_compiled_parameters_samples(parameterized):
+    compiled = parameters.compile("group")
+    assert sorted(compiled.inputs) == [
+        ("db", "factor"),
+        ("group", "factor"),
+        ("project", "efficiency"),
+    ]
+
+    efficiency = np.array([0.4, 0.5, 0.8])
+    values = compiled.evaluate({"efficiency": efficiency})
+    assert np.allclose(values[("project", "fuel")], 10 / efficiency)
+    assert np.allclose(values[("group", "emissions")], 20 / efficiency)
+    assert np.allclose(values[("db", "factor")], 3)
+
+    # Names are looked up from the compiled group, so ``factor`` is the activity parameter
+    values = compiled.evaluate({"factor": [1, 2, 3]})
+    assert np.allclose(values[("group", "emissions")], [20, 40, 60])
+    assert np.allclose(values[("db", "factor")], 3)
+    values = compiled.evaluate({("db", "factor"): [1, 2, 3]})
+    assert np.allclose(values[("group", "emissions")], 40)
+
+    with pytest.raises(MissingName):
+        compiled.evaluate({"missing": [1, 2, 3]})
+    with pytest.raises(ValueError):
+        compiled.evaluate({"efficiency": [1, 2], "factor": [1, 2, 3]})
+
+
+def test_compiled_parameters_sample(parameterized):
+    compiled = parameters.compile("group")
+    samples = compiled.sample(100, seed=1)
+    efficiency = samples[("project", "efficiency")]
+    assert efficiency.shape == (100,)
+    assert np.all((efficiency >= 0.4) & (efficiency <= 0.6))
+    assert np.allclose(samples[("group", "factor")], 2)
+    values = compiled.evaluate(samples)
+    assert np.allclose(values[("project", "fuel")], 10 / efficiency)
+
+
+def test_compiled_parameters_exchange_arrays(parameterized):
+    efficiency = np.array([0.4, 0.5])
+    arrays = parameters.compile("group").exchange_arrays({"efficiency": efficiency})
+    process = get_id(("db", "process"))
+
+    technosphere = arrays["technosphere_matrix"]
+    assert technosphere["indices_array"].tolist() == [
+        (get_id(("db", "product")), process),
+        (process, process),
+    ]
+    assert np.allclose(technosphere["data_array"], [10 / efficiency, [1, 1]])
+    assert technosphere["flip_array"].tolist() == [True, False]
+
+    biosphere = arrays["biosphere_matrix"]
+    assert biosphere["indices_array"].tolist() == [(get_id(("db", "co2")), process)]
+    assert np.allclose(biosphere["data_array"], [20 / efficiency])
+    assert biosphere["flip_array"].tolist() == [False]
+
+
+def test_compiled_parameters_other_groups(parameterized):
+    assert parameters.compile().evaluate(iterations=2)[("project", "fuel")].tolist() == [20, 20]
+    assert parameters.compile("db").evaluate({"efficiency": [1]}) == {
+        ("project", "efficiency"): [1],
+        ("project", "fuel"): [10],
+        ("db", "factor"): [3],
+    }
+    with pytest.raises(UnknownObject):
+        parameters.compile("missing")
+
+
+def _without_database_parameters():
+    db = Database("db")
+    db.write(
+        {
+            ("db", "product"): {"name": "product", "unit": "kg", "type": "process"},
+            ("db", "process"): {"name": "process", "unit": "kg", "type": "process"},
+        }
+    )
+    parameters.new_project_parameters([{"name": "price", "amount": 2}])
+    parameters.new_activity_parameters(
+        [{"name": "use", "database": "db", "code": "process", "formula": "price * 3"}], "G"
+    )
+    process = db.get("process")
+    process.new_exchange(
+        input=("db", "product"), amount=0, type="technosphere", formula="use"
+    ).save()
+    parameters.add_exchanges_to_group("G", process)
+    parameters.recalculate()
+
+
+@bw2test
+def test_compiled_parameters_without_database_parameters():
+    _without_database_parameters()
+    values = parameters.compile("G").evaluate({"price": [1, 2]})
+    assert np.allclose(values[("G", "use")], [3, 6])
+    assert ("db", "use") not in values
+    with pytest.raises(UnknownObject):
+        parameters.compile("db")
+
+
+@bw2test
+def test_overlay_datapackage_without_database_parameters():
+    _without_database_parameters()
+    dp = parameters.overlay_datapackage(["G"])
+    assert dp.metadata["parameter_groups"] == ["G"]
+    array, _ = dp.get_resource("parameter_overlay_technosphere_matrix.data")
+    assert array.tolist() == [6]
+
+
+@bw2test
+def test_compiled_parameters_unsupported_formula():
+    ProjectParameter.create(name="a", formula="sum([1, 2])")
+    with pytest.raises(UnsupportedFormula):
+        parameters.compile()
+
+
+@bw2test
+def test_compiled_parameters_name_shadows_constant():
+    ProjectParameter.create(name="e", amount=2)
+    DatabaseParameter.create(database="db", name="b", formula="e * pi")
+    assert np.allclose(parameters.compile("db").evaluate()[("db", "b")], 2 * np.pi)
+
+
+def test_overlay_datapackage_static(parameterized):
+    dp = parameters.overlay_datapackage()
+    assert dp.metadata["parameter_groups"] == ["group"]
+    array, _ = dp.get_resource("parameter_overlay_biosphere_matrix.data")
+    assert array.tolist() == [40]
+    array, _ = dp.get_resource("parameter_overlay_technosphere_matrix.data")
+    assert array.tolist() == [20, 1]
+
+
+def test_overlay_datapackage_lca(parameterized):
+    from bw2calc import LCA
+
+    Method(("m",)).write([(("db", "co2"), 1)])
+    process = Database("db").get("process")
+    # Not parameterized, but summed with the parameterized exchange in the matrix
+    process.new_exchange(input=("db", "co2"), amount=5, type="biosphere").save()
+    exchanges = {exc["input"]: exc["amount"] for exc in process.exchanges()}
+
+    efficiency = np.array([0.4, 0.5, 0.8])
+    dp = parameters.overlay_datapackage(
+        "group", {"efficiency": efficiency}, sequential=True, name="sweep"
+    )
+    data_objs = [
+        Database("db").datapackage(),
+        Method(("m",)).datapackage(),
+        dp,
+    ]
+    lca = LCA({get_id(("db", "process")): 1}, data_objs=data_objs, use_arrays=True)
+    lca.lci()
+    lca.lcia()
+    scores = [lca.score]
+    for _ in range(2):
+        next(lca)
+        scores.append(lca.score)
+    assert np.allclose(scores, 2 * 10 / efficiency + 5)
+
+    assert not databases["db"].get("dirty")
+    assert {exc["input"]: exc["amount"] for exc in process.exchanges()} == exchanges
+
+
+def test_overlay_datapackage_samples_must_match(parameterized):
+    with pytest.raises(MissingName):
+        parameters.overlay_datapackage(samples={"missing": [1, 2]})
+    with pytest.raises(ValueError):
+        parameters.overlay_datapackage(samples={"efficiency": [1, 2], "factor": [1]})
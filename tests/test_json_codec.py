@@ -0,0 +1,125 @@
+import datetime
+import json
+import math
+
+import pytest
+
+from bw2data import Database, databases, get_node, projects
+from bw2data.json_codec import JSONCodec, codec, orjson
+from bw2data.serialization import JsonWrapper
+from bw2data.sqlite import JSONField, TupleJSONField
+from bw2data.tests import bw2test
+
+BACKENDS = [
+    "json",
+    pytest.param(
+        "orjson", marks=pytest.mark.skipif(orjson is None, reason="orjson not installed")
+    ),
+]
+
+
+@pytest.mark.parametrize("backend", BACKENDS)
+def test_json_codec_matches_standard_library(backend):
+    codec = JSONCodec(backend)
+    data = {"a": (1, 2.5, None), 1: [True, "ü"], "nested": {"key": ("x", ("y",))}}
+    assert codec.loads(codec.dumps(data)) == json.loads(json.dumps(data))
+    assert codec.loads(codec.dumpb(data)) == json.loads(json.dumps(data))
+
+
+@pytest.mark.parametrize("backend", BACKENDS)
+def test_json_codec_datetime_needs_default(backend):
+    codec = JSONCodec(backend)
+    value = datetime.datetime(2024, 1, 2, 3, 4, 5, 6)
+    with pytest.raises(TypeError):
+        codec.dumps({"a": value})
+    assert codec.loads(codec.dumps({"a": value}, default=lambda x: x.isoformat())) == {
+        "a": "2024-01-02T03:04:05.000006"
+    }
+
+
+@pytest.mark.parametrize("backend", BACKENDS)
+def test_json_codec_fallbacks(backend):
+    codec = JSONCodec(backend)
+    assert codec.loads(codec.dumps([2**70])) == [2**70]
+    assert codec.loads('{"a": NaN}')["a"] != codec.loads('{"a": NaN}')["a"]
+    with pytest.raises(TypeError):
+        codec.dumps({("tuple", "key"): 1})
+
+
+@pytest.mark.parametrize("backend", BACKENDS)
+def test_json_codec_non_finite_floats(backend):
+    codec = JSONCodec(backend)
+    data = {"a": [math.nan, (1, {"b": math.inf})], "c": -math.inf, "d": None}
+    for result in (codec.loads(codec.dumps(data)), codec.loads(codec.dumpb(data))):
+        assert math.isnan(result["a"][0])
+        assert result["a"][1] == [1, {"b": math.inf}]
+        assert result["c"] == -math.inf
+        assert result["d"] is None
+
+
+@pytest.mark.parametrize("backend", BACKENDS)
+def test_json_codec_indent(backend):
+    assert "\n" not in JSONCodec(backend).dumps({"a": [1]})
+    assert JSONCodec(backend, indent=True).dumps({"a": [1]}) == '{\n  "a": [\n    1\n  ]\n}'
+
+
+@pytest.mark.parametrize("backend", BACKENDS)
+def test_json_codec_file(tmp_path, backend):
+    codec = JSONCodec(backend)
+    codec.dump({"name": "Zürich"}, tmp_path / "test.json")
+    assert json.loads((tmp_path / "test.json").read_text(encoding="utf-8")) == {"name": "Zürich"}
+    assert codec.load(tmp_path / "test.json") == {"name": "Zürich"}
+
+
+def test_json_codec_invalid_backend():
+    with pytest.raises(ValueError):
+        JSONCodec("foo")
+
+
+def test_json_fields():
+    value = {"a": (1, 2), "when": datetime.date(2024, 1, 2)}
+    assert JSONField().python_value(JSONField().db_value(value)) == {
+        "a": [1, 2],
+        "when": "2024-01-02",
+    }
+    assert TupleJSONField().python_value(TupleJSONField().db_value(("a", "b"))) == ("a", "b")
+    assert math.isnan(JSONField().python_value(JSONField().db_value({"a": math.nan}))["a"])
+
+
+def test_json_wrapper_non_finite_floats(tmp_path):
+    JsonWrapper.dump({"a": math.nan}, tmp_path / "test.json")
+    assert math.isnan(JsonWrapper.load(tmp_path / "test.json")["a"])
+    JsonWrapper.dump_bz2({"a": math.inf}, tmp_path / "test.json.bz2")
+    assert JsonWrapper.load_bz2(tmp_path / "test.json.bz2")["a"] == math.inf
+    assert math.isnan(JsonWrapper.loads(JsonWrapper.dumps([math.nan]))[0])
+
+
+@bw2test
+def test_non_finite_floats_in_serialized_dict_and_revisions():
+    projects.dataset.set_sourced()
+    Database("food").write(
+        {
+            ("food", "1"): {
+                "name": "lunch",
+                "type": "process",
+                "exchanges": [
+                    {"input": ("food", "1"), "amount": 1, "type": "production", "minimum": math.nan}
+                ],
+            }
+        }
+    )
+    databases["food"]["threshold"] = math.inf
+    databases.flush()
+    databases.load()
+    assert databases["food"]["threshold"] == math.inf
+
+    assert math.isnan(list(get_node(code="1").production())[0]["minimum"])
+    edges = [
+        obj["delta"]
+        for fp in (projects.dataset.dir / "revisions").iterdir()
+        if fp.stem != "head"
+        for obj in codec.load(fp)["data"]
+        if obj["type"] == "lci_edge"
+    ]
+    assert len(edges) == 1
+    assert math.isnan(edges[0]["type_changes"]["root"]["new_value"]["data"]["minimum"])
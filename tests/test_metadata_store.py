@@ -0,0 +1,112 @@
+from bw2data import Database, Method, databases, geomapping, methods, preferences, projects
+from bw2data.serialization import SQLiteMetadataStore
+from bw2data.signals import on_database_metadata_change
+from bw2data.tests import bw2test
+
+
+def _sqlite_project():
+    projects.create_project("sqlite-metadata", metadata_backend="sqlite")
+    projects.set_current("sqlite-metadata")
+
+
+@bw2test
+def test_sqlite_metadata_no_files():
+    _sqlite_project()
+    Database("food").register(format="Excel")
+    assert databases["food"]["format"] == "Excel"
+    assert (projects.dir / "metadata.db").is_file()
+    assert not (projects.dir / "databases.json").exists()
+    assert not (projects.dir / "geomapping.pickle").exists()
+
+
+@bw2test
+def test_sqlite_metadata_roundtrip():
+    _sqlite_project()
+    Database("food").register()
+    Method(("a", "method")).register(unit="kg")
+    geomapping.add([("regional", "location")])
+    preferences["foo"] = {"bar": (1, 2)}
+
+    projects.set_current("default")
+    assert "food" not in databases
+    projects.set_current("sqlite-metadata")
+
+    assert "food" in databases
+    assert methods[("a", "method")]["unit"] == "kg"
+    assert ("regional", "location") in geomapping
+    assert preferences["foo"] == {"bar": (1, 2)}
+
+
+@bw2test
+def test_sqlite_metadata_only_changed_rows_written(monkeypatch):
+    _sqlite_project()
+    Database("food").register()
+    Database("other").register()
+
+    written = []
+    original = SQLiteMetadataStore.write
+
+    def recording(self, name, changed, deleted=()):
+        written.append((name, set(changed), list(deleted)))
+        return original(self, name, changed, deleted)
+
+    monkeypatch.setattr(SQLiteMetadataStore, "write", recording)
+
+    databases.set_modified("food")
+    assert written == [("databases.json", {"'food'"}, [])]
+
+    written.clear()
+    del databases["other"]
+    assert written == [("databases.json", set(), ["'other'"])]
+
+    written.clear()
+    databases.flush()
+    assert not written
+    databases.load()
+    assert list(databases) == ["food"]
+
+
+@bw2test
+def test_sqlite_metadata_key_scoped_signal():
+    _sqlite_project()
+    Database("food").register()
+    Database("other").register()
+
+    received = []
+
+    def receiver(sender, old, new):
+        received.append((old, new))
+
+    on_database_metadata_change.connect(receiver)
+    try:
+        databases["food"]["foo"] = "bar"
+        databases.flush()
+    finally:
+        on_database_metadata_change.disconnect(receiver)
+
+    ((old, new),) = received
+    assert list(old) == list(new) == ["food"]
+    assert "foo" not in old["food"]
+    assert new["food"]["foo"] == "bar"
+
+
+@bw2test
+def test_use_sqlite_metadata_imports_files():
+    projects.set_current("files")
+    Database("food").register()
+    Method(("a", "method")).register()
+    preferences["foo"] = "bar"
+
+    projects.use_sqlite_metadata()
+    assert projects.dataset.data["metadata_backend"] == "sqlite"
+    assert databases._store is not None
+    assert "food" in databases
+    assert ("a", "method") in methods
+    assert preferences["foo"] == "bar"
+
+    Database("other").register()
+    projects.set_current("default")
+    projects.set_current("files")
+    assert sorted(databases) == ["food", "other"]
+    # The old files are not updated anymore
+    assert "other" not in (projects.dir / "databases.json").read_text()
@@ -0,0 +1,112 @@
+import multiprocessing
+import pickle
+
+import numpy as np
+import pytest
+from bw2calc import LCA
+
+from bw2data import Database, Method, get_id
+from bw2data.shared_memory import SharedDatapackages
+from bw2data.tests import bw2test
+
+
+def _fixture():
+    Database("biosphere").write(
+        {("biosphere", "1"): {"name": "an emission", "type": "emission", "unit": "kg"}}
+    )
+    Database("food").write(
+        {
+            ("food", "1"): {
+                "name": "lunch",
+                "type": "process",
+                "exchanges": [
+                    {"input": ("food", "1"), "amount": 1, "type": "production"},
+                    {"input": ("biosphere", "1"), "amount": 4, "type": "biosphere"},
+                ],
+            }
+        }
+    )
+    method = Method(("a method",))
+    method.register()
+    method.write([(("biosphere", "1"), 10)])
+
+
+def _worker_score(shared, node_id):
+    lca = LCA({node_id: 1}, data_objs=shared.datapackages())
+    lca.lci()
+    lca.lcia()
+    return lca.score
+
+
+@bw2test
+def test_shared_datapackages_include_dependents():
+    _fixture()
+    with SharedDatapackages(["food"]) as shared:
+        names = {dp.metadata["name"] for dp in shared.datapackages()}
+        assert names == {
+            Database("food").datapackage().metadata["name"],
+            Database("biosphere").datapackage().metadata["name"],
+        }
+
+
+@bw2test
+def test_shared_datapackages_no_dependents():
+    _fixture()
+    with SharedDatapackages(["food"], include_dependents=False) as shared:
+        assert len(shared) == 1
+
+
+@bw2test
+def test_shared_datapackages_arrays_read_only_and_equal():
+    _fixture()
+    original = Database("food").datapackage()
+    with SharedDatapackages(["food"], include_dependents=False) as shared:
+        (dp,) = shared.datapackages()
+        for resource in original.resources:
+            expected = original.get_resource(resource["name"])[0]
+            given = dp.get_resource(resource["name"])[0]
+            assert not given.flags.writeable
+            assert np.array_equal(expected, given)
+        with pytest.raises(ValueError):
+            given[0] = given[0]
+
+
+@bw2test
+def test_shared_datapackages_pickle_attaches_to_same_blocks():
+    _fixture()
+    with SharedDatapackages(["food"], methods=[("a method",)]) as shared:
+        clone = pickle.loads(pickle.dumps(shared))
+        assert not clone._owner
+        assert len(clone) == len(shared) == 3
+        clone.close()
+        # Closing a non-owner doesn't unlink the blocks
+        assert len(shared.datapackages()) == 3
+
+
+@bw2test
+def test_shared_datapackages_lca():
+    _fixture()
+    with SharedDatapackages(["food"], methods=[("a method",)]) as shared:
+        assert _worker_score(shared, get_id(("food", "1"))) == 40
+
+
+@pytest.mark.skipif(
+    "fork" not in multiprocessing.get_all_start_methods(), reason="Needs `fork` start method"
+)
+@bw2test
+def test_shared_datapackages_process_pool():
+    _fixture()
+    node_id = get_id(("food", "1"))
+    with SharedDatapackages(["food"], methods=[("a method",)]) as shared:
+        with multiprocessing.get_context("fork").Pool(2) as pool:
+            scores = pool.starmap(_worker_score, [(shared, node_id)] * 4)
+    assert scores == [40] * 4
+
+
+@bw2test
+def test_shared_datapackages_closed():
+    _fixture()
+    shared = SharedDatapackages(["food"])
+    shared.close()
+    with pytest.raises(ValueError):
+        shared.datapackages()
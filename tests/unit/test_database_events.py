@@ -1,6 +1,6 @@
 import json
 
-from bw2data import databases, get_node
+from bw2data import databases, extract_brightway_databases, get_node, write_wurst_documents
 from bw2data.backends.schema import ExchangeDataset
 from bw2data.database import DatabaseChooser
 from bw2data.project import projects
@@ -956,6 +956,30 @@ def test_database_write_revision_apply(num_revisions):
     assert ExchangeDataset.select().where(ExchangeDataset.output_database == "food").count() == 4
 
 
+
+@bw2test
+def test_write_wurst_documents_revision_resets_database():
+    projects.set_current("activity-event")
+    DatabaseChooser("biosphere").write(basic.biosphere)
+    DatabaseChooser("food").write(basic.food)
+    documents = extract_brightway_databases("food")
+
+    projects.dataset.set_sourced()
+    write_wurst_documents("food", documents)
+
+    revisions = [
+        json.load(open(fp))["data"]
+        for fp in sorted(
+            (fp for fp in (projects.dataset.dir / "revisions").iterdir() if fp.stem != "head"),
+            key=lambda fp: int(fp.stem),
+        )
+    ]
+    changes = [[(obj["type"], obj["change_type"]) for obj in data] for data in revisions]
+    reset = changes.index([("lci_database", "database_reset")])
+    created = [index for index, data in enumerate(changes) if ("lci_node", "create") in data]
+    assert created and all(index > reset for index in created)
+
+
 @bw2test
 def test_database_write_unsourced_project(num_revisions):
     projects.set_current("activity-event")
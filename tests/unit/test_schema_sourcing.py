@@ -34,6 +34,9 @@ def test_signal_is_sent(*mocks: Mock):
     database.register()
     activity = database.new_node(code="A", name="A")
     activity.save()
+    # New rows have no previous version to look up; updates do
+    activity["name"] = "B"
+    activity.save()
     for m in mocks:
         assert m.called
 
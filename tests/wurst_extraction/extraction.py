@@ -1,7 +1,19 @@
+import types
+
 import pytest
 from fixtures import test_bw2_database
 
-from bw2data import extract_brightway_databases
+from bw2data import (
+    Database,
+    Method,
+    databases,
+    extract_brightway_databases,
+    get_id,
+    write_wurst_documents,
+)
+from bw2data.backends import ActivityDataset, ExchangeDataset
+from bw2data.backends import wurst_extraction
+from bw2data.errors import DuplicateNode, UnknownObject
 from bw2data.tests import bw2test
 
 
@@ -120,3 +132,148 @@ def test_extraction_with_identifiers():
     assert all("id" in ds for ds in data)
     assert all("id" in exc for ds in data for exc in ds["exchanges"])
     assert all("code" in exc for ds in data for exc in ds["exchanges"])
+
+
+def test_extraction_as_generator(test_bw2_database):
+    data = extract_brightway_databases("food", add_identifiers=True, as_generator=True)
+    assert isinstance(data, types.GeneratorType)
+    assert list(data) == extract_brightway_databases("food", add_identifiers=True)
+
+
+def test_extraction_matches_row_by_row_extraction(test_bw2_database):
+    activities = [
+        wurst_extraction.extract_activity(obj, add_identifiers=True)
+        for obj in ActivityDataset.select().where(ActivityDataset.database == "food")
+    ]
+    wurst_extraction.add_exchanges_to_consumers(
+        activities,
+        ExchangeDataset.select().where(ExchangeDataset.output_database == "food"),
+        add_properties=True,
+    )
+    wurst_extraction.add_input_info_for_indigenous_exchanges(activities, ["food"], True)
+    wurst_extraction.add_input_info_for_external_exchanges(activities, ["food"], True)
+    data = extract_brightway_databases("food", add_properties=True, add_identifiers=True)
+    assert data == activities
+
+
+def test_extraction_in_worker_processes(test_bw2_database, monkeypatch):
+    expected = extract_brightway_databases(["food", "biosphere"], processes=1)
+    monkeypatch.setattr(wurst_extraction, "EXTRACTION_BATCH_SIZE", 1)
+    assert extract_brightway_databases(["food", "biosphere"], processes=2) == expected
+    assert extract_brightway_databases(["food", "biosphere"], processes=1) == expected
+
+
+def test_extraction_no_worker_processes_by_default(test_bw2_database, monkeypatch):
+    expected = extract_brightway_databases(["food", "biosphere"])
+    monkeypatch.setattr(wurst_extraction, "EXTRACTION_BATCH_SIZE", 1)
+
+    def no_pool(*args, **kwargs):
+        raise AssertionError("Worker processes started")
+
+    monkeypatch.setattr(wurst_extraction, "ProcessPoolExecutor", no_pool)
+    monkeypatch.setattr("os.cpu_count", lambda: 4)
+    assert extract_brightway_databases(["food", "biosphere"]) == expected
+    assert len(Database("food").edges_to_dataframe()) == 4
+
+
+def test_extraction_missing_input(test_bw2_database):
+    ExchangeDataset.create(
+        input_database="food",
+        input_code="missing",
+        output_database="food",
+        output_code="1",
+        type="technosphere",
+        data={
+            "amount": 1,
+            "input": ("food", "missing"),
+            "output": ("food", "1"),
+            "type": "technosphere",
+        },
+    )
+    with pytest.raises(UnknownObject):
+        extract_brightway_databases("food")
+
+
+def renamed(documents, old, new):
+    for ds in documents:
+        ds["database"] = new if ds["database"] == old else ds["database"]
+        for exc in ds["exchanges"]:
+            if exc["database"] == old:
+                exc["database"] = new
+    return documents
+
+
+@pytest.mark.parametrize("add_identifiers", [False, True])
+def test_write_wurst_documents(test_bw2_database, add_identifiers):
+    data = extract_brightway_databases("food", add_identifiers=add_identifiers)
+    write_wurst_documents("scenario", data)
+    assert databases["scenario"]["number"] == 2
+    assert databases["scenario"]["searchable"]
+    assert not databases["scenario"].get("dirty")
+    assert Database("scenario").filepath_processed().is_file()
+
+    result = extract_brightway_databases("scenario", add_properties=True)
+    expected = renamed(extract_brightway_databases("food"), "food", "scenario")
+    for ds in result:
+        for exc in ds["exchanges"]:
+            assert exc.pop("properties") == {}
+    assert result == expected
+    node = Database("scenario").get("1")
+    assert node["parameters"] == [{"name": "losses_gross_net", "amount": 0.01}]
+    assert {exc.input.key for exc in node.technosphere()} == {("scenario", "2")}
+    assert {exc.input.key for exc in node.biosphere()} == {("biosphere", "1")}
+
+
+def test_write_wurst_documents_replaces_data(test_bw2_database):
+    data = extract_brightway_databases("food")
+    write_wurst_documents("scenario", data)
+    data[0]["exchanges"] = data[0]["exchanges"][:1]
+    write_wurst_documents("scenario", data)
+    assert len(Database("scenario")) == 2
+    edges = ExchangeDataset.select().where(ExchangeDataset.output_database == "scenario")
+    assert edges.count() == 1 + len(data[1]["exchanges"])
+
+
+def test_write_wurst_documents_deferred(test_bw2_database):
+    write_wurst_documents(
+        "scenario", extract_brightway_databases("food"), process=False, searchable=False
+    )
+    assert databases["scenario"]["dirty"]
+    assert not databases["scenario"].get("searchable")
+    assert "processed" not in databases["scenario"]
+    databases.clean()
+    assert "processed" in databases["scenario"]
+    assert not databases["scenario"].get("dirty")
+
+
+def test_write_wurst_documents_missing_input(test_bw2_database):
+    data = extract_brightway_databases("food")
+    data[0]["exchanges"][0]["input"] = ("biosphere", "missing")
+    with pytest.raises(UnknownObject):
+        write_wurst_documents("scenario", data)
+    assert "scenario" not in databases
+
+    data = extract_brightway_databases("food")
+    data[0]["exchanges"].append(dict(data[0]["exchanges"][0], name="missing", code="missing"))
+    with pytest.raises(UnknownObject):
+        write_wurst_documents("scenario", data)
+
+
+def test_write_wurst_documents_duplicate_codes(test_bw2_database):
+    data = extract_brightway_databases("food")
+    with pytest.raises(DuplicateNode):
+        write_wurst_documents("scenario", data + data[:1])
+
+
+def test_write_wurst_documents_same_database_lca(test_bw2_database):
+    bw2calc = pytest.importorskip("bw2calc")
+    Method(("m",)).write([(("biosphere", "1"), 2), (("biosphere", "2"), 3)])
+    old_id = get_id(("food", "1"))
+    write_wurst_documents("food", extract_brightway_databases("food", add_identifiers=True))
+    assert get_id(("food", "1")) != old_id
+    assert get_id(("food", "1")) == Database("food").get("1").id
+
+    lca = bw2calc.LCA({("food", "1"): 1}, ("m",))
+    lca.lci()
+    lca.lcia()
+    assert lca.score != 0